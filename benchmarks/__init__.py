@@ -0,0 +1,13 @@
+"""記録済みのレスポンス(fixtures)を使ったパーサーのベンチマーク
+
+ネットワークに接続せずに、各サイトの抽出処理(パースとオブジェクトの生成)の速度と
+メモリの割り当てを計測する。
+
+Example:
+    $ python -m benchmarks
+    $ python -m benchmarks -k dlsite --repeat 500
+    $ python -m benchmarks --browser --json result.json
+
+ブラウザのプロファイル毎のデータ取得までの時間(実際のサイトに接続する)はbenchmarks.time_to_dataで計測する。
+    $ python -m benchmarks.time_to_data --profiles default,eager,lean
+"""
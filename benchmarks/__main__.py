@@ -0,0 +1,120 @@
+from __future__ import annotations
+import argparse
+import gc
+import json
+import logging
+import os
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+from .cases import CASES, FIXTURES_DIR, Case, SkipCase
+
+
+logger = logging.getLogger(__name__)
+
+
+def measure(case: Case, repeat: int = 200) -> dict:
+    """1つのケースの処理速度とメモリの割り当てを計測する
+
+    Returns:
+        dict: items(1回あたりのアイテム数), items_per_sec, ms_per_run,
+            peak_kib(1回の実行中の最大割り当て量), retained_bytes_per_item, retained_blocks_per_item(戻り値が保持するメモリ)
+    """
+    with ExitStack() as stack:
+        run = case.setup(os.path.join(FIXTURES_DIR, case.fixture), stack)
+
+        # 1回目はキャッシュの作成やインポートを含むので計測しない
+        items: list = run()
+        if not items:
+            raise SkipCase("no items extracted")
+        del items
+
+        # 処理速度
+        start = time.perf_counter()
+        for _ in range(repeat):
+            count = len(run())
+        elapsed = time.perf_counter() - start
+
+        # メモリの割り当て
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            baseline, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            items = run()
+            _, peak = tracemalloc.get_traced_memory()
+            # 循環参照で残っているパース途中のオブジェクトを除く
+            gc.collect()
+            current, _ = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        retained_blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+        del items
+
+    return {
+        "items": count,
+        "items_per_sec": count * repeat / elapsed,
+        "ms_per_run": elapsed / repeat * 1000,
+        "peak_kib": (peak - baseline) / 1024,
+        "retained_bytes_per_item": (current - baseline) / count,
+        "retained_blocks_per_item": retained_blocks / count,
+    }
+
+
+def run(pattern: str = None, repeat: int = 200, browser: bool = False) -> dict[str, dict]:
+    """ケースを順に計測する
+
+    ブラウザが必要なケースはbrowser=Trueの場合のみ実行する(1回あたりのWebDriverの往復も含む)。
+    実行できないケースは結果にskippedとして理由を記録する。
+    """
+    results = {}
+    for case in CASES:
+        if pattern and pattern not in case.name:
+            continue
+        if case.browser and not browser:
+            results[case.name] = {"skipped": "browser case (use --browser)"}
+            continue
+        # ブラウザのケースは時間がかかるので回数を減らす
+        case_repeat = max(1, repeat // 20) if case.browser else repeat
+        try:
+            results[case.name] = measure(case, case_repeat)
+        except SkipCase as e:
+            results[case.name] = {"skipped": str(e)}
+        logger.debug(f"{case.name}: {results[case.name]}")
+    return results
+
+
+def format_table(results: dict[str, dict]) -> str:
+    lines = [f"{'case':<24}{'items':>6}{'items/s':>12}{'ms/run':>10}{'peak KiB':>10}{'B/item':>10}{'blk/item':>10}"]
+    for name, result in results.items():
+        if "skipped" in result:
+            lines.append(f"{name:<24}  skipped: {result['skipped']}")
+            continue
+        lines.append(
+            f"{name:<24}{result['items']:>6}{result['items_per_sec']:>12,.0f}{result['ms_per_run']:>10.3f}"
+            f"{result['peak_kib']:>10.1f}{result['retained_bytes_per_item']:>10.0f}{result['retained_blocks_per_item']:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="記録済みのレスポンスを使ったパーサーのベンチマーク")
+    parser.add_argument("-k", dest="pattern", help="ケース名に含まれる文字列で絞り込む")
+    parser.add_argument("--repeat", type=int, default=200, help="1ケースあたりの実行回数")
+    parser.add_argument("--browser", action="store_true", help="ブラウザが必要なケースも実行する")
+    parser.add_argument("--json", dest="json_path", help="結果をJSONで保存するパス")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run(args.pattern, args.repeat, args.browser)
+    print(format_table(results))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
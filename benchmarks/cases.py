@@ -0,0 +1,244 @@
+from __future__ import annotations
+import json
+import os
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Callable, NamedTuple
+from unittest import mock
+
+import feedparser
+
+
+# 記録済みのレスポンスを置くディレクトリ
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class SkipCase(Exception):
+    """実行できないケース(依存パッケージやブラウザがない場合など)"""
+
+
+class FixtureResponse:
+    """http_getの戻り値(requests.Response)の代わりに記録済みのレスポンスを返すクラス"""
+
+    status_code = 200
+
+    def __init__(self, path: str, url: str = "") -> None:
+        with open(path, "rb") as f:
+            self.content: bytes = f.read()
+        self.text: str = self.content.decode("utf-8")
+        self.url = url
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+class FixtureDriver:
+    """ページを開く代わりに記録済みのHTMLを開くWebDriverのラッパー
+
+    最初のgetでだけファイルを開き、以降はDOMの読み取り(抽出処理)だけを計測できるようにする。
+    """
+
+    def __init__(self, driver: Any, path: str) -> None:
+        self._wrapped = driver
+        self._url: str = Path(path).as_uri()
+        self._loaded: bool = False
+
+    def get(self, url: str) -> None:
+        if not self._loaded:
+            self._wrapped.get(self._url)
+            self._loaded = True
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._wrapped, name)
+
+
+class Case(NamedTuple):
+    """ベンチマークのケース
+
+    setupは記録済みのレスポンスのパスとExitStackを受け取り、抽出したアイテムのリストを返す関数を返す。
+    パッチやブラウザの後始末はExitStackに登録する。
+    """
+
+    name: str
+    fixture: str
+    setup: Callable[[str, ExitStack], Callable[[], list]]
+    browser: bool = False
+
+
+def _import(name: str) -> Any:
+    """スクレイパーのモジュールをインポートする(依存パッケージがない場合はスキップ)"""
+    import importlib
+
+    try:
+        return importlib.import_module(name)
+    except ImportError as e:
+        raise SkipCase(f"can't import {name}: {e}")
+    except KeyError as e:
+        # YouTubeはインポート時に環境変数YOUTUBE_API_KEYが必要
+        raise SkipCase(f"can't import {name}: missing environment variable {e}")
+
+
+def _patch_http_get(stack: ExitStack, module: Any, response: FixtureResponse) -> None:
+    stack.enter_context(mock.patch.object(module, "http_get", lambda url, **kwargs: response))
+
+
+def _open_fixture(stack: ExitStack, scraper: Any, path: str) -> None:
+    """スクレイパーのブラウザを開き、記録済みのHTMLを開くようにする"""
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    try:
+        driver = scraper.open_browser()
+    except Exception as e:
+        raise SkipCase(f"can't open browser: {str(e).strip()}")
+    stack.callback(driver.quit)
+    scraper._driver = FixtureDriver(driver, path)
+    scraper._wait = WebDriverWait(scraper._driver, scraper._timeout)
+
+
+# ----- ニコニコ -----
+
+
+def niconico_getthumbinfo(path: str, stack: ExitStack) -> Callable[[], list]:
+    niconico = _import("scraping_tools.NicoNico.niconico")
+    _patch_http_get(stack, niconico, FixtureResponse(path))
+
+    def run() -> list:
+        video = niconico.NicoNicoVideo("so42519201")
+        video.get_detail()
+        return [video]
+
+    return run
+
+
+def niconico_blomaga(path: str, stack: ExitStack) -> Callable[[], list]:
+    niconico = _import("scraping_tools.NicoNico.niconico")
+    _patch_http_get(stack, niconico, FixtureResponse(path))
+
+    def run() -> list:
+        news = niconico.NicoNicoChannelNews("ch2647027", "ar2163283")
+        news.get_detail()
+        return [news]
+
+    return run
+
+
+def niconico_blomaga_feed(path: str, stack: ExitStack) -> Callable[[], list]:
+    niconico = _import("scraping_tools.NicoNico.niconico")
+    with open(path, "rb") as f:
+        content: bytes = f.read()
+    # feedparserによるパースも計測に含める
+    stack.enter_context(mock.patch.object(niconico, "fetch_feed", lambda url, **kwargs: feedparser.parse(content)))
+    channel = niconico.NicoNicoChannel("ch2647027")
+
+    return lambda: channel.get_news(limit=100)
+
+
+def niconico_live_status(path: str, stack: ExitStack) -> Callable[[], list]:
+    live_tracker = _import("scraping_tools.NicoNico.live_tracker")
+    _patch_http_get(stack, live_tracker, FixtureResponse(path))
+
+    return lambda: [live_tracker.fetch_live_status("lv342920474")]
+
+
+def niconico_video_list(path: str, stack: ExitStack) -> Callable[[], list]:
+    niconico = _import("scraping_tools.NicoNico.niconico")
+    channel = niconico.NicoNicoChannel("ch2647027")
+    _open_fixture(stack, channel, path)
+    channel._get("https://ch.nicovideo.jp/ch2647027/video?page=1")
+
+    return lambda: channel._NicoNicoChannel__video_page()
+
+
+def niconico_live_list(path: str, stack: ExitStack) -> Callable[[], list]:
+    niconico = _import("scraping_tools.NicoNico.niconico")
+    channel = niconico.NicoNicoChannel("ch2647027")
+    _open_fixture(stack, channel, path)
+    channel._get("https://ch.nicovideo.jp/ch2647027/live?page=1")
+
+    return lambda: channel._NicoNicoChannel__live_page(now=True, future=True, past=True)
+
+
+def niconico_live_watch(path: str, stack: ExitStack) -> Callable[[], list]:
+    niconico = _import("scraping_tools.NicoNico.niconico")
+    live = niconico.NicoNicoLive("lv342920474")
+    _open_fixture(stack, live, path)
+
+    def run() -> list:
+        live.get_detail()
+        return [live]
+
+    return run
+
+
+# ----- YouTube -----
+
+
+def youtube_videos(path: str, stack: ExitStack) -> Callable[[], list]:
+    youtube = _import("scraping_tools.YouTube.youtube")
+    # YTChannel.get_detailで結合した後のvideos.listのアイテム
+    with open(path, encoding="utf-8") as f:
+        items: list[dict] = json.load(f)["items"]
+    channel = youtube.YTChannel("UCabcdefghijklmnopqrstuv")
+
+    return lambda: [channel._YTChannel__item_to_instance(item) for item in items]
+
+
+# ----- ChannelPlus -----
+
+
+def channelplus_video_pages(path: str, stack: ExitStack) -> Callable[[], list]:
+    channelplus = _import("scraping_tools.ChannelPlus.channelplus")
+    CapturedResponse = _import("scraping_tools.common.network_capture").CapturedResponse
+    # 動画一覧のページがキャプチャしたvideo_pages APIのレスポンス(全件が1つのレスポンスに含まれる)
+    response = CapturedResponse("https://api.nicochannel.jp/fc/fanclub_sites/1/video_pages?page=1", 200, "application/json", FixtureResponse(path).json())
+    channel = channelplus.ChannelPlusChannel("channel")
+    channel._wait_captured = lambda pattern=None, count=1, timeout=None: [response]
+    poster = ("channel", "チャンネル", "https://nicochannel.jp/channel")
+
+    return lambda: list(channel._ChannelPlusChannel__iter_api_videos(len(response.body["data"]["video_pages"]["list"]), *poster))
+
+
+# ----- DLsite -----
+
+
+def dlsite_search(path: str, stack: ExitStack) -> Callable[[], list]:
+    Work = _import("scraping_tools.DLsite.Maniax.Work").Work
+    html: str = FixtureResponse(path).text
+    base_url = "https://www.dlsite.com/maniax/fsr/=/language/jp/"
+
+    return lambda: [Work._parse_work_card(card) for card in Work._parse_search_html(html, base_url)]
+
+
+def dlsite_product_info(path: str, stack: ExitStack) -> Callable[[], list]:
+    Work = _import("scraping_tools.DLsite.Maniax.Work").Work
+    response = FixtureResponse(path)
+
+    return lambda: [Work._parse_product_info(product) for product in response.json().values()]
+
+
+def dlsite_circle_profile(path: str, stack: ExitStack) -> Callable[[], list]:
+    Circle = _import("scraping_tools.DLsite.Maniax.Circle").Circle
+    html: str = FixtureResponse(path).text
+    circle = Circle("RG60000", backend="http")
+
+    def run() -> list:
+        profile: dict = circle._parse_profile_html(html, circle.url)
+        return [circle._parse_on_sale_work(work, profile["circle_name"]) for work in profile["works"]]
+
+    return run
+
+
+CASES: list[Case] = [
+    Case("niconico.getthumbinfo", "niconico/getthumbinfo.xml", niconico_getthumbinfo),
+    Case("niconico.blomaga", "niconico/blomaga.html", niconico_blomaga),
+    Case("niconico.blomaga_feed", "niconico/blomaga_feed.xml", niconico_blomaga_feed),
+    Case("niconico.live_status", "niconico/live_watch.html", niconico_live_status),
+    Case("niconico.video_list", "niconico/video_list.html", niconico_video_list, browser=True),
+    Case("niconico.live_list", "niconico/live_list.html", niconico_live_list, browser=True),
+    Case("niconico.live_watch", "niconico/live_watch.html", niconico_live_watch, browser=True),
+    Case("youtube.videos", "youtube/videos.json", youtube_videos),
+    Case("channelplus.video_pages", "channelplus/video_pages.json", channelplus_video_pages),
+    Case("dlsite.search", "dlsite/search.html", dlsite_search),
+    Case("dlsite.product_info", "dlsite/product_info.json", dlsite_product_info),
+    Case("dlsite.circle_profile", "dlsite/circle_profile.html", dlsite_circle_profile),
+]
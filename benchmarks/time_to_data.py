@@ -0,0 +1,162 @@
+"""ブラウザのプロファイル(browser_profile.PROFILES)毎に、ページを開いてからデータの要素が現れるまでの時間を計測する
+
+実際のサイトに接続するため、ChromeとChromeDriver、ネットワーク接続が必要。
+ChannelPlusはチャンネルIDを指定した場合のみ計測する。
+
+Example:
+    $ python -m benchmarks.time_to_data
+    $ python -m benchmarks.time_to_data --profiles default,eager,lean --repeat 5 --channelplus <channel_id>
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Callable, NamedTuple
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+class Target(NamedTuple):
+    """計測するページ
+
+    open_browserはプロファイル名を受け取り、ブラウザを開いてWebDriverとブラウザを閉じる関数を返す関数。
+    """
+
+    name: str
+    url: str
+    locator: tuple
+    open_browser: Callable[[str], tuple[Any, Callable[[], None]]]
+
+
+def _open_mixin(cls: type, *args: Any) -> Callable[[str], tuple[Any, Callable[[], None]]]:
+    def open_browser(profile: str) -> tuple[Any, Callable[[], None]]:
+        scraper = cls(*args)
+        scraper._browser_profile = profile
+        driver = scraper.open_browser()
+
+        def close() -> None:
+            scraper.close_browser()
+            # __del__で再度閉じないようにする
+            del scraper._driver
+
+        return driver, close
+
+    return open_browser
+
+
+def _open_dlsite(profile: str) -> tuple[Any, Callable[[], None]]:
+    from scraping_tools.DLsite.Maniax.Work import Work
+
+    work = Work()
+    work.open_browser(profile=profile)
+    return work.driver, work.driver.quit
+
+
+def targets(niconico: str, channelplus: str = None) -> list[Target]:
+    from scraping_tools.NicoNico.niconico import NicoNicoChannel
+    from scraping_tools.ChannelPlus.channelplus import ChannelPlusChannel, VIDEO_ITEM_XPATH
+
+    result: list[Target] = [
+        Target(
+            "niconico.video_list",
+            f"https://ch.nicovideo.jp/{niconico}/video?page=1",
+            (By.XPATH, '//li[@class="item"]'),
+            _open_mixin(NicoNicoChannel, niconico),
+        ),
+        Target(
+            "niconico.live_list",
+            f"https://ch.nicovideo.jp/{niconico}/live?page=1",
+            (By.XPATH, '//section[@class="sub past"]'),
+            _open_mixin(NicoNicoChannel, niconico),
+        ),
+        Target(
+            "dlsite.search",
+            "https://www.dlsite.com/maniax/fsr/=/language/jp/",
+            (By.CSS_SELECTOR, "ul.n_worklist > *"),
+            _open_dlsite,
+        ),
+    ]
+    if channelplus:
+        result.append(
+            Target(
+                "channelplus.videos",
+                f"https://nicochannel.jp/{channelplus}/videos",
+                (By.XPATH, VIDEO_ITEM_XPATH),
+                _open_mixin(ChannelPlusChannel, channelplus),
+            )
+        )
+    return result
+
+
+def measure(target: Target, profile: str, repeat: int = 3, timeout: int = 30) -> dict:
+    """1つのページとプロファイルの組み合わせを計測する
+
+    Returns:
+        dict: launch_sec(ブラウザの起動), first_sec(1回目のページ), median_sec, min_sec(2回目以降のページ)
+    """
+    started: float = time.perf_counter()
+    driver, close = target.open_browser(profile)
+    launch: float = time.perf_counter() - started
+    try:
+        times: list[float] = []
+        for _ in range(repeat + 1):
+            started = time.perf_counter()
+            driver.get(target.url)
+            WebDriverWait(driver, timeout, poll_frequency=0.05).until(EC.presence_of_element_located(target.locator))
+            times.append(time.perf_counter() - started)
+    finally:
+        close()
+
+    warm: list[float] = times[1:] or times
+    return {"launch_sec": launch, "first_sec": times[0], "median_sec": statistics.median(warm), "min_sec": min(warm)}
+
+
+def format_table(results: dict[str, dict[str, dict]]) -> str:
+    lines = [f"{'target':<22}{'profile':<10}{'launch s':>10}{'first s':>10}{'median s':>10}{'min s':>10}"]
+    for name, profiles in results.items():
+        for profile, result in profiles.items():
+            if "error" in result:
+                lines.append(f"{name:<22}{profile:<10}  error: {result['error']}")
+                continue
+            lines.append(
+                f"{name:<22}{profile:<10}{result['launch_sec']:>10.2f}{result['first_sec']:>10.2f}"
+                f"{result['median_sec']:>10.2f}{result['min_sec']:>10.2f}"
+            )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    from scraping_tools.common.browser_profile import PROFILES
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.time_to_data", description="ブラウザのプロファイル毎のデータ取得までの時間")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="計測するプロファイル名(カンマ区切り)")
+    parser.add_argument("--repeat", type=int, default=3, help="2回目以降のページを開く回数")
+    parser.add_argument("--niconico", default="ch2647027", help="ニコニコチャンネルのID")
+    parser.add_argument("--channelplus", help="ChannelPlusのチャンネルID(指定した場合のみ計測する)")
+    parser.add_argument("-k", dest="pattern", help="ページ名に含まれる文字列で絞り込む")
+    parser.add_argument("--json", dest="json_path", help="結果をJSONで保存するパス")
+    args = parser.parse_args()
+
+    results: dict[str, dict[str, dict]] = {}
+    for target in targets(args.niconico, args.channelplus):
+        if args.pattern and args.pattern not in target.name:
+            continue
+        for profile in args.profiles.split(","):
+            try:
+                result = measure(target, profile, args.repeat)
+            except Exception as e:
+                message: list[str] = str(e).strip().splitlines()
+                result = {"error": f"{type(e).__name__}: {message[0] if message else ''}"}
+            results.setdefault(target.name, {})[profile] = result
+    print(format_table(results))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
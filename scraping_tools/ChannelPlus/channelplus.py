@@ -5,6 +5,7 @@ import time
 import re
 import os
 from pprint import pprint
+from typing import Iterator
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -15,8 +16,10 @@ from selenium.common.exceptions import NoSuchElementException
 from selenium.common.exceptions import TimeoutException
 
 from ..common.base_class import ScrapingMixin, Platform, Live, Video, News
-from ..common.common_func import get_matching_element, get_matching_all_elements, parse_video_duration
-from my_utilities.debug import execute_time
+from ..common.common_func import get_matching_element, get_matching_all_elements, parse_video_duration, iter_appended_elements
+from ..common.retry import TransientError, PermanentError
+from ..common.parsing import parse_datetime
+from ..common.metrics import instrument
 
 
 logger = logging.getLogger(__name__)
@@ -28,6 +31,11 @@ FOOTER_XPATH: str = '//div[@id="root"]/div/div[2]/div[2]'
 NOT_FOUND_XPATH: str = '//h5[text()="ページを表示することができませんでした"]'
 NOT_FOUND_XPATH2: str = '//h5[text()="お探しのページは見つかりませんでした"]'
 LABEL_XPATH: str = '//span[@class="MuiChip-label MuiChip-labelSmall"]'
+VIDEO_ITEM_XPATH: str = f'{MAIN_XPATH}//div[contains(@class, "MuiGrid-item")]'
+NEWS_ITEM_XPATH: str = f'{MAIN_XPATH}//div[contains(@class, "MuiPaper-rounded")]'
+ALL_SHOWN_XPATH: str = '//span[text()="すべて表示しています"]'
+# 動画ページが動画一覧を取得するAPI(キャプチャが有効な場合はレスポンスから動画情報を取得する)
+VIDEO_PAGES_API_PATTERN: str = r"/fc/fanclub_sites/\d+/video_pages\?"
 
 # FIXME: 画像を読み込むまで待機する処理が必要
 
@@ -36,12 +44,14 @@ class ChannelPlusChannel(Platform, ScrapingMixin):
     """ニコニコチャンネルプラスのコンテンツを取得するクラス"""
 
     _img_load = True
+    _capture_patterns = (VIDEO_PAGES_API_PATTERN,)
 
     def __init__(self, id: str) -> None:
         """IDの代わりに名前を設定"""
         super().__init__(id)
 
     # トップページの生放送を取得する
+    @instrument("channelplus")
     def get_live(self) -> list[ChannelPlusLive]:
         logger.info(f"Scraping for NicoNicoChannelPlus's live page...")
         lives = self.__live_page()
@@ -120,7 +130,7 @@ class ChannelPlusChannel(Platform, ScrapingMixin):
             # 開始予定時刻 ex:'09/16 21:00', '今日 21:00' etc...
             start_at: WebElement = get_matching_element(base=item, tag="span", attribute="class", pattern=r"^.*MuiTypography-caption.*$")
             start_at: str = start_at.text
-            start_at: str = self.__convert_future_item_start_at(start_at)
+            start_at: datetime = self.__convert_future_item_start_at(start_at)
 
             # インスタンスを作成
             live = ChannelPlusLive(poster_id, id)
@@ -138,7 +148,7 @@ class ChannelPlusChannel(Platform, ScrapingMixin):
             return live
 
         # 生放送ページを開く
-        self._driver.get(f"https://nicochannel.jp/{self.id}/lives")
+        self._get(f"https://nicochannel.jp/{self.id}/lives")
 
         # 投稿者ID
         poster_id: str = self._driver.current_url.split("/")[-2]
@@ -154,7 +164,7 @@ class ChannelPlusChannel(Platform, ScrapingMixin):
             if len(sections) >= 2:
                 break
             if time.time() - start > self._timeout:
-                raise Exception("not found sections")  # FIXME
+                raise TransientError("not found sections")
 
         # 生放送のリストを取得
         lives = []
@@ -167,43 +177,35 @@ class ChannelPlusChannel(Platform, ScrapingMixin):
         # 結果を返す
         return lives
 
-    # 予定開始時刻をISO8601形式に変換する(放送予定限定)
-    def __convert_future_item_start_at(self, start_at: str) -> str:
-        """放送予定の生放送情報の開始予定時刻をISO8601形式に変換する"""
+    # 予定開始時刻をdatetimeに変換する(放送予定限定)
+    def __convert_future_item_start_at(self, start_at: str) -> datetime:
+        """放送予定の生放送情報の開始予定時刻をdatetime(日本時間)に変換する"""
         # start:str ex:'09/16 21:00', '今日 21:00' etc...
         try:
-            start_at: datetime = datetime.strptime(start_at, "%m/%d %H:%M")
-        except:
-            time_ = start_at[-5:]  # 後ろの時間部分を取得
-            hour, minute = time_.split(":")  # 時間部分を取得
-            if "今日" in start_at:
-                now: datetime = datetime.now()
-                start_at: datetime = now.replace(hour=int(hour), minute=int(minute))
-            elif "明日" in start_at:
-                tommorow: datetime = datetime.now() + timedelta(days=1)
-                start_at: datetime = tommorow.replace(hour=int(hour), minute=int(minute))
-            else:
-                raise Exception("invalid start_at")  # FIXME
-        # 年を設定
-        now: datetime = datetime.now()
-        if start_at.month < now.month:
-            start_at: datetime = start_at.replace(year=now.year + 1)
-        else:
-            start_at: datetime = start_at.replace(year=now.year)
-        start_at: str = start_at.isoformat()
-
-        return start_at
+            return parse_datetime(start_at)
+        except ValueError:
+            raise PermanentError(f"invalid start_at: {start_at}")
 
     # トップページの動画を取得する
+    @instrument("channelplus")
     def get_video(self, type_: str = "upload", limit: int = 5) -> list[ChannelPlusVideo]:
         logger.info(f"Scraping for NicoNicoChannelPlus's video page...")
-        videos = self.__video_page(type_, limit)
+        videos = list(self.iter_video(type_, limit))
         logger.info(f"Success scraping for NicoNicoChannelPlus's video page")
 
         return videos
 
-    def __video_page(self, type_: str, limit: int) -> list[ChannelPlusVideo]:
-        """ニコニコチャンネルプラスの動画ページをスクレイピングする"""
+    @instrument("channelplus")
+    def iter_video(self, type_: str = "upload", limit: int = 5) -> Iterator[ChannelPlusVideo]:
+        """動画ページをスクロールしながら、表示された順に動画を返すジェネレーター"""
+        yield from self.__video_page(type_, limit)
+
+    def __video_page(self, type_: str, limit: int) -> Iterator[ChannelPlusVideo]:
+        """ニコニコチャンネルプラスの動画ページをスクレイピングする
+
+        スクロール毎に新しく追加されたアイテムのみを取得する。
+        レスポンスのキャプチャが有効な場合は、動画一覧のAPIのレスポンスから取得する(取得できなかった場合はページから取得する)。
+        """
 
         def video_item(item: WebElement) -> ChannelPlusVideo:
             item_upper: WebElement = item.find_element(By.XPATH, "./div/div/div[1]")  # //*[@id="app-layout"]/div[2]/div[1]/div/div[3]/div/div/div/div/div/div/div[1]
@@ -218,7 +220,7 @@ class ChannelPlusChannel(Platform, ScrapingMixin):
             thumbnail: str = item_upper.find_element(By.XPATH, ".//img").get_attribute("src")
             # 投稿日時
             posted_at: str = item_under.find_element(By.XPATH, ".//span").text  # ex:"2023/07/06", "〇日前"
-            posted_at: str = self.__convert_posted_at(posted_at)
+            posted_at: datetime = self.__convert_posted_at(posted_at)
             # 動画時間
             on_iamge: list = item_upper.find_elements(By.XPATH, ".//div")  # 1つめにラベル、2つめに時間が入っている
             duration: str = on_iamge[-1].text  # ex:"00:00:00", "00:00"
@@ -249,42 +251,25 @@ class ChannelPlusChannel(Platform, ScrapingMixin):
             return video
 
         # 動画ページを開く
-        self._driver.get(f"https://nicochannel.jp/{self.id}/videos")
+        self._get(f"https://nicochannel.jp/{self.id}/videos")
 
         # 指定されたタイプのボタンをクリックして遷移
         if type_ == "upload":
             uploaded_btn = WebDriverWait(self._driver, self._timeout).until(EC.element_to_be_clickable((By.XPATH, '//span[text()="アップロード動画"]/..')))
+            # クリックで送られるAPIのレスポンスのみを使う
+            if self._network is not None:
+                self._network.clear()
             uploaded_btn.click()
         elif type_ == "archive":
             archive_btn = WebDriverWait(self._driver, self._timeout).until(EC.element_to_be_clickable((By.XPATH, '//span[text()="アーカイブ動画"]/..')))
+            if self._network is not None:
+                self._network.clear()
             archive_btn.click()
         elif type_ == "all":
             pass
         else:
             raise ValueError("type must be 'upload' or 'archive' or 'all'")
 
-        while True:  # FIXME:limitが増えた際にスクロール処理が上手くいくか不明
-            # 表示されているアイテム数を取得
-            main: WebElement = self._driver.find_element(By.XPATH, MAIN_XPATH)
-            items: list = get_matching_all_elements(base=main, tag="div", attribute="class", pattern=r"^.*MuiGrid-item.*$")
-            # アイテムがなければ空リストを返して終了
-            if not items:
-                return []
-            # アイテム数が指定数以上になったら終了
-            if len(items) >= limit:
-                break
-
-            # 最後のアイテムの位置にスクロール
-            self._driver.execute_script("arguments[0].scrollIntoView();", items[-1])
-
-            # 「すべて表示しています」というテキストがあるか確認
-            try:
-                self._driver.find_element(By.XPATH, '//span[text()="すべて表示しています"]')
-            except NoSuchElementException:
-                continue
-            else:
-                break
-
         # 投稿者名
         poster_name: str = self.get_poster_name()
         # 投稿者URL
@@ -292,21 +277,97 @@ class ChannelPlusChannel(Platform, ScrapingMixin):
         # 投稿者ID
         poster_id: str = self._driver.current_url.split("/")[-2]
 
-        # 各アイテムから動画情報を取得
-        videos = [video_item(item) for item in items]
-
-        return videos
+        # APIのレスポンスから動画情報を取得
+        if self._network is not None:
+            api_videos: Iterator[ChannelPlusVideo] = self.__iter_api_videos(limit, poster_id, poster_name, poster_url)
+            first: ChannelPlusVideo = next(api_videos, None)
+            if first is not None:
+                yield first
+                yield from api_videos
+                return
+            logger.info("No video list response was captured. Scraping the rendered page instead.")
+
+        # スクロールで追加されたアイテムから順に動画情報を取得
+        for item in iter_appended_elements(self._driver, VIDEO_ITEM_XPATH, limit, end_xpath=ALL_SHOWN_XPATH, timeout=self._timeout):
+            yield video_item(item)
+
+    def __iter_api_videos(self, limit: int, poster_id: str, poster_name: str, poster_url: str) -> Iterator[ChannelPlusVideo]:
+        """キャプチャした動画一覧のAPIのレスポンスから動画を返すジェネレーター
+
+        limitに達していない場合は、最後までスクロールして次のページのレスポンスを待つ。
+        """
+        seen = 0
+        consumed = 0
+        total: int = None
+        while seen < limit:
+            responses: list = self._wait_captured(VIDEO_PAGES_API_PATTERN, count=consumed + 1)
+            if len(responses) <= consumed:
+                return
+            for response in responses[consumed:]:
+                consumed += 1
+                try:
+                    video_pages: dict = response.body["data"]["video_pages"]
+                    pages: list = video_pages["list"]
+                except (KeyError, TypeError):
+                    logger.warning(f"unexpected video list response. url: {response.url}")
+                    return
+                total = video_pages.get("total", total)
+                for page in pages:
+                    yield self.__video_from_api(page, poster_id, poster_name, poster_url)
+                    seen += 1
+                    if seen >= limit:
+                        return
+            # 全ての動画を取得した場合
+            if total is not None and seen >= total:
+                return
+            # 最後までスクロールして次のページを読み込む
+            self._driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+
+    def __video_from_api(self, page: dict, poster_id: str, poster_name: str, poster_url: str) -> ChannelPlusVideo:
+        """動画一覧のAPIの1件分のデータから動画を作成する"""
+        # ID
+        id: str = page["content_code"]
+        # 動画時間
+        duration: int = (page.get("active_video_filename") or {}).get("length")
+        # 再生数、コメント数
+        aggregate: dict = page.get("video_aggregate_info") or {}
+
+        # インスタンスを作成
+        video = ChannelPlusVideo(poster_id, id)
+        video.set_value(
+            poster_id=poster_id,
+            poster_name=poster_name,
+            poster_url=poster_url,
+            title=page["title"],
+            url=f"https://nicochannel.jp/{self.id}/video/{id}",
+            thumbnail=page.get("thumbnail_url"),
+            posted_at=parse_datetime(page["released_at"]) if page.get("released_at") else None,
+            duration=int(duration) if duration is not None else None,
+            view_count=aggregate.get("total_views"),
+            comment_count=aggregate.get("number_of_comments"),
+        )
+
+        return video
 
     # トップページのニュースを取得する
+    @instrument("channelplus")
     def get_news(self, limit: int = 1) -> list[ChannelPlusNews]:
         logger.info(f"Scraping for NicoNicoChannelPlus's news page...")
-        newses = self.__news_page(limit)
+        newses = list(self.iter_news(limit))
         logger.info(f"Success scraping for NicoNicoChannelPlus's news page")
 
         return newses
 
-    def __news_page(self, limit: int) -> list[ChannelPlusNews]:
-        """ニコニコチャンネルプラスのニュースページをスクレイピングする"""
+    @instrument("channelplus")
+    def iter_news(self, limit: int = 1) -> Iterator[ChannelPlusNews]:
+        """ニュースページをスクロールしながら、表示された順にニュースを返すジェネレーター"""
+        yield from self.__news_page(limit)
+
+    def __news_page(self, limit: int) -> Iterator[ChannelPlusNews]:
+        """ニコニコチャンネルプラスのニュースページをスクレイピングする
+
+        スクロール毎に新しく追加されたアイテムのみを取得する。
+        """
 
         def news_item(item: WebElement) -> ChannelPlusNews:
             # タイトル
@@ -340,7 +401,7 @@ class ChannelPlusChannel(Platform, ScrapingMixin):
 
         def news_page_in_new_tab(title: str) -> ChannelPlusNews:
             # ページを開く
-            self._driver.get(f"https://nicochannel.jp/{self.id}/articles/news")
+            self._get(f"https://nicochannel.jp/{self.id}/articles/news")
 
             # 対象のニュースをクリック
             target_news = WebDriverWait(self._driver, self._timeout).until(EC.element_to_be_clickable((By.XPATH, f'//h6[text()="{title}"]')))
@@ -356,7 +417,7 @@ class ChannelPlusChannel(Platform, ScrapingMixin):
             # 投稿日時
             posted_at: WebElement = WebDriverWait(self._driver, self._timeout).until(EC.presence_of_element_located((By.XPATH, f"{MAIN_XPATH}/div/div[4]/span")))
             posted_at: str = posted_at.text  # ex:"2023/07/06","〇日前","〇時間前"
-            posted_at: str = self.__convert_posted_at(posted_at)
+            posted_at: datetime = self.__convert_posted_at(posted_at)
             # 内容
             body: WebElement = WebDriverWait(self._driver, self._timeout).until(EC.presence_of_element_located((By.XPATH, f"{MAIN_XPATH}/div/div[5]")))
             body: str = body.text
@@ -376,33 +437,7 @@ class ChannelPlusChannel(Platform, ScrapingMixin):
             return news
 
         # ニュースページを開く
-        self._driver.get(f"https://nicochannel.jp/{self.id}/articles/news")
-
-        # 要素を読み込むためスクロール
-        while True:
-            # 表示されているアイテム数を取得
-            main: WebElement = self._wait.until(EC.presence_of_element_located((By.XPATH, MAIN_XPATH)))
-            items: list = get_matching_all_elements(base=main, tag="div", attribute="class", pattern=r"^.*MuiPaper-rounded.*$")
-            # アイテムがなければ空リストを返して終了
-            if not items:
-                return []
-            # アイテム数が指定数以上になったら終了
-            if len(items) >= limit:
-                break
-
-            # 最後のアイテムの位置にスクロール
-            self._driver.execute_script("arguments[0].scrollIntoView();", items[-1])
-
-            # 「すべて表示しています」というテキストがあるか確認
-            try:
-                self._driver.find_element(By.XPATH, '//span[text()="すべて表示しています"]')
-            except NoSuchElementException:
-                continue
-            else:
-                break
-
-        # アイテム数を制限
-        items = items[:limit]
+        self._get(f"https://nicochannel.jp/{self.id}/articles/news")
 
         # 投稿者名
         poster_name: str = self.get_poster_name()
@@ -411,38 +446,25 @@ class ChannelPlusChannel(Platform, ScrapingMixin):
         # 投稿者URL
         poster_url: str = f"https://nicochannel.jp/{poster_id}"
 
-        # 各ニュースから情報を取得
-        newses = []
-        for item in items:
+        # スクロールで追加されたアイテムから順にニュース情報を取得
+        for item in iter_appended_elements(self._driver, NEWS_ITEM_XPATH, limit, end_xpath=ALL_SHOWN_XPATH, timeout=self._timeout):
             # 2秒毎にページを開くように調整
             start = time.time()
-            newses.append(news_item(item))
+            news: ChannelPlusNews = news_item(item)
             end = time.time()
             execute_time = end - start
             if execute_time < 2:
                 time.sleep(2 - execute_time)
+            yield news
 
-        # 結果を返す
-        return newses
-
-    # 投稿日時をISO8601形式に変換する(動画、ニュース共通)
-    def __convert_posted_at(self, posted_at: str) -> str:
-        """動画の投稿日時をISO8601形式に変換する"""
+    # 投稿日時をdatetimeに変換する(動画、ニュース共通)
+    def __convert_posted_at(self, posted_at: str) -> datetime:
+        """動画の投稿日時をdatetime(日本時間)に変換する"""
         # posted_at:str ex:"2023/07/06", "〇日前", "〇時間前"
         try:
-            posted_at: datetime = datetime.strptime(posted_at, "%Y/%m/%d")
-        except:
-            if "日前" in posted_at:
-                before_days: int = int(posted_at[0])
-                posted_at: datetime = datetime.now() - timedelta(days=before_days)
-            elif "時間前" in posted_at:
-                before_hours: int = int(posted_at[0])
-                posted_at: datetime = datetime.now() - timedelta(hours=before_hours)
-            else:
-                raise Exception("invalid posted_at")
-        posted_at: str = posted_at.isoformat()
-
-        return posted_at
+            return parse_datetime(posted_at)
+        except ValueError:
+            raise PermanentError(f"invalid posted_at: {posted_at}")
 
     # 投稿者名を取得する
     def get_poster_name(self) -> str:
@@ -505,6 +527,8 @@ class ChannelPlusContentMixin(ScrapingMixin):
 class ChannelPlusVideo(Video, ChannelPlusContentMixin):
     """ニコニコチャンネルプラスの動画情報を格納するクラス"""
 
+    _platform = "ChannelPlus"
+
     def __init__(self, poster_id: str, id: str) -> None:
         super().__init__(id)
         self.poster_id = poster_id
@@ -513,6 +537,8 @@ class ChannelPlusVideo(Video, ChannelPlusContentMixin):
 class ChannelPlusLive(Live, ChannelPlusContentMixin):
     """ニコニコチャンネルプラスの生放送情報を格納するクラス"""
 
+    _platform = "ChannelPlus"
+
     def __init__(self, poster_id: str, id: str) -> None:
         super().__init__(id)
         self.poster_id = poster_id
@@ -521,6 +547,8 @@ class ChannelPlusLive(Live, ChannelPlusContentMixin):
 class ChannelPlusNews(News):
     """ニコニコチャンネルプラスのニュース情報を格納するクラス"""
 
+    _platform = "ChannelPlus"
+
     def __init__(self, poster_id: str, id: str) -> None:
         super().__init__(id)
         self.poster_id = poster_id
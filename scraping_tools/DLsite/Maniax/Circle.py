@@ -7,21 +7,60 @@ from selenium.common.exceptions import NoSuchElementException, TimeoutException,
 
 import asyncio
 import time
+import urllib.parse
 import logging, coloredlogs
 from pprint import pprint
 
 from functools import wraps
 
+from ...common.retry import call_with_retry
+from ...common.common_func import count_commands, http_get, parse_html
+from ...common.metrics import instrument
+from ...common.base_class import _chrome_options, _instrument_driver
+from ...common.browser_profile import get_profile
+from ...common.network_capture import NetworkCapture, is_capture_enabled
+
 logger = logging.getLogger(__name__)
 
+DLSITE_HOST = "www.dlsite.com"
+# 年齢確認を済ませたことを示すCookie(HTTPバックエンドで使用)
+ADULT_COOKIES = {"adultchecked": "1"}
+
+# サークル名と販売中の全作品の情報を1回のexecute_scriptで取得するスクリプト
+# HTTPバックエンド(_parse_profile_html)と同じ結果になるように、テキストはtextContentの前後の空白を除き、
+# URLはhref属性の値をページのURLで絶対URLにする
+ON_SALE_WORKS_SCRIPT = """
+const circleName = document.querySelector("span.original_name");
+const works = Array.from(document.querySelectorAll("div#search_result_list > ul > li")).map((elm) => {
+    const find = (selector) => elm.querySelector(selector);
+    const text = (selector) => { const e = find(selector); return e ? e.textContent.trim() : null; };
+    const link = find(".work_name a");
+    const href = link ? link.getAttribute("href") : null;
+    return {
+        title: text(".work_name a"),
+        url: href ? new URL(href, document.baseURI).href : null,
+        work_price: text(".work_price"),
+        discount_price: text(".work_price.discount"),
+        strike: text(".strike"),
+        sale_count: text(".work_dl span"),
+        category: text(".work_category"),
+    };
+});
+return {circle_name: circleName ? circleName.textContent.trim() : null, works: works};
+"""
+
 
 class Circle:
-    def __init__(self, id: str):
+    def __init__(self, id: str, backend: str = "browser"):
         # idの形式チェック
         if not id.startswith("RG"):
             raise ValueError("id must start with RG.")
+        # 取得方法のチェック
+        if backend not in ("browser", "http"):
+            raise ValueError("backend must be 'browser' or 'http'.")
 
         self.id = id
+        self.backend = backend
         self.url = f"https://www.dlsite.com/maniax/circle/profile/=/maker_id/{id}.html"
 
     def __getattr__(self, name: str):
@@ -36,35 +75,49 @@ class Circle:
         img_load: bool = False,
         gui: bool = False,
         timeout: int = 5,
+        profile: str = None,
     ) -> webdriver.Chrome:
-        """ブラウザを開く"""
-        # ブラウザのオプション
-        options = webdriver.ChromeOptions()
-        options.add_argument("--no-sandbox")  # 保護機能を無効化
-        options.add_argument("--disable-gpu")  # GPUの使用を無効化
-        options.add_argument("--window-size=1920,1080")  # Windowサイズを1920x1080に設定
-        options.add_experimental_option("excludeSwitches", ["enable-logging"])  # ログを無効化
-        options.add_argument("--disable-extensions")  # 拡張機能を無効化
-        if not img_load:
-            options.add_argument("--blink-settings=imagesEnabled=false")  # 画像読み込みを無効化
-        if not gui:
-            options.add_argument("--headless")  # GUIを無効化
+        """ブラウザを開く
+
+        profileはbrowser_profile.PROFILESの名前(Noneの場合は環境変数SCRAPING_TOOLS_BROWSER_PROFILE)
+        環境変数SCRAPING_TOOLS_CAPTURE_NETWORKが有効な場合は、networkでレスポンスをキャプチャできる。
+        driverを指定した場合は、そのWebDriverをそのまま使用する。
+        """
+        browser_profile = get_profile(profile)
+        capture: bool = is_capture_enabled()
+
+        # 渡されたdriverはキャプチャしない
+        self.network: NetworkCapture = None
 
         # ブラウザを開く
         if not driver:
-            self.driver = webdriver.Chrome(options)
+            driver = webdriver.Chrome(_chrome_options(img_load, gui, browser_profile, capture))
+            driver, self.network = _instrument_driver(driver, "dlsite", browser_profile, capture)
+        self.driver = driver
         # 待機時間を設定
         self.timeout = timeout
 
         # Cookieの追加
-        self.driver.get("https://www.dlsite.com")
+        call_with_retry(self.driver.get, "https://www.dlsite.com", host=DLSITE_HOST)
         self.driver.add_cookie({"name": "adultchecked", "value": "1", "domain": ".dlsite.com"})
 
         return self.driver
 
-    async def get_work(self) -> list:
+    @instrument("dlsite")
+    async def get_work(self, batch: bool = True) -> list:
+        """サークルの作品リストを取得する
+
+        batchがTrueの場合は1回のexecute_scriptで全作品の情報を取得する。
+        Falseの場合は作品毎にfind_elementで取得する(比較用)。
+        backendがhttpの場合はブラウザを使わずにHTMLをパースして取得する。
+        """
+        if self.backend == "http":
+            res = await asyncio.to_thread(http_get, self.url, cookies=ADULT_COOKIES)
+            result: dict = self._parse_profile_html(res.text, res.url)
+            return [self._parse_on_sale_work(work, result["circle_name"]) for work in result["works"]]
+
         # ページを開く
-        self.driver.get(self.url)
+        call_with_retry(self.driver.get, self.url, host=DLSITE_HOST)
         logger.debug(f"open {self.url}")
 
         # セクション毎の作品リストを取得
@@ -75,7 +128,11 @@ class Circle:
         upcomming_work_elms: list[WebElement] = []
 
         # 作品リストを取得
-        on_sale_works = await asyncio.gather(*[self._on_sale_works_elm(elm) for elm in on_sale_work_elms])
+        if batch:
+            result: dict = self.driver.execute_script(ON_SALE_WORKS_SCRIPT)
+            on_sale_works = [self._parse_on_sale_work(work, result["circle_name"]) for work in result["works"]]
+        else:
+            on_sale_works = await asyncio.gather(*[self._on_sale_works_elm(elm) for elm in on_sale_work_elms])
         upcomming_works = await asyncio.gather(*[self._upcomming_works_elm(elm) for elm in upcomming_work_elms])
 
         # 結合
@@ -155,11 +212,83 @@ class Circle:
         }
         return work
 
+    @staticmethod
+    def _parse_profile_html(html: str, base_url: str) -> dict:
+        """サークルページのHTMLから、ON_SALE_WORKS_SCRIPTと同じ形式の作品情報を取得する"""
+        soup = parse_html(html)
+
+        works = []
+        for elm in soup.select("div#search_result_list > ul > li"):
+
+            def text(selector: str) -> str:
+                e = elm.select_one(selector)
+                return e.get_text().strip() if e else None
+
+            link = elm.select_one(".work_name a")
+            works.append(
+                {
+                    "title": text(".work_name a"),
+                    "url": urllib.parse.urljoin(base_url, link.get("href")) if link and link.get("href") else None,
+                    "work_price": text(".work_price"),
+                    "discount_price": text(".work_price.discount"),
+                    "strike": text(".strike"),
+                    "sale_count": text(".work_dl span"),
+                    "category": text(".work_category"),
+                }
+            )
+
+        circle_name = soup.select_one("span.original_name")
+        return {"circle_name": circle_name.get_text().strip() if circle_name else None, "works": works}
+
+    def _parse_on_sale_work(self, work: dict, circle_name: str) -> dict:
+        """ON_SALE_WORKS_SCRIPTが返した作品情報を_on_sale_works_elmと同じ形式に変換する"""
+        # 価格
+        if work["discount_price"] is not None:
+            price = {"base": (work["strike"] or "").replace("円", "").replace(",", ""), "discount": work["discount_price"].replace("円", "").replace(",", "")}
+        elif work["work_price"] is not None:
+            price = {"base": work["work_price"].replace("円", "").replace(",", ""), "discount": None}
+        else:
+            logger.error(f"failed to get price")
+            price = None
+        # 販売数
+        sale_count = work["sale_count"].replace(",", "") if work["sale_count"] is not None else None
+
+        return {
+            "title": work["title"],
+            "url": work["url"],
+            "price": price,
+            "sale_count": sale_count,
+            "category": work["category"],
+            "circle": {
+                "id": self.id,
+                "url": self.url,
+                "name": circle_name,
+            },
+        }
+
     async def _upcomming_works_elm(self) -> list:
         # TODO
         return []
 
 
+async def benchmark(id: str) -> dict:
+    """1ページあたりのWebDriverの往復回数をbatchの有無で比較する"""
+    circle = Circle(id)
+    circle.open_browser()
+    result = {}
+    for batch in (False, True):
+        with count_commands(circle.driver) as counter:
+            works = await circle.get_work(batch=batch)
+        result["batch" if batch else "find_element"] = {
+            "round_trips": counter["count"],
+            "works": len(works),
+            "round_trips_per_work": counter["count"] / len(works) if works else None,
+        }
+    circle.driver.quit()
+    logger.info(f"round trips per page: {result}")
+    return result
+
+
 async def main():
     circle = Circle("RG42511")
     works = await circle.get_work()
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, AsyncIterator, Awaitable, Callable
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -7,17 +7,79 @@ from selenium.webdriver.remote.webelement import WebElement
 from selenium.common.exceptions import NoSuchElementException, TimeoutException, StaleElementReferenceException
 
 import asyncio
+import itertools
 import json
+import re
 import time
+from datetime import date, timedelta
 import logging, coloredlogs
 from pprint import pprint, pformat
 
 from functools import wraps
 
+from ...common.retry import call_with_retry
+from ...common.common_func import count_commands, http_get, parse_html
+from ...common.metrics import instrument
+from ...common.base_class import _chrome_options, _instrument_driver
+from ...common.browser_profile import get_profile
+from ...common.network_capture import NetworkCapture, is_capture_enabled
+from ...common.export import JsonlWriter
+
 import urllib.parse
 
 logger = logging.getLogger(__name__)
 
+DLSITE_HOST = "www.dlsite.com"
+# 年齢確認を済ませたことを示すCookie(HTTPバックエンドで使用)
+ADULT_COOKIES = {"adultchecked": "1"}
+# iter_searchで使用する1ページあたりの作品数(DLsiteの最大値)
+ITER_SEARCH_PER_PAGE = 100
+# 1つの検索条件でページを辿って取得できる作品数の上限(plan_shardsはこれを超えないように分割する)
+SEARCH_RESULT_CAP = 100 * ITER_SEARCH_PER_PAGE
+# plan_shardsで販売日の範囲が指定されていないシャードを分割する場合の開始日と、終了日(今日からの日数)
+# 分割した範囲の両端は開いたままにするので、範囲外の作品も最初と最後のシャードに含まれる
+EARLIEST_REGIST_DATE = date(1996, 1, 1)
+OPEN_END_MARGIN = timedelta(days=365)
+# gen_work_typeのキーと引数名の対応
+WORK_TYPE_ARGS = {
+    "illust": "cg_illust",
+    "movie": "video",
+    "audio": "voice_asmr",
+    "music": "music",
+}
+# 複数の作品の販売数や評価をまとめて取得できるAPI
+PRODUCT_INFO_URL = "https://www.dlsite.com/maniax/product/info/ajax"
+
+# 遅延読み込みの画像は実際のURLがdata-srcに入っている(srcは読み込み中の画像)
+THUMBNAIL_ATTRIBUTES = ("data-src", "src")
+
+# 検索結果の全作品の情報を1回のexecute_scriptで取得するスクリプト
+# HTTPバックエンド(_parse_search_html)と同じ結果になるように、テキストはtextContentの前後の空白を除き、
+# URLは属性値をページのURLで絶対URLにする
+WORK_CARDS_SCRIPT = """
+return Array.from(document.querySelectorAll("ul.n_worklist > *")).map((elm) => {
+    const find = (selector) => elm.querySelector(selector);
+    const text = (selector) => { const e = find(selector); return e ? e.textContent.trim() : null; };
+    const link = (selector, ...names) => {
+        const e = find(selector);
+        const value = e ? names.map((name) => e.getAttribute(name)).find((value) => value) : null;
+        return value ? new URL(value, document.baseURI).href : null;
+    };
+    return {
+        expected_date: find(".expected_date") !== null,
+        title: text(".work_name a"),
+        url: link(".work_name a", "href"),
+        thumbnail: link("img.lazy", "data-src", "src"),
+        type: text(".work_category"),
+        work_price: text(".work_price"),
+        discount_price: text(".work_price.discount"),
+        strike: text(".strike"),
+        circle_name: text(".maker_name a"),
+        circle_url: link(".maker_name a", "href"),
+    };
+});
+"""
+
 
 class Work:
     """DLsiteの作品を扱うクラス"""
@@ -29,6 +91,16 @@ class Work:
         "music": "音楽",
     }
 
+    def __init__(self, backend: str = "browser") -> None:
+        """検索結果の取得方法を指定する
+
+        browser: Chromeで検索結果のページを開いて取得する
+        http: ブラウザを使わず、HTTPでHTMLを取得してパースする
+        """
+        if backend not in ("browser", "http"):
+            raise ValueError("backend must be 'browser' or 'http'.")
+        self.backend = backend
+
     def __getattr__(self, name: str) -> Any:
         # ドライバを起動
         if name == "driver":
@@ -41,28 +113,30 @@ class Work:
         img_load: bool = False,
         gui: bool = False,
         timeout: int = 5,
+        profile: str = None,
     ) -> webdriver.Chrome:
-        """ブラウザを開く"""
-        # ブラウザのオプション
-        options = webdriver.ChromeOptions()
-        options.add_argument("--no-sandbox")  # 保護機能を無効化
-        options.add_argument("--disable-gpu")  # GPUの使用を無効化
-        options.add_argument("--window-size=1920,1080")  # Windowサイズを1920x1080に設定
-        options.add_experimental_option("excludeSwitches", ["enable-logging"])  # ログを無効化
-        options.add_argument("--disable-extensions")  # 拡張機能を無効化
-        if not img_load:
-            options.add_argument("--blink-settings=imagesEnabled=false")  # 画像読み込みを無効化
-        if not gui:
-            options.add_argument("--headless")  # GUIを無効化
+        """ブラウザを開く
+
+        profileはbrowser_profile.PROFILESの名前(Noneの場合は環境変数SCRAPING_TOOLS_BROWSER_PROFILE)
+        環境変数SCRAPING_TOOLS_CAPTURE_NETWORKが有効な場合は、networkでレスポンスをキャプチャできる。
+        driverを指定した場合は、そのWebDriverをそのまま使用する。
+        """
+        browser_profile = get_profile(profile)
+        capture: bool = is_capture_enabled()
+
+        # 渡されたdriverはキャプチャしない
+        self.network: NetworkCapture = None
 
         # ブラウザを開く
         if not driver:
-            self.driver = webdriver.Chrome(options)
+            driver = webdriver.Chrome(_chrome_options(img_load, gui, browser_profile, capture))
+            driver, self.network = _instrument_driver(driver, "dlsite", browser_profile, capture)
+        self.driver = driver
         # 待機時間を設定
         self.timeout = timeout
 
         # Cookieの追加
-        self.driver.get("https://www.dlsite.com")
+        call_with_retry(self.driver.get, "https://www.dlsite.com", host=DLSITE_HOST)
         self.driver.add_cookie({"name": "adultchecked", "value": "1", "domain": ".dlsite.com"})
 
         return self.driver
@@ -182,6 +256,8 @@ class Work:
         show_type: str = None,
         AI_option: dict = None,
         language: str = "jp",
+        regist_date_start: date = None,
+        regist_date_end: date = None,
     ) -> list:
         """検索結果のURLを生成する
 
@@ -206,7 +282,7 @@ class Work:
         async def add_status() -> str:
             nonlocal status
 
-            if not status:
+            if not status or status == "all":
                 return "ana_flg/all/"
             elif status == "on_sale":  # 販売中
                 return "ana_flg/on_sale/"
@@ -310,6 +386,17 @@ class Work:
                 elif AI_option["hide_AI_use"]:
                     return "options_not[0]/AIP/"
 
+        # 販売日の範囲
+        async def add_regist_date() -> str:
+            nonlocal regist_date_start, regist_date_end
+
+            para = ""
+            if regist_date_start:
+                para += f"regist_date_start/{regist_date_start}/"
+            if regist_date_end:
+                para += f"regist_date_end/{regist_date_end}/"
+            return para
+
         # ベースのURL
         url = f"https://www.dlsite.com/maniax/fsr/=/language/{language}/"
         # 並行実行でパラメータを生成
@@ -323,6 +410,7 @@ class Work:
             add_page(),
             add_show_type(),
             add_AI_option(),
+            add_regist_date(),
         ]
         # パラメータを追加
         for task in await asyncio.gather(*tasks):
@@ -337,20 +425,471 @@ class Work:
         return decoded_url
 
     # ここから検索結果を取得するメソッド - - - - - - - - - - - - -
-    async def search(self, url: str) -> list:
-        """検索結果を取得する"""
+    @instrument("dlsite")
+    async def search(self, url: str, batch: bool = True) -> list:
+        """検索結果を取得する
+
+        batchがTrueの場合は1回のexecute_scriptで全作品の情報を取得する。
+        Falseの場合は作品毎にfind_elementで取得する(比較用)。
+        backendがhttpの場合はbatchに関わらずHTMLをパースして取得する。
+        """
+        if self.backend == "http":
+            works = await asyncio.to_thread(self._fetch_page_http, url)
+            logger.debug(f"{pformat(works)}")
+            return works
+
         # ブラウザを開く
-        self.driver.get(url)
+        call_with_retry(self.driver.get, url, host=DLSITE_HOST)
 
         # 作品リストを取得
         work_elms = WebDriverWait(self.driver, self.timeout).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "ul.n_worklist > *")))
 
-        # 各作品に対して並行で情報を取得する
-        tasks = [asyncio.create_task(self._get_work_info(work_elm)) for work_elm in work_elms]
-        works = await asyncio.gather(*tasks)
+        if batch:
+            cards: list[dict] = self.driver.execute_script(WORK_CARDS_SCRIPT)
+            works = [self._parse_work_card(card) for card in cards]
+        else:
+            # 各作品に対して並行で情報を取得する
+            tasks = [asyncio.create_task(self._get_work_info(work_elm)) for work_elm in work_elms]
+            works = await asyncio.gather(*tasks)
         logger.debug(f"{pformat(works)}")
         return works
 
+    @instrument("dlsite")
+    async def iter_search(
+        self,
+        *,
+        status: str = None,
+        work_type: dict = None,
+        keyword: str = None,
+        keyword_creater: str = None,
+        order: str = None,
+        show_type: str = None,
+        AI_option: dict = None,
+        language: str = "jp",
+        regist_date_start: date = None,
+        regist_date_end: date = None,
+        limit: int = None,
+        stop_id: str = None,
+    ) -> AsyncIterator[dict]:
+        """検索結果の全ページを順に取得し、作品を1件ずつ返す非同期ジェネレーター
+
+        引数はgen_urlと同じ(per_pageは100固定、pageは自動で進める)。
+        現在のページを返している間に次のページを先読みする(先読みは1ページまで)。
+        limit件返すか、stop_idの作品に到達したら終了する(stop_idの作品は返さない)。
+
+        Example:
+            >>> async for work in client.iter_search(keyword_creater="天知遥", order=await Work.gen_order(new=True), stop_id="RJ01000000"):
+            ...     print(work["id"])
+        """
+
+        async def fetch(page: int) -> list[dict]:
+            url = await Work.gen_url(
+                status=status,
+                work_type=work_type,
+                keyword=keyword,
+                keyword_creater=keyword_creater,
+                order=order,
+                per_page=ITER_SEARCH_PER_PAGE,
+                page=page,
+                show_type=show_type,
+                AI_option=AI_option,
+                language=language,
+                regist_date_start=regist_date_start,
+                regist_date_end=regist_date_end,
+            )
+            # ブラウザの操作はブロッキングなので別スレッドで実行する
+            return await asyncio.to_thread(self._fetch_page, url)
+
+        count = 0
+        page = 1
+        next_task: asyncio.Task = asyncio.create_task(fetch(page))
+        try:
+            while next_task:
+                works: list[dict] = await next_task
+                next_task = None
+                logger.debug(f"page {page}: {len(works)} works")
+
+                # ページが埋まっている場合は次のページを先読みする
+                if len(works) >= ITER_SEARCH_PER_PAGE:
+                    page += 1
+                    next_task = asyncio.create_task(fetch(page))
+
+                for work in works:
+                    if stop_id and work["id"] == stop_id:
+                        return
+                    yield work
+                    count += 1
+                    if limit and count >= limit:
+                        return
+        finally:
+            # 先読み中のページがあればブラウザの操作が終わるまで待つ
+            if next_task:
+                await asyncio.gather(next_task, return_exceptions=True)
+
+    # ここから検索を分割して並行で取得するメソッド - - - - - - - -
+    @staticmethod
+    async def plan_shards(
+        *,
+        status: str = None,
+        work_type: dict = None,
+        by_status: bool = False,
+        by_work_type: bool = False,
+        date_ranges: list[tuple[date, date]] = None,
+        max_results: int = SEARCH_RESULT_CAP,
+        counter: Callable[[dict], Awaitable[int]] = None,
+        **query: Any,
+    ) -> list[dict]:
+        """1つの検索条件を、重複しない複数の検索条件(シャード)に分割する
+
+        by_status: statusが未指定またはallの場合、販売中、予約中、予告中に分割する
+        by_work_type: work_typeで選択された作品形式ごとに分割する
+        date_ranges: 販売日の範囲(開始日, 終了日)ごとに分割する(split_date_rangeで生成できる)
+        max_results: シャードの作品数の上限。作品数を数えて、上限を超えるシャードは販売日の範囲を半分ずつに分割する
+            1日だけの範囲でも上限を超える場合と、作品数を取得できない場合は警告を出力する(Noneの場合は数えない)
+        counter: シャードの作品数を返す関数(省略した場合はcount_searchで検索結果のページから取得する)
+        その他の引数(keyword, orderなど)はそのまま全てのシャードに設定する。
+
+        Returns:
+            list[dict]: iter_searchの引数の辞書のリスト
+        """
+        # ステータスで分割
+        if by_status and status in (None, "all"):
+            statuses = [
+                await Work.gen_status(on_sale=True),
+                await Work.gen_status(preorder=True),
+                await Work.gen_status(upcoming=True),
+            ]
+        else:
+            statuses = [status]
+
+        # 作品形式で分割
+        if by_work_type and work_type and sum(work_type.values()) > 1:
+            work_types = [await Work.gen_work_type(**{WORK_TYPE_ARGS[key]: True}) for key, value in work_type.items() if value]
+        else:
+            work_types = [work_type]
+
+        # 販売日で分割
+        dates = date_ranges or [(query.pop("regist_date_start", None), query.pop("regist_date_end", None))]
+
+        shards = []
+        for status_, work_type_, (start, end) in itertools.product(statuses, work_types, dates):
+            shards.append(
+                {
+                    **query,
+                    "status": status_,
+                    "work_type": work_type_,
+                    "regist_date_start": start,
+                    "regist_date_end": end,
+                }
+            )
+
+        if max_results is not None:
+            shards = await Work._split_over_cap(shards, max_results, counter or Work.count_search)
+        logger.debug(f"planned {len(shards)} shards")
+
+        return shards
+
+    @staticmethod
+    async def _split_over_cap(shards: list[dict], max_results: int, counter: Callable[[dict], Awaitable[int]]) -> list[dict]:
+        """作品数がmax_resultsを超えるシャードを、販売日の範囲で上限以下になるまで分割する"""
+        result: list[dict] = []
+        pending: list[dict] = list(shards)
+        while pending:
+            counts: list[int] = await asyncio.gather(*[counter(shard) for shard in pending])
+            over: list[dict] = []
+            for shard, count in zip(pending, counts):
+                if count is None:
+                    logger.warning(f"can't read the number of works, keep the shard without splitting: {shard}")
+                    result.append(shard)
+                    continue
+                if count <= max_results:
+                    result.append(shard)
+                    continue
+                start: date = shard["regist_date_start"] or EARLIEST_REGIST_DATE
+                end: date = shard["regist_date_end"] or max(date.today(), start) + OPEN_END_MARGIN
+                if start >= end:
+                    logger.warning(f"shard has {count} works on {start}, more than {max_results} can be paged through: {shard}")
+                    result.append(shard)
+                    continue
+                ranges: list[tuple[date, date]] = Work.split_date_range(start, end, 2)
+                # 範囲が指定されていない側は開いたままにして、予約作品など範囲外の販売日の作品を落とさない
+                ranges[0] = (shard["regist_date_start"], ranges[0][1])
+                ranges[-1] = (ranges[-1][0], shard["regist_date_end"])
+                for range_start, range_end in ranges:
+                    over.append({**shard, "regist_date_start": range_start, "regist_date_end": range_end})
+            pending = over
+        return result
+
+    @staticmethod
+    async def count_search(shard: dict) -> int:
+        """検索条件(iter_searchの引数の辞書)に一致する作品数を、検索結果の1ページ目から取得する(取得できない場合はNone)"""
+        query: dict = {key: value for key, value in shard.items() if key not in ("limit", "stop_id")}
+        url: str = await Work.gen_url(**query, per_page=ITER_SEARCH_PER_PAGE, page=1)
+        res = await asyncio.to_thread(http_get, url, cookies=ADULT_COOKIES)
+        return Work._parse_total_count(res.text)
+
+    @staticmethod
+    def _parse_total_count(html: str) -> int:
+        """検索結果のHTMLから作品数(「1,234件中」の部分)を取得する"""
+        total = parse_html(html).select_one(".page_total strong")
+        if total is not None:
+            text: str = total.get_text()
+        else:
+            match = re.search(r"([\d,]+)\s*件中", html)
+            text = match.group(1) if match else ""
+        digits: str = text.replace(",", "").strip()
+        return int(digits) if digits.isdigit() else None
+
+    @staticmethod
+    def split_date_range(start: date, end: date, count: int) -> list[tuple[date, date]]:
+        """startからendまで(両端を含む)を重複しないcount個の期間に分割する"""
+        days: int = (end - start).days + 1
+        if days < 1:
+            raise ValueError("end must be start or later.")
+        count = min(count, days)
+
+        ranges = []
+        for i in range(count):
+            range_start: date = start + timedelta(days=days * i // count)
+            range_end: date = start + timedelta(days=days * (i + 1) // count - 1)
+            ranges.append((range_start, range_end))
+
+        return ranges
+
+    @classmethod
+    async def iter_shards(cls, shards: list[dict], workers: int = 4, backend: str = "http") -> AsyncIterator[dict]:
+        """シャードを最大workers個並行で取得し、作品IDで重複を除いて1件ずつ返す非同期ジェネレーター
+
+        ワーカーごとにWorkのインスタンス(ブラウザ)を作成する。
+
+        Example:
+            >>> shards = await Work.plan_shards(keyword="ASMR", by_status=True, date_ranges=Work.split_date_range(date(2020, 1, 1), date(2023, 12, 31), 8))
+            >>> async for work in Work.iter_shards(shards, workers=8):
+            ...     print(work["id"])
+        """
+        pending: list[dict] = list(shards)
+        # 全ワーカーの取得結果を受け取るキュー(溢れないよう上限を設定)
+        queue = asyncio.Queue(maxsize=ITER_SEARCH_PER_PAGE * workers)
+        done = object()
+
+        async def worker() -> None:
+            client = cls(backend=backend)
+            try:
+                while pending:
+                    shard: dict = pending.pop(0)
+                    async for work in client.iter_search(**shard):
+                        await queue.put(work)
+                await queue.put(done)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 例外は呼び出し元で発生させる
+                await queue.put(e)
+            finally:
+                if "driver" in client.__dict__:
+                    client.driver.quit()
+
+        tasks = [asyncio.create_task(worker()) for _ in range(min(workers, len(pending)))]
+        seen: set[str] = set()
+        finished = 0
+        try:
+            while finished < len(tasks):
+                item = await queue.get()
+                if item is done:
+                    finished += 1
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                # 作品IDで重複を除く
+                if item["id"] in seen:
+                    continue
+                seen.add(item["id"])
+                yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _fetch_page(self, url: str) -> list[dict]:
+        """検索結果のページを開いて作品情報のリストを返す
+
+        作品がない場合は空のリストを返す。
+        """
+        if self.backend == "http":
+            return self._fetch_page_http(url)
+
+        # ページを開く
+        call_with_retry(self.driver.get, url, host=DLSITE_HOST)
+
+        # 作品リストが表示されるまで待機
+        try:
+            WebDriverWait(self.driver, self.timeout).until(EC.presence_of_element_located((By.CSS_SELECTOR, "ul.n_worklist > *")))
+        except TimeoutException:
+            return []
+
+        cards: list[dict] = self.driver.execute_script(WORK_CARDS_SCRIPT)
+        return [self._parse_work_card(card) for card in cards]
+
+    def _fetch_page_http(self, url: str) -> list[dict]:
+        """検索結果のページをHTTPで取得して作品情報のリストを返す"""
+        res = http_get(url, cookies=ADULT_COOKIES)
+        cards: list[dict] = self._parse_search_html(res.text, res.url)
+        return [self._parse_work_card(card) for card in cards]
+
+    @staticmethod
+    def _parse_search_html(html: str, base_url: str) -> list[dict]:
+        """検索結果のHTMLから、WORK_CARDS_SCRIPTと同じ形式の作品情報を取得する"""
+        soup = parse_html(html)
+
+        cards = []
+        for elm in soup.select("ul.n_worklist > *"):
+
+            def text(selector: str) -> str:
+                e = elm.select_one(selector)
+                return e.get_text().strip() if e else None
+
+            def link(selector: str, *names: str) -> str:
+                e = elm.select_one(selector)
+                value = next((e.get(name) for name in names if e.get(name)), None) if e else None
+                return urllib.parse.urljoin(base_url, value) if value else None
+
+            cards.append(
+                {
+                    "expected_date": elm.select_one(".expected_date") is not None,
+                    "title": text(".work_name a"),
+                    "url": link(".work_name a", "href"),
+                    "thumbnail": link("img.lazy", *THUMBNAIL_ATTRIBUTES),
+                    "type": text(".work_category"),
+                    "work_price": text(".work_price"),
+                    "discount_price": text(".work_price.discount"),
+                    "strike": text(".strike"),
+                    "circle_name": text(".maker_name a"),
+                    "circle_url": link(".maker_name a", "href"),
+                }
+            )
+
+        return cards
+
+    @instrument("dlsite")
+    async def fetch_info(self, works: list, chunk_size: int = 100, concurrency: int = 4) -> dict[str, dict]:
+        """作品の販売数、価格、評価をproduct info APIからまとめて取得する
+
+        worksには作品IDのリスト、またはsearchの結果(作品情報の辞書)のリストを指定する。
+        IDをchunk_size件ずつのリクエストに分けて、最大concurrency件を並行で取得する。
+        作品情報の辞書が指定された場合は、取得した情報を辞書にマージする。
+
+        Returns:
+            dict[str, dict]: 作品IDをキーにしたsale_count, price, rate, review_count, wishlist_count
+        """
+        ids: list[str] = [work["id"] if isinstance(work, dict) else work for work in works]
+        # 重複を除いてチャンクに分割
+        unique_ids: list[str] = list(dict.fromkeys(ids))
+        chunks: list[list[str]] = [unique_ids[i : i + chunk_size] for i in range(0, len(unique_ids), chunk_size)]
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch_chunk(chunk: list[str]) -> dict:
+            async with semaphore:
+                res = await asyncio.to_thread(http_get, PRODUCT_INFO_URL, params={"product_id": ",".join(chunk)}, cookies=ADULT_COOKIES)
+            return res.json()
+
+        infos: dict[str, dict] = {}
+        for result in await asyncio.gather(*[fetch_chunk(chunk) for chunk in chunks]):
+            # 該当する作品がない場合は空のリストが返ってくる
+            if not result:
+                continue
+            for id, product in result.items():
+                infos[id] = self._parse_product_info(product)
+        logger.debug(f"fetched info of {len(infos)} works in {len(chunks)} requests")
+
+        # 作品情報の辞書にマージする(取得できなかった値で上書きしない)
+        for work in works:
+            if isinstance(work, dict) and work["id"] in infos:
+                work.update({key: value for key, value in infos[work["id"]].items() if value is not None})
+
+        return infos
+
+    @staticmethod
+    def _parse_product_info(product: dict) -> dict:
+        """product info APIのレスポンスを作品情報の形式に変換する"""
+
+        def to_int(value: Any) -> int:
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return None
+
+        def to_float(value: Any) -> float:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return None
+
+        # 価格(割引中の場合のみdiscountを設定)
+        base_price: int = to_int(product.get("official_price"))
+        current_price: int = to_int(product.get("price"))
+        if base_price is None:
+            price = None
+        else:
+            price = {"base": base_price, "discount": current_price if current_price is not None and current_price != base_price else None}
+
+        return {
+            "sale_count": to_int(product.get("dl_count")),
+            "price": price,
+            "rate": {
+                "average": to_float(product.get("rate_average_2dp")),
+                "count": to_int(product.get("rate_count")),
+            },
+            "review_count": to_int(product.get("review_count")),
+            "wishlist_count": to_int(product.get("wishlist_count")),
+        }
+
+    @staticmethod
+    def _parse_work_card(card: dict) -> dict:
+        """WORK_CARDS_SCRIPTが返した作品情報を_get_work_infoと同じ形式に変換する"""
+        # 状態
+        status = "upcoming" if card["expected_date"] else "on_sale"
+
+        # 価格(販売中の作品のみ)
+        price = None
+        if status == "on_sale":
+            try:
+                discount: bool = card["discount_price"] is not None
+                base_price: str = card["strike"] if discount else card["work_price"]
+                base_price: int = int(base_price.replace("円", "").replace(",", ""))
+                discount_price: int = int(card["discount_price"].replace("円", "").replace(",", "")) if discount else None
+            except Exception as e:
+                logger.error(f"can't get work price.")
+                price = ""
+            else:
+                price = {"base": base_price, "discount": discount_price}
+
+        # サークル情報
+        if card["circle_name"] is not None and card["circle_url"] is not None:
+            circle_info = {
+                "name": card["circle_name"],
+                "url": card["circle_url"],
+                "id": card["circle_url"].split("/")[-1].split(".")[0].replace(".html", ""),
+            }
+        else:
+            logger.error(f"can't get work circle info.")
+            circle_info = ""
+
+        url: str = card["url"] or ""
+        # 作品IDを取得
+        id = url.split("/")[-1].split(".")[0].replace(".html", "")
+
+        return {
+            "id": id,
+            "title": card["title"] or "",
+            "url": url,
+            "thumbnail": card["thumbnail"] or "",
+            "type": card["type"] or "",
+            "price": price,
+            "circle": circle_info,
+            "status": status,
+        }
+
     async def _get_work_info(self, work_elm: WebElement) -> dict:
         async def get_status() -> str:
             try:
@@ -384,7 +923,9 @@ class Work:
 
         async def get_work_thumbnail() -> str:
             try:
-                thumbnail = work_elm.find_element(By.CSS_SELECTOR, "img.lazy").get_attribute("src")
+                img = work_elm.find_element(By.CSS_SELECTOR, "img.lazy")
+                thumbnail = next((value for value in map(img.get_attribute, THUMBNAIL_ATTRIBUTES) if value), "")
+                thumbnail = urllib.parse.urljoin(self.driver.current_url, thumbnail) if thumbnail else ""
             except Exception as e:
                 logger.error(f"can't get work thumbnail.")
                 return ""
@@ -467,6 +1008,24 @@ class Work:
         }
 
 
+async def benchmark(url: str) -> dict:
+    """1ページあたりのWebDriverの往復回数をbatchの有無で比較する"""
+    client = Work()
+    client.open_browser()
+    result = {}
+    for batch in (False, True):
+        with count_commands(client.driver) as counter:
+            works = await client.search(url=url, batch=batch)
+        result["batch" if batch else "find_element"] = {
+            "round_trips": counter["count"],
+            "works": len(works),
+            "round_trips_per_work": counter["count"] / len(works) if works else None,
+        }
+    client.driver.quit()
+    logger.info(f"round trips per page: {pformat(result)}")
+    return result
+
+
 async def main():
     # url = await Work.gen_url(
     #     status=await Work.gen_status(on_sale=True),
@@ -481,16 +1040,18 @@ async def main():
     # )
     # print(url)
 
-    # 天知遥の発売中作品（発売日順）
-    test_url = "https://www.dlsite.com/maniax/fsr/=/language/jp/ana_flg/on_sale/keyword_creater/%E5%A4%A9%E7%9F%A5%E9%81%A5/order/release_d/per_page/50/page/1/show_type/0/options_and_or/and/options_not%5B0%5D/AIG/options_not%5B1%5D/AIP/"
-
     # スクレイピング
     client = Work()
     await client.open_browser(debug=True)
-    work_list = await client.search(url=test_url)
-    # 書き出し
-    with open("work_list.json", "w", encoding="utf-8") as f:
-        json.dump(work_list, f, indent=4, ensure_ascii=False)
+    # 天知遥の発売中作品（発売日順）を取得しながら1件ずつ書き出す
+    with JsonlWriter("work_list.jsonl") as writer:
+        async for work in client.iter_search(
+            status=await Work.gen_status(on_sale=True),
+            keyword_creater="天知遥",
+            order=await Work.gen_order(new=True),
+            AI_option=await Work.gen_AI_option(hide_AI_generate=True, hide_AI_use=True),
+        ):
+            writer.write(work)
 
 
 if __name__ == "__main__":
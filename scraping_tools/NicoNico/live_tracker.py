@@ -0,0 +1,240 @@
+from __future__ import annotations
+import heapq
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple
+
+from .niconico import NicoNicoLive, PROGRAM_STATUS, parse_embedded_data
+from ..common.common_func import http_get
+from ..common.timestamp import to_timestamp
+
+
+logger = logging.getLogger(__name__)
+
+
+class LiveEvent(NamedTuple):
+    """生放送の状態が変化したことを表すイベント"""
+
+    live_id: str
+    old_status: str
+    new_status: str
+    at: float
+
+
+def fetch_live_status(id: str) -> str:
+    """ブラウザを使わずに生放送の状態(future, now, past)を取得する
+
+    視聴ページのHTMLに埋め込まれている番組情報(embedded-data)から判定する。
+    """
+    res = http_get(f"https://live.nicovideo.jp/watch/{id}")
+    props: dict = parse_embedded_data(res.text)
+    if props is None:
+        return None
+    return PROGRAM_STATUS.get(props["program"]["status"])
+
+
+def fetch_live_statuses(ids: list[str], workers: int = 8) -> dict[str, str]:
+    """複数の生放送の状態を並行で取得する
+
+    複数のIDをまとめて問い合わせるAPIはないため、生放送1件につき視聴ページを1回取得する。
+    取得に失敗した生放送は結果に含めない。
+    """
+
+    def fetch(id: str) -> tuple[str, str]:
+        try:
+            return id, fetch_live_status(id)
+        except Exception as e:
+            logger.warning(f"failed to fetch live status. id: {id}, error: {e}")
+            return id, None
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(ids)) or 1) as executor:
+        results = executor.map(fetch, ids)
+
+    return {id: status for id, status in results if status}
+
+
+class NicoNicoLiveTracker:
+    """多数の生放送の状態の変化(future -> now -> past)を少ないリクエストで追跡するクラス
+
+    放送予定の生放送は開始予定時刻のlead秒前まで確認しない。
+    開始予定時刻が近づいたらwindow秒ごとに確認し、放送中になるか開始予定時刻を過ぎたら確認間隔を伸ばしていく。
+    確認時刻はwindow秒単位に揃えるので、開始予定時刻が近い生放送は1回のcheckerの呼び出しでまとめて確認される。
+
+    リクエストが減るのは確認する時刻と間隔を絞るためで、まとめて確認してもリクエスト自体は1つにならない。
+    既定のcheckerのfetch_live_statusesは生放送1件につき1回リクエストを送る。
+
+    Example:
+        >>> tracker = NicoNicoLiveTracker(on_event=print)
+        >>> for live in NicoNicoChannel("ch2646073").get_live():
+        ...     tracker.add(live)
+        >>> tracker.run_forever()
+    """
+
+    def __init__(
+        self,
+        checker: Callable[[list[str]], dict[str, str]] = fetch_live_statuses,
+        on_event: Callable[[LiveEvent], None] = None,
+        lead: float = 300,
+        window: float = 60,
+        live_min_interval: float = 60,
+        live_max_interval: float = 1800,
+        decay: float = 2.0,
+    ) -> None:
+        """確認方法と確認間隔を設定する
+
+        Args:
+            checker: 生放送IDのリストを受け取り、IDをキーにした状態の辞書を返す関数
+            on_event: 状態が変化した時に呼ばれる関数
+            lead (float): 開始予定時刻の何秒前から確認を始めるか
+            window (float): 開始前後の確認間隔(秒)。確認時刻はこの単位に揃える
+            live_min_interval (float): 放送中の最初の確認間隔(秒)
+            live_max_interval (float): 放送中の確認間隔の上限(秒)
+            decay (float): 放送中に確認する度に間隔を何倍にするか
+        """
+        self.checker = checker
+        self.on_event = on_event
+        self.lead = lead
+        self.window = window
+        self.live_min_interval = live_min_interval
+        self.live_max_interval = live_max_interval
+        self.decay = decay
+        self._statuses: dict[str, str] = {}
+        self._start_at: dict[str, float] = {}
+        # 現在の状態になってから確認した回数
+        self._checks: dict[str, int] = {}
+        # (次の確認時刻, 生放送ID)のヒープ
+        self._heap: list[tuple[float, str]] = []
+        self._next_check_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.request_count: int = 0
+
+    def add(self, live: NicoNicoLive, now: float = None) -> None:
+        """追跡する生放送を追加する
+
+        statusとstart_atが設定されている必要がある。過去放送は追加しない。
+        nowは最初の確認時刻を決める基準の時刻(省略した場合は現在時刻)
+        """
+        if live.status == "past":
+            return
+        if live.start_at is None:
+            raise ValueError(f"start_at is not set. id: {live.id}")
+        start_at: float = float(to_timestamp(live.start_at))
+        with self._lock:
+            self._statuses[live.id] = live.status
+            self._start_at[live.id] = start_at
+            self._checks[live.id] = 0
+            self._schedule(live.id, now if now is not None else time.time())
+
+    def remove(self, id: str) -> None:
+        """生放送の追跡をやめる"""
+        with self._lock:
+            self._forget(id)
+
+    def __len__(self) -> int:
+        return len(self._statuses)
+
+    def next_check_at(self) -> float:
+        """次に確認が必要になる時刻を返す(追跡中の生放送がない場合はNone)"""
+        with self._lock:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def poll(self, now: float = None) -> list[LiveEvent]:
+        """確認時刻を過ぎた生放送をまとめて確認し、状態が変化したイベントのリストを返す"""
+        now = now if now is not None else time.time()
+
+        # 確認時刻を過ぎた生放送を取り出す
+        with self._lock:
+            ids = []
+            while self._heap and self._heap[0][0] <= now:
+                check_at, id = heapq.heappop(self._heap)
+                if self._next_check_at.get(id) == check_at:
+                    ids.append(id)
+                    del self._next_check_at[id]
+        if not ids:
+            return []
+
+        # まとめてcheckerに渡す(失敗した場合は状態を変えずに次の確認時刻を決める)
+        try:
+            statuses: dict[str, str] = self.checker(ids)
+        except Exception as e:
+            logger.error(f"failed to check {len(ids)} lives: {e}")
+            statuses = {}
+        # 既定のcheckerは生放送1件につき1回リクエストを送る
+        self.request_count += len(ids)
+        logger.debug(f"checked {len(ids)} lives, {len(self)} tracking")
+
+        events = []
+        with self._lock:
+            for id in ids:
+                if id not in self._statuses:
+                    continue
+                old_status: str = self._statuses[id]
+                new_status: str = statuses.get(id, old_status)
+                if new_status != old_status:
+                    events.append(LiveEvent(id, old_status, new_status, now))
+                    self._statuses[id] = new_status
+                    self._checks[id] = 0
+                else:
+                    self._checks[id] += 1
+                # 過去放送になったら追跡をやめる
+                if new_status == "past":
+                    self._forget(id)
+                    continue
+                self._schedule(id, now)
+
+        for event in events:
+            logger.info(f"live status changed. id: {event.live_id}, {event.old_status} -> {event.new_status}")
+            if self.on_event:
+                self.on_event(event)
+
+        return events
+
+    def run_forever(self) -> None:
+        """stopが呼ばれるか、追跡中の生放送がなくなるまで確認を繰り返す"""
+        self._stop.clear()
+        while not self._stop.is_set():
+            next_check_at = self.next_check_at()
+            if next_check_at is None:
+                break
+            # 次の確認時刻まで待機
+            if self._stop.wait(timeout=max(next_check_at - time.time(), 0)):
+                break
+            self.poll()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _schedule(self, id: str, now: float) -> None:
+        """状態に応じて次の確認時刻を決める"""
+        status: str = self._statuses[id]
+        checks: int = self._checks[id]
+        if status == "now":
+            # 放送中は確認する度に間隔を伸ばす
+            check_at: float = now + min(self.live_max_interval, self.live_min_interval * self.decay**checks)
+        elif now >= self._start_at[id]:
+            # 開始予定時刻を過ぎても始まらない場合も確認する度に間隔を伸ばす
+            overdue_checks: int = int((now - self._start_at[id]) // self.window)
+            check_at = now + min(self.live_max_interval, self.window * self.decay ** min(checks, overdue_checks))
+        else:
+            # 開始予定時刻のlead秒前までは確認しない
+            check_at = max(self._start_at[id] - self.lead, now + self.window)
+        # 時間窓の境界に揃えて、近い時刻の生放送をまとめて確認する
+        check_at = math.ceil(check_at / self.window) * self.window
+        self._next_check_at[id] = check_at
+        heapq.heappush(self._heap, (check_at, id))
+
+    def _forget(self, id: str) -> None:
+        self._statuses.pop(id, None)
+        self._start_at.pop(id, None)
+        self._checks.pop(id, None)
+        self._next_check_at.pop(id, None)
+
+    def _drop_stale(self) -> None:
+        # 削除されたか、再スケジュールされて古くなったエントリを捨てる
+        while self._heap and self._next_check_at.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
@@ -1,11 +1,11 @@
 from __future__ import annotations
 from datetime import datetime, timedelta
+import html
 import re
 import requests
 import json
 import time
 import logging
-import feedparser
 import xml.etree.ElementTree as ET
 
 from selenium.webdriver.remote.webelement import WebElement
@@ -17,8 +17,10 @@ from selenium.common.exceptions import NoSuchElementException
 from bs4 import BeautifulSoup
 
 from ..common.base_class import ScrapingMixin, Platform, Live, Video, News
-from ..common.common_func import get_matching_element
-from my_utilities.debug import execute_time
+from ..common.common_func import get_matching_element, http_get, fetch_feed, parse_html
+from ..common.retry import TransientError
+from ..common.parsing import parse_datetime, parse_duration
+from ..common.metrics import instrument
 
 
 logger = logging.getLogger(__name__)
@@ -28,6 +30,18 @@ LIVE_ID_PATTERN = "^lv\d+$"
 VIDEO_ID_PATTERN = "^so\d+$"
 NEWS_ID_PATTERN = "^ar\d+$"
 
+# 視聴ページに埋め込まれている番組情報
+EMBEDDED_DATA_PATTERN = re.compile(r'<script[^>]*id="embedded-data"[^>]*data-props="([^"]*)"')
+# 番組情報のステータスとNicoNicoLive.statusの対応
+PROGRAM_STATUS = {
+    "RELEASED": "future",
+    "BEFORE_RELEASE": "future",
+    "ON_AIR": "now",
+    "ENDED": "past",
+}
+# 視聴ページのURL(キャプチャが有効な場合はHTMLのレスポンスから番組情報を取得する)
+WATCH_PAGE_PATTERN = r"^https://live\.nicovideo\.jp/watch/lv\d+"
+
 
 class NicoNicoChannel(ScrapingMixin):
     """ニコニコチャンネルのコンテンツを取得するクラス"""
@@ -39,6 +53,7 @@ class NicoNicoChannel(ScrapingMixin):
         self.id = id
 
     # トップページの生放送を取得する
+    @instrument("niconico")
     def get_live(self, limit: int = 10) -> list[NicoNicoLive]:
         """ニコニコチャンネルの生放送ページから一覧をスクレイピングする
 
@@ -55,7 +70,7 @@ class NicoNicoChannel(ScrapingMixin):
             page += 1
 
             # ページを開く
-            self._driver.get(f"https://ch.nicovideo.jp/{self.id}/live?page={page}")
+            self._get(f"https://ch.nicovideo.jp/{self.id}/live?page={page}")
 
             # 1ページ目は放送中、放送予定、過去放送の全てを取得
             if page == 1:
@@ -65,8 +80,8 @@ class NicoNicoChannel(ScrapingMixin):
                 lives.extend(self.__live_page(now=False, future=False, past=True))
 
             # 次のページがあるかどうかを確認
+            start = time.time()
             while True:
-                start = time.time()
                 next_buttons: list = self._driver.find_elements(By.XPATH, '//li[@class="next"]/a')
                 next_disableds: list = self._driver.find_elements(By.XPATH, '//li[@class="next disabled"]')
                 # どちらかの要素が見つかったらループを抜ける
@@ -74,7 +89,7 @@ class NicoNicoChannel(ScrapingMixin):
                     break
                 end = time.time()
                 if end - start > self._timeout:
-                    raise Exception("timeout")  # FIXME: 例外を作成する
+                    raise TransientError("timeout")
             # 次のページがない場合、フラグをFalseにする
             if next_disableds:
                 enable_next = False
@@ -113,6 +128,7 @@ class NicoNicoChannel(ScrapingMixin):
                     url=url,
                     thumbnail=thumbnail,
                 )
+                lives.append(live)
 
             # 結果を返す
             return lives
@@ -135,14 +151,7 @@ class NicoNicoChannel(ScrapingMixin):
                 thumbnail: str = item.find_element(By.XPATH, ".//img").get_attribute("src")
                 # 開始日時
                 start_at: str = item.find_element(By.XPATH, './/p[@class="date"]/strong').text  # ex:"09月23日 (土) 22時00分"
-                start_at: str = re.sub(r"\s*\([^)]*\)", "", start_at)  # 曜日部分を削除 ex:"09月23日 (土) 22時00分" -> "09月23日 22時00分"
-                start_at: datetime = datetime.strptime(start_at, "%m月%d日 %H時%M分")  # datetime型に変換
-                now = datetime.now()
-                if datetime.now().month > start_at.month:  # 月をまたいでいる場合は来年の月にする
-                    start_at = start_at.replace(year=now.year + 1)
-                else:
-                    start_at = start_at.replace(year=now.year)
-                start_at: str = start_at.isoformat()  # ISO8601形式に変換
+                start_at: datetime = parse_datetime(start_at)  # 月をまたいでいる場合は来年の日時になる
 
                 # 生放送情報を追加
                 live = NicoNicoLive(id)
@@ -156,6 +165,7 @@ class NicoNicoChannel(ScrapingMixin):
                     thumbnail=thumbnail,
                     start_at=start_at,
                 )
+                lives.append(live)
 
             # 結果を返す
             return lives
@@ -178,9 +188,7 @@ class NicoNicoChannel(ScrapingMixin):
                 thumbnail = item.find_element(By.XPATH, ".//img").get_attribute("src")
                 # 開始日時
                 start_at: str = item.find_element(By.XPATH, './/p[@class="date"]').text  # ex:"放送開始：2023/09/04 (月) 22:50:00"
-                start_at: str = re.sub(r"\s*\([^)]*\)", "", start_at)  # 曜日部分を削除
-                start_at: datetime = datetime.strptime(start_at, "放送開始：%Y/%m/%d %H:%M:%S")  # datetime型に変換
-                start_at: str = start_at.isoformat()  # ISO8601形式に変換
+                start_at: datetime = parse_datetime(start_at)
 
                 # 生放送情報を追加
                 live = NicoNicoLive(id)
@@ -222,6 +230,7 @@ class NicoNicoChannel(ScrapingMixin):
         return lives
 
     # トップページの動画を取得する
+    @instrument("niconico")
     def get_video(self, limit: int = 20) -> list[NicoNicoVideo]:
         """ニコニコチャンネルの動画ページから一覧をスクレイピングする"""
         logger.info(f"Scraping for NioNicoChannel's video page...")
@@ -240,21 +249,21 @@ class NicoNicoChannel(ScrapingMixin):
             page += 1
 
             # ページを開く
-            self._driver.get(f"https://ch.nicovideo.jp/{self.id}/video?page={page}")
+            self._get(f"https://ch.nicovideo.jp/{self.id}/video?page={page}")
 
             # 情報を取得
             videos.extend(self.__video_page())
 
             # 次のページがあるかどうかを確認
+            start = time.time()
             while True:
-                start = time.time()
                 next_buttons: list = self._driver.find_elements(By.XPATH, '//li[@class="next"]/a')
                 next_disableds: list = self._driver.find_elements(By.XPATH, '//li[@class="next disabled"]')
                 if next_buttons or next_disableds:
                     break
                 end = time.time()
                 if end - start > self._timeout:
-                    raise Exception("timeout")  # FIXME: 例外を作成する
+                    raise TransientError("timeout")
             # 次のページがない場合、フラグをFalseにする
             if next_disableds:
                 enable_next = False
@@ -285,8 +294,7 @@ class NicoNicoChannel(ScrapingMixin):
             thumbnail: str = item.find_element(By.XPATH, ".//img").get_attribute("src")
             # 投稿日時
             posted_at: str = item.find_element(By.XPATH, './/p[@class="time"]/time/var').get_attribute("title")
-            posted_at: datetime = datetime.strptime(posted_at, "%Y/%m/%d %H:%M")
-            posted_at: str = posted_at.isoformat()
+            posted_at: datetime = parse_datetime(posted_at)  # ex:"2023/09/04 22:50"
             # 再生回数
             try:
                 view_count: int = int(item.find_element(By.XPATH, './/li[@class="view "]/var').text.replace(",", ""))
@@ -297,14 +305,9 @@ class NicoNicoChannel(ScrapingMixin):
                 comment_count: int = int(item.find_element(By.XPATH, './/li[@class="comment "]/var').text.replace(",", ""))
             except NoSuchElementException:
                 comment_count = 0
-            # # マイリスト数
-            # try:
-            #     my_list_count: int = int(item.find_element(By.XPATH, './/li[@class="mylist "]//var').text.replace(",", ""))
-            # except NoSuchElementException:
-            #     my_list_count = 0
             # 再生時間
-            minute, second = item.find_element(By.XPATH, './/span[@class="badge br length"]').text.split(":")
-            duration: timedelta = timedelta(minutes=int(minute), seconds=int(second))
+            duration: str = item.find_element(By.XPATH, './/span[@class="badge br length"]').text  # ex:"12:34", "1:02:03"
+            duration: timedelta = parse_duration(duration)
             duration: int = int(duration.total_seconds())
 
             # 動画情報を追加
@@ -318,7 +321,6 @@ class NicoNicoChannel(ScrapingMixin):
                 posted_at=posted_at,
                 view_count=view_count,
                 comment_count=comment_count,
-                # my_list_count=my_list_count,
                 duration=duration,
             )
             videos.append(video)
@@ -326,6 +328,7 @@ class NicoNicoChannel(ScrapingMixin):
         return videos
 
     # トップページのニュースを取得する
+    @instrument("niconico")
     def get_news(self, limit: int = 5) -> list[NicoNicoChannelNews]:
         """チャンネルのニュースコンテンツを取得"""
         logger.info(f"Scraping for NioNicoChannel's news page...")
@@ -336,11 +339,7 @@ class NicoNicoChannel(ScrapingMixin):
     def __fetch_news_feed(self, limit: int) -> list[NicoNicoChannelNews]:
         """チャンネルのニュースをfeedを使って取得する"""
         # RSSフィードを取得
-        feed = feedparser.parse(f"https://ch.nicovideo.jp/{self.id}/blomaga/nico/feed")
-
-        # フィードのステータスを確認
-        if feed["status"] > 400 or feed["bozo"] != False:
-            raise Exception("feed err")  # FIXME: 例外を作成する
+        feed = fetch_feed(f"https://ch.nicovideo.jp/{self.id}/blomaga/nico/feed")
 
         newses = []
         # ニュースのアイテムを取得
@@ -358,8 +357,7 @@ class NicoNicoChannel(ScrapingMixin):
             # サムネイル
             thumbnail = entry["nicoch_article_thumbnail"]
             # 投稿日時
-            posted_at: datetime = datetime.strptime(entry["published"], "%a, %d %b %Y %H:%M:%S %z")  # ex:'Fri, 16 Jun 2023 12:00:00 +0900'
-            posted_at: str = posted_at.isoformat()
+            posted_at: datetime = parse_datetime(entry["published"])  # ex:'Fri, 16 Jun 2023 12:00:00 +0900'
 
             # ニュース情報を追加
             news = NicoNicoChannelNews(poster_id, id)
@@ -396,11 +394,7 @@ class NicoNicoChannel(ScrapingMixin):
         url = f"https://ch.nicovideo.jp/{handle}"
 
         # ページを取得
-        res = requests.get(url)
-
-        # ステータスコードを確認
-        if res.status_code > 400:
-            raise Exception("status code err")  # FIXME: 例外を作成する
+        res = http_get(url)
 
         # BS4でパース
         soup = BeautifulSoup(res.text, "html.parser")
@@ -419,6 +413,8 @@ class NicoNicoChannel(ScrapingMixin):
 class NicoNicoChannelNews(News):
     """ニュースの情報を管理するクラス"""
 
+    _platform = "NicoNico"
+
     def __init__(self, poster_id: str, id: str) -> None:
         """他のコンテンツと違い、ニュースはIDと投稿者IDが必要"""
         check_channel_id(poster_id)
@@ -433,13 +429,10 @@ class NicoNicoChannelNews(News):
         news.get_detail()
         return news
 
+    @instrument("niconico")
     def get_detail(self) -> None:
         # ページを取得
-        res = requests.get(f"https://ch.nicovideo.jp/{self.poster_id}/blomaga/{self.id}")
-
-        # ステータスコードを確認
-        if res.status_code >= 400:
-            raise Exception("status code err")  # FIXME
+        res = http_get(f"https://ch.nicovideo.jp/{self.poster_id}/blomaga/{self.id}")
 
         # BS4でパース
         soup = BeautifulSoup(res.text, "html.parser")
@@ -460,13 +453,11 @@ class NicoNicoChannelNews(News):
         thumbnail: str = json_ld["image"]["url"] if "image" in json_ld else ""
         # 投稿日時
         posted_at_text: str = json_ld["datePublished"]  # ex:"2023-09-16 19:03:00"
-        posted_at: datetime = datetime.strptime(posted_at_text, "%Y-%m-%d %H:%M:%S")
-        posted_at: str = posted_at.isoformat()
+        posted_at: datetime = parse_datetime(posted_at_text)
         # 更新日時
         if "dateModified" in json_ld:
             updated_at_text: str = json_ld["dateModified"]  # ex:"2023-09-16 23:13:17"
-            updated_at: datetime = datetime.strptime(updated_at_text, "%Y-%m-%d %H:%M:%S")
-            updated_at: str = updated_at.isoformat()
+            updated_at: datetime = parse_datetime(updated_at_text)
         else:
             updated_at = None
         # 内容
@@ -487,9 +478,20 @@ class NicoNicoChannelNews(News):
         return None
 
 
+def parse_embedded_data(page: str) -> dict:
+    """視聴ページのHTMLに埋め込まれている番組情報(embedded-data)を取得する(ない場合はNone)"""
+    match = EMBEDDED_DATA_PATTERN.search(page)
+    if not match:
+        return None
+    return json.loads(html.unescape(match.group(1)))
+
+
 class NicoNicoLive(Live, ScrapingMixin):
     """生放送の情報を管理するクラス"""
 
+    _platform = "NicoNico"
+    _capture_patterns = (WATCH_PAGE_PATTERN,)
+
     @classmethod
     def from_id(cls, id: str) -> NicoNicoLive:
         """IDから生放送情報を取得する"""
@@ -498,10 +500,23 @@ class NicoNicoLive(Live, ScrapingMixin):
         live.get_detail()
         return live
 
+    @instrument("niconico")
     def get_detail(self) -> None:
-        """生放送の詳細情報をスクレイピングで取得する"""
+        """生放送の詳細情報をスクレイピングで取得する
+
+        レスポンスのキャプチャが有効な場合は、描画を待たずに視聴ページのHTMLに埋め込まれた番組情報から取得する。
+        """
         # ページを開く
-        self._driver.get(f"https://live.nicovideo.jp/watch/{self.id}")
+        self._get(f"https://live.nicovideo.jp/watch/{self.id}")
+
+        # キャプチャした視聴ページのHTMLから取得
+        responses: list = self._wait_captured(WATCH_PAGE_PATTERN)
+        props: dict = parse_embedded_data(responses[-1].body) if responses else None
+        if props is not None:
+            self.__set_program(props)
+            return None
+        if self._network is not None:
+            logger.info("No embedded program data was captured. Scraping the rendered page instead.")
 
         # JSON-LDタグを取得
         json_ld: WebElement = self._wait.until(EC.presence_of_element_located((By.XPATH, '//script[@type="application/ld+json"]')))
@@ -533,31 +548,28 @@ class NicoNicoLive(Live, ScrapingMixin):
 
         # 開始時間
         start_at: str = json_ld["publication"]["startDate"]
-        start_at: datetime = datetime.fromisoformat(start_at)
-        start_at: str = start_at.isoformat()
+        start_at: datetime = parse_datetime(start_at)
 
         # 過去放送の場合
         if status == "past":
             end_at: str = json_ld["publication"]["endDate"]
-            end_at: datetime = datetime.fromisoformat(end_at)
-            end_at: str = end_at.isoformat()
+            end_at: datetime = parse_datetime(end_at)
             duration: timedelta = end_at - start_at
             duration: int = int(duration.total_seconds())
             # タイムシフトが有効な場合
             if is_timeshift_enabled:
                 timeshift_limit_at: WebElement = get_matching_element(base=self._driver, tag="time", attribute="class", pattern=r"^___program-viewing-period-date-time___.*$")
                 timeshift_limit_at: str = timeshift_limit_at.get_attribute("datetime")
-                timeshift_limit_at: datetime = datetime.strptime(timeshift_limit_at, "%Y-%m-%d %H:%M:%S")
-                timeshift_limit_at: str = timeshift_limit_at.isoformat()
+                timeshift_limit_at: datetime = parse_datetime(timeshift_limit_at)
             else:
                 timeshift_limit_at = None
         else:
             end_at = None
             duration = None
+            timeshift_limit_at = None
 
-        # 生放送オブジェクトを作成
-        live = NicoNicoLive(id)
-        live.set_value(
+        # 生放送情報を設定
+        self.update_value(
             poster_id=poster_id,
             title=title,
             url=url,
@@ -568,11 +580,61 @@ class NicoNicoLive(Live, ScrapingMixin):
             start_at=start_at,
             end_at=end_at,
             duration=duration,
-            timeshift_limit_at=timeshift_limit_at,
+            archive_enabled_at=timeshift_limit_at,
         )
 
         return None
 
+    def __set_program(self, props: dict) -> None:
+        """視聴ページに埋め込まれた番組情報から生放送情報を設定する"""
+        program: dict = props["program"]
+        supplier: dict = program.get("supplier") or {}
+
+        # ユーザーIDまたはチャンネルID
+        page_url: list = (supplier.get("pageUrl") or "").rstrip("/").split("/")
+        if page_url[-1]:
+            poster_id: str = page_url[-2] if page_url[-1] == "join" else page_url[-1]
+        elif supplier.get("supplierType") == "channel":
+            poster_id = f"ch{supplier.get('programProviderId')}"
+        else:
+            poster_id = supplier.get("programProviderId")
+        # サムネイル
+        thumbnail = program.get("thumbnail")
+        if isinstance(thumbnail, dict):
+            thumbnail = thumbnail.get("large") or thumbnail.get("small")
+        # 説明文(HTML)
+        description: str = program.get("description")
+        if description:
+            description = parse_html(description).get_text("\n")
+
+        # 生放送の種類(放送予定、放送中、過去放送)
+        status: str = PROGRAM_STATUS.get(program.get("status"))
+        # 過去放送の場合
+        if status == "past":
+            end_at: int = program.get("endTime")
+            duration: int = end_at - program["beginTime"] if end_at else None
+            timeshift_limit_at = ((props.get("programTimeshift") or {}).get("publication") or {}).get("expireTime")
+        else:
+            end_at = None
+            duration = None
+            timeshift_limit_at = None
+
+        # 生放送情報を設定
+        self.update_value(
+            poster_id=poster_id,
+            poster_name=supplier.get("name"),
+            title=program.get("title"),
+            url=f"https://live.nicovideo.jp/watch/{program.get('nicoliveProgramId') or self.id}",
+            thumbnail=thumbnail,
+            tags=[tag["text"] for tag in (program.get("tag") or {}).get("list", [])],
+            description=description,
+            status=status,
+            start_at=program.get("beginTime"),
+            end_at=end_at,
+            duration=duration,
+            archive_enabled_at=timeshift_limit_at,
+        )
+
     def __get_status(self) -> tuple[str, bool]:
         """生放送の状態を判別する"""
         status: str
@@ -602,6 +664,8 @@ class NicoNicoLive(Live, ScrapingMixin):
 class NicoNicoVideo(Video):
     """動画の情報を管理するクラス"""
 
+    _platform = "NicoNico"
+
     @classmethod
     def from_id(cls, id: str) -> NicoNicoVideo:
         """IDから動画情報を取得する"""
@@ -610,13 +674,11 @@ class NicoNicoVideo(Video):
         video.get_detail()
         return video
 
+    @instrument("niconico")
     def get_detail(self) -> None:
         """動画APIから情報を取得する"""
         # 動画情報を取得
-        res = requests.get(f"https://ext.nicovideo.jp/api/getthumbinfo/{self.id}")
-        # ステータスコードを確認
-        if res.status_code > 400:
-            raise Exception("status code err")  # FIXME
+        res = http_get(f"https://ext.nicovideo.jp/api/getthumbinfo/{self.id}")
 
         # テキストに変換
         res.text.encode("utf-8")
@@ -629,8 +691,7 @@ class NicoNicoVideo(Video):
         root = ET.fromstring(res.text)
 
         # 削除されているか
-        if not root.attrib["status"] == "ok":
-            is_deleted = True
+        is_deleted: bool = root.attrib["status"] != "ok"
 
         # ID
         id: str = root.find(".//video_id").text
@@ -649,19 +710,15 @@ class NicoNicoVideo(Video):
         thumbnail: str = root.find(".//thumbnail_url").text
         # 公開日時
         posted_at: str = root.find(".//first_retrieve").text
-        posted_at: datetime = datetime.fromisoformat(posted_at)
-        posted_at: str = posted_at.isoformat()
+        posted_at: datetime = parse_datetime(posted_at)
         # 再生時間
-        length_text: str = root.find(".//length").text
-        minute, second = length_text.split(":")
-        duration: timedelta = timedelta(minutes=int(minute), seconds=int(second))
+        length_text: str = root.find(".//length").text  # ex:"123:45"
+        duration: timedelta = parse_duration(length_text)
         duration: int = int(duration.total_seconds())
         # 再生数
         view_count: int = int(root.find(".//view_counter").text)
         # コメント数
         comment_count: int = int(root.find(".//comment_num").text)
-        # マイリスト数
-        my_list_count: int = int(root.find(".//mylist_counter").text)
         # タグ
         tags = []
         for tag in root.findall(".//tags/tag"):
@@ -681,7 +738,6 @@ class NicoNicoVideo(Video):
             posted_at=posted_at,
             view_count=view_count,
             comment_count=comment_count,
-            my_list_count=my_list_count,
             duration=duration,
             tags=tags,
             description=description,
@@ -3,7 +3,6 @@
 from __future__ import annotations
 import logging
 import json
-import feedparser
 import os
 from datetime import datetime, timedelta
 import requests
@@ -11,14 +10,31 @@ from bs4 import BeautifulSoup, Tag
 
 from googleapiclient.discovery import build
 import googleapiclient.discovery
+import googleapiclient.http
 import isodate
 
 from ..common.base_class import Platform, Live, Video
+from ..common.common_func import http_get, fetch_feed
+from ..common.retry import call_with_retry
+from ..common.replay import get_cassette, request_key
+from ..common.metrics import instrument
 
 
 logger = logging.getLogger(__name__)
 
 THUMBNAIL_SIZES = ("maxres", "standard", "high", "medium", "default")
+API_HOST = "www.googleapis.com"
+
+
+def _execute(request: googleapiclient.http.HttpRequest) -> dict:
+    """リトライ付きでAPIリクエストを実行する
+
+    記録/再生モード(replay.use_cassette)の場合はレスポンスを記録/再生する(APIキーは記録しない)
+    """
+    cassette = get_cassette()
+    if cassette is not None:
+        return cassette.call_json("youtube", request_key(request.uri), lambda: call_with_retry(request.execute, host=API_HOST))
+    return call_with_retry(request.execute, host=API_HOST)
 
 
 class YTChannel:
@@ -32,6 +48,7 @@ class YTChannel:
             id = self.search_channel_id(id)
         self.id = id
 
+    @instrument("youtube")
     def get_from_api(self, limit: int = 5, order: str = "date") -> list[str]:
         """チャンネルのコンテンツを取得するメソッド
 
@@ -43,7 +60,8 @@ class YTChannel:
         """
         # APIで情報を取得
         logger.info(f"Channel API requesting...")
-        res = self.client.search().list(channelId=self.id, part="snippet", maxResults=limit, type="video", order=order, safeSearch="none").execute()
+        request = self.client.search().list(channelId=self.id, part="snippet", maxResults=limit, type="video", order=order, safeSearch="none")
+        res = _execute(request)
         logger.info(f"Success to get Channel API response")
 
         # IDを取得
@@ -51,22 +69,20 @@ class YTChannel:
 
         return ids
 
+    @instrument("youtube")
     def get_ids_from_feed(self) -> list[str]:
         """チャンネルのコンテンツを取得するメソッド
 
         15件までしか取得できない"""
         # feedを取得
-        feed = feedparser.parse(f"https://www.youtube.com/feeds/videos.xml?channel_id={self.id}")
-
-        # feedが正しく取得できているか確認
-        if feed["status"] > 400 or feed["bozo"] != False:
-            raise Exception("Failed to get feed")  # FIXME
+        feed = fetch_feed(f"https://www.youtube.com/feeds/videos.xml?channel_id={self.id}")
 
         # IDのリストを作成
         ids = [item["yt_videoid"] for item in feed["entries"]]
 
         return ids
 
+    @instrument("youtube")
     def get_detail(self, ids: list) -> list:
         """コンテンツの詳細を取得するメソッド
 
@@ -83,10 +99,10 @@ class YTChannel:
 
         # APIで情報を取得
         logger.info(f"Video API requesting...")
-        snippet: dict = self.client.videos().list(id=",".join(ids), part="snippet").execute()
-        statistics: dict = self.client.videos().list(id=",".join(ids), part="statistics").execute()
-        streaming_details: dict = self.client.videos().list(id=",".join(ids), part="liveStreamingDetails").execute()
-        content_details: dict = self.client.videos().list(id=",".join(ids), part="contentDetails").execute()
+        snippet: dict = _execute(self.client.videos().list(id=",".join(ids), part="snippet"))
+        statistics: dict = _execute(self.client.videos().list(id=",".join(ids), part="statistics"))
+        streaming_details: dict = _execute(self.client.videos().list(id=",".join(ids), part="liveStreamingDetails"))
+        content_details: dict = _execute(self.client.videos().list(id=",".join(ids), part="contentDetails"))
         logger.info(f"Success to get Video API response")
 
         # # デバッグ用の出力
@@ -119,8 +135,7 @@ class YTChannel:
         # ID
         id = item["id"]
         # 投稿日時
-        posted_at = datetime.fromisoformat(item["snippet"]["publishedAt"])
-        posted_at: str = posted_at.isoformat()
+        posted_at = datetime.fromisoformat(item["snippet"]["publishedAt"].replace("Z", "+00:00"))
         # 投稿者ID
         poster_id = item["snippet"]["channelId"]
         # 投稿者URL
@@ -235,11 +250,8 @@ class YTChannel:
 
         # HTTPリクエストで情報を取得
         logger.info(f"Requesting {url}...")
-        res = requests.get(url)
-        if res.status_code >= 400:
-            raise Exception(f"Failed to get {url}")
-        else:
-            logger.info(f"Success to get {url}")
+        res = http_get(url)
+        logger.info(f"Success to get {url}")
 
         # soupを作成
         soup = BeautifulSoup(res.text, "html.parser")
@@ -252,9 +264,12 @@ class YTChannel:
 
 
 class YTVideo(Video):
+    _platform = "YouTube"
+
     def __init__(self, id: str) -> None:
         super().__init__(id)
 
+    @instrument("youtube")
     def get_detail(self) -> None:
         # TODO
         pass
@@ -266,9 +281,12 @@ class YTVideo(Video):
 
 
 class YTLive(Live):
+    _platform = "YouTube"
+
     def __init__(self, id: str) -> None:
         super().__init__(id)
 
+    @instrument("youtube")
     def get_detail(self) -> None:
         # TODO
         pass
@@ -12,3 +12,19 @@ from .YouTube.youtube import YTLive
 from .YouTube.youtube import YTVideo
 
 from .common.base_class import ScrapingMixin, Platform, Content, Live, Video, News
+from .common.retry import RetryPolicy, ScrapingError, TransientError, PermanentError, CircuitOpenError
+from .common.scheduler import WatchScheduler, WatchTarget
+from .common.store import ContentStore
+from .common.changes import ChangeStream, ChangeEvent
+from .common.export import JsonlWriter, CsvWriter, write_jsonl, write_csv
+from .common.snapshot import SnapshotReader, write_snapshot
+from .common.interning import memory_report, set_interning
+from .common.tag_index import TagIndex, TagVocabulary
+from .common.content_index import ContentIndex
+from .common.timestamp import Timestamp
+from .common.replay import Cassette, use_cassette
+from .common.metrics import enable_metrics, reset_metrics, render_prometheus, dump_metrics, start_metrics_server
+from .common.tracing import CommandTrace, enable_tracing, recent_traces, trace_commands
+from .common.profiling import enable_profiling, profile_scrape
+from .common.browser_profile import BrowserProfile, register_profile
+from .common.network_capture import CapturedResponse, NetworkCapture
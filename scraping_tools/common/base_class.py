@@ -2,10 +2,12 @@
 
 from __future__ import annotations
 from datetime import datetime, timedelta
+import logging
 import re
 import json
 import os
 import io
+import time
 from PIL import Image
 import requests
 from pprint import pformat
@@ -16,7 +18,67 @@ from selenium import webdriver
 from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import StaleElementReferenceException
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+
+from .retry import RetryPolicy, call_with_retry, get_host
+from .interning import INTERNED_FIELDS, intern_normalized, intern_tags, is_interning_enabled
+from .timestamp import TIMESTAMP_FIELDS, Timestamp, to_timestamp
+from .replay import get_cassette
+from . import metrics, tracing
+from .browser_profile import BrowserProfile, apply_blocking, apply_options, get_profile
+from .network_capture import CapturedResponse, NetworkCapture, enable_performance_log, is_capture_enabled
+
+
+logger = logging.getLogger(__name__)
+
+
+def _chrome_options(img_load: bool, gui: bool, profile: BrowserProfile, capture: bool) -> webdriver.ChromeOptions:
+    """Chromeの起動オプションを作成する"""
+    options = webdriver.ChromeOptions()
+    options.add_argument("--no-sandbox")  # 保護機能を無効化
+    options.add_argument("--disable-gpu")  # GPUの使用を無効化
+    options.add_argument("--window-size=1920,1080")  # Windowサイズを1920x1080に設定
+    options.add_experimental_option("excludeSwitches", ["enable-logging"])  # ログを無効化
+    options.add_argument("--disable-extensions")  # 拡張機能を無効化
+    # 画像読み込みの設定
+    if not img_load:
+        options.add_argument("--blink-settings=imagesEnabled=false")
+    # ヘッドレスモードの設定
+    if not gui:
+        options.add_argument("--headless")
+    # プロファイルの設定
+    apply_options(options, profile)
+    # レスポンスのキャプチャの設定
+    if capture:
+        enable_performance_log(options)
+    return options
+
+
+def _instrument_driver(
+    driver: webdriver.Chrome,
+    platform: str,
+    profile: BrowserProfile,
+    capture: bool = False,
+    capture_patterns: tuple = (),
+) -> tuple[webdriver.Chrome, NetworkCapture]:
+    """起動したWebDriverにURLのブロック、レスポンスのキャプチャ、計測、トレース、記録/再生を設定する
+
+    Returns:
+        tuple[webdriver.Chrome, NetworkCapture]: 使用するWebDriver(記録/再生モードの場合はラッパー)と、
+            キャプチャが有効な場合はNetworkCapture(無効な場合はNone)
+    """
+    apply_blocking(driver, profile)
+    network: NetworkCapture = NetworkCapture(driver, capture_patterns) if capture else None
+    # 計測が有効な場合はWebDriverのコマンドを計測する
+    metrics.instrument_driver(driver, platform)
+    # トレースが有効な場合はWebDriverのコマンドを記録する
+    if tracing.is_enabled():
+        tracing.trace_driver(driver)
+    # 記録/再生モードの場合
+    cassette = get_cassette()
+    if cassette is not None:
+        driver = cassette.wrap_driver(driver)
+    return driver, network
 
 
 class ScrapingMixin(object):
@@ -27,31 +89,79 @@ class ScrapingMixin(object):
     _wait: WebDriverWait
     _gui: bool = False
     _img_load: bool = False
+    _retry_policy: RetryPolicy = None
+    # 起動とページ読み込みの設定(browser_profile.PROFILESの名前、Noneの場合は環境変数SCRAPING_TOOLS_BROWSER_PROFILE)
+    _browser_profile: str = None
+    # レスポンスをキャプチャするか(Noneの場合は環境変数SCRAPING_TOOLS_CAPTURE_NETWORK)と、キャプチャするURLのパターン
+    _capture_network: bool = None
+    _capture_patterns: tuple = ()
+    _network: NetworkCapture = None
 
     def open_browser(self) -> None:
         """ブラウザを開く
 
         環境変数SCRAPING_TOOLS_HEADLESS_MODEがTrueの場合はヘッドレスモードで起動する。
+        記録/再生モード(replay.use_cassette)の場合は、ページを記録/再生するラッパーで包む。
+        ページ読み込みの待ち方やブロックするURLは_browser_profileのプロファイルで設定する。
+        キャプチャが有効な場合は、_capture_patternsに一致するレスポンスを_get_capturedで取得できるようにする。
         """
-        options = webdriver.ChromeOptions()
-        options.add_argument("--no-sandbox")  # 保護機能を無効化
-        options.add_argument("--disable-gpu")  # GPUの使用を無効化
-        options.add_argument("--window-size=1920,1080")  # Windowサイズを1920x1080に設定
-        options.add_experimental_option("excludeSwitches", ["enable-logging"])  # ログを無効化
-        options.add_argument("--disable-extensions")  # 拡張機能を無効化
-        # 画像読み込みの設定
-        if not self._img_load:
-            options.add_argument("--blink-settings=imagesEnabled=false")
-        # ヘッドレスモードの設定
-        if not self._gui:
-            options.add_argument("--headless")
+        profile = get_profile(self._browser_profile)
+        capture: bool = self._capture_enabled()
         # ブラウザを開く
-        self._driver = webdriver.Chrome(options)
+        driver = webdriver.Chrome(_chrome_options(self._img_load, self._gui, profile, capture))
+        platform: str = metrics.platform_of_module(type(self).__module__)
+        self._driver, network = _instrument_driver(driver, platform, profile, capture, self._capture_patterns)
+        if network is not None:
+            self._network = network
         # 待機時間を設定
         self._wait = WebDriverWait(self._driver, self._timeout)
 
         return self._driver
 
+    def _get(self, url: str) -> None:
+        """リトライ付きでページを開く
+
+        ホスト毎のサーキットブレーカーがopenの場合はCircuitOpenErrorを発生させる。
+        計測が有効な場合は、試行毎にページの読み込み時間を記録する。
+        キャプチャが有効な場合は、それまでにキャプチャしたレスポンスを破棄してから開く。
+        """
+        get = self._driver.get
+        if self._network is not None:
+            self._network.clear()
+        if metrics.is_enabled():
+            platform: str = metrics.platform_of_module(type(self).__module__)
+
+            def get(url: str) -> None:
+                started: float = time.perf_counter()
+                try:
+                    self._driver.get(url)
+                finally:
+                    metrics.observe_page_load(platform, time.perf_counter() - started)
+
+        call_with_retry(get, url, host=get_host(url), policy=self._retry_policy)
+
+    def _capture_enabled(self) -> bool:
+        return is_capture_enabled() if self._capture_network is None else self._capture_network
+
+    def _get_captured(self, url: str, pattern: str = None, count: int = 1, timeout: float = None) -> list[CapturedResponse]:
+        """ページを開き、URLがpattern(省略した場合は_capture_patterns)に一致するレスポンスを取得する
+
+        キャプチャが無効な場合や、タイムアウトまでにキャプチャできなかった場合はページを開いて空のリストを返す。
+        その場合は、呼び出し元で描画されたページからスクレイピングする。
+        """
+        self._get(url)
+        return self._wait_captured(pattern, count, timeout)
+
+    def _wait_captured(self, pattern: str = None, count: int = 1, timeout: float = None) -> list[CapturedResponse]:
+        """クリックやスクロールで送られたリクエストのレスポンスを待つ(キャプチャできなかった場合は空のリスト)"""
+        if self._network is None:
+            return []
+        try:
+            return self._network.wait_for(pattern, timeout or self._timeout, count)
+        except TimeoutException:
+            logger.warning(f"no captured response. pattern: {pattern or self._capture_patterns}")
+            return []
+
     def close_browser(self) -> None:
         """ブラウザを閉じる"""
         # インスタンス変数にブラウザが存在する場合は閉じる
@@ -75,9 +185,16 @@ class Platform:
         self.id = id
 
 
+# クラス毎の公開属性名のキャッシュ(Content._public_attributesで使用)
+_PUBLIC_ATTRIBUTES: dict[type, list[str]] = {}
+
+
 class Content:
     """コンテンツの基底クラス"""
 
+    # プラットフォーム名(ストアや索引のキーに使う)。サイト毎のサブクラスで設定する
+    _platform: str = None
+
     __slots__ = [
         "id",
         "poster_id",
@@ -100,8 +217,8 @@ class Content:
         self.title: str = None
         self.url: str = None
         self.thumbnail: str = None
-        self.posted_at: str = None
-        self.updated_at: str = None
+        self.posted_at: Timestamp = None
+        self.updated_at: Timestamp = None
         self.tags: list[str] = []
         self.is_deleted: bool = False
 
@@ -117,16 +234,27 @@ class Content:
             # 長すぎるリストは省略
             elif isinstance(value, list) and len(value) > 8:
                 values[key] = value[:8] + ["etc..."]
-            # datetimeは文字列に変換
+            # 日時は文字列に変換
+            elif isinstance(value, Timestamp):
+                values[key] = value.to_datetime().strftime("%Y-%m-%d %H:%M:%S")
             elif isinstance(value, datetime):
                 values[key] = value.strftime("%Y-%m-%d %H:%M:%S")
 
         return pformat(values)
 
     def __setattr__(self, __name: str, __value: Any) -> None:
-        # strは正規化
-        if isinstance(__value, str):
-            __value = unicodedata.normalize("NFKC", __value)
+        # 日時はUNIX時間の整数で保持する
+        if __name in TIMESTAMP_FIELDS:
+            __value = to_timestamp(__value)
+        # strは正規化(投稿者の情報は同じ文字列を共有する)
+        elif isinstance(__value, str):
+            if __name in INTERNED_FIELDS and is_interning_enabled():
+                __value = intern_normalized(__value)
+            else:
+                __value = unicodedata.normalize("NFKC", __value)
+        # タグは重複が多いので同じ文字列を共有する
+        elif __name == "tags" and isinstance(__value, list) and is_interning_enabled():
+            __value = intern_tags(__value)
 
         super().__setattr__(__name, __value)
 
@@ -143,18 +271,30 @@ class Content:
 
         return instance
 
-    def to_dict(self) -> dict:
-        # クラスの全ての属性名を取得
-        all_attributes = dir(self)
+    def _public_attributes(self) -> list[str]:
+        """メソッドとPrivate属性を除いた属性名のリストを取得する
 
-        # メソッドを除外
-        attributes = [attribute for attribute in all_attributes if not callable(getattr(self, attribute))]
-
-        # Private属性を除外
-        attributes = [attribute for attribute in attributes if not attribute.startswith("_")]
+        dir()による走査はクラス毎に1回だけ行い、結果をキャッシュする。
+        """
+        cls = type(self)
+        attributes: list[str] = _PUBLIC_ATTRIBUTES.get(cls)
+        if attributes is None:
+            # クラスの全ての属性名を取得し、メソッドとPrivate属性を除外
+            attributes = [attribute for attribute in dir(self) if not attribute.startswith("_") and not callable(getattr(self, attribute))]
+            _PUBLIC_ATTRIBUTES[cls] = attributes
+
+        # __slots__を持たないサブクラスのインスタンス属性を追加
+        instance_dict: dict = getattr(self, "__dict__", None)
+        if instance_dict:
+            extra = [attribute for attribute in instance_dict if not attribute.startswith("_") and attribute not in attributes]
+            if extra:
+                return attributes + extra
+
+        return attributes
 
+    def to_dict(self) -> dict:
         # 辞書に変換
-        dict_ = {attribute: getattr(self, attribute) for attribute in attributes}
+        dict_ = {attribute: getattr(self, attribute) for attribute in self._public_attributes()}
 
         return dict_
 
@@ -163,18 +303,9 @@ class Content:
 
         他のインスタンスとの差分を辞書で返す。
         """
-        # クラスの全ての属性名を取得
-        all_attributes = dir(self)
-
-        # メソッドを除外
-        attributes = [attribute for attribute in all_attributes if not callable(getattr(self, attribute))]
-
-        # private属性を除外
-        attributes = [attribute for attribute in attributes if not attribute.startswith("_")]
-
         # 差分を取得
         diff: list[dict[str, tuple]] = []
-        for attribute in attributes:
+        for attribute in self._public_attributes():
             if getattr(self, attribute) != getattr(other, attribute):
                 diff.append({attribute: (getattr(self, attribute), getattr(other, attribute))})
 
@@ -240,8 +371,8 @@ class Video(Content):
         title: str = None,
         url: str = None,
         thumbnail: str = None,
-        posted_at: str = None,
-        updated_at: str = None,
+        posted_at: datetime | str = None,
+        updated_at: datetime | str = None,
         tags: list[str] = None,
         is_deleted: bool = None,
         description: str = None,
@@ -278,8 +409,8 @@ class Video(Content):
         title: str = None,
         url: str = None,
         thumbnail: str = None,
-        posted_at: str = None,
-        updated_at: str = None,
+        posted_at: datetime | str = None,
+        updated_at: datetime | str = None,
         tags: list[str] = None,
         is_deleted: bool = None,
         description: str = None,
@@ -343,8 +474,8 @@ class Live(Content):
         title: str = None,
         url: str = None,
         thumbnail: str = None,
-        posted_at: str = None,
-        updated_at: str = None,
+        posted_at: datetime | str = None,
+        updated_at: datetime | str = None,
         tags: list[str] = None,
         is_deleted: bool = None,
         description: str = None,
@@ -352,10 +483,10 @@ class Live(Content):
         view_count: int = None,
         like_count: int = None,
         comment_count: int = None,
-        start_at: str = None,
-        end_at: str = None,
+        start_at: datetime | str = None,
+        end_at: datetime | str = None,
         status: str = None,
-        archive_enabled_at: str = None,
+        archive_enabled_at: datetime | str = None,
     ) -> None:
         """属性を設定する
 
@@ -389,8 +520,8 @@ class Live(Content):
         title: str = None,
         url: str = None,
         thumbnail: str = None,
-        posted_at: str = None,
-        updated_at: str = None,
+        posted_at: datetime | str = None,
+        updated_at: datetime | str = None,
         tags: list[str] = None,
         is_deleted: bool = None,
         description: str = None,
@@ -398,10 +529,10 @@ class Live(Content):
         view_count: int = None,
         like_count: int = None,
         comment_count: int = None,
-        start_at: str = None,
-        end_at: str = None,
+        start_at: datetime | str = None,
+        end_at: datetime | str = None,
         status: str = None,
-        archive_enabled_at: str = None,
+        archive_enabled_at: datetime | str = None,
     ) -> None:
         """属性を更新する
 
@@ -446,8 +577,8 @@ class News(Content):
         title: str = None,
         url: str = None,
         thumbnail: str = None,
-        posted_at: str = None,
-        updated_at: str = None,
+        posted_at: datetime | str = None,
+        updated_at: datetime | str = None,
         tags: list[str] = None,
         is_deleted: bool = None,
         body: str = None,
@@ -476,8 +607,8 @@ class News(Content):
         title: str = None,
         url: str = None,
         thumbnail: str = None,
-        posted_at: str = None,
-        updated_at: str = None,
+        posted_at: datetime | str = None,
+        updated_at: datetime | str = None,
         tags: list[str] = None,
         is_deleted: bool = None,
         body: str = None,
@@ -0,0 +1,141 @@
+from __future__ import annotations
+import logging
+import os
+from typing import Any, NamedTuple
+
+from selenium import webdriver
+
+
+logger = logging.getLogger(__name__)
+
+# 使用するプロファイル名を指定する環境変数
+BROWSER_PROFILE_ENV: str = "SCRAPING_TOOLS_BROWSER_PROFILE"
+# warmプロファイルで使い回すユーザーデータのディレクトリ
+DEFAULT_USER_DATA_DIR: str = os.path.join(os.path.expanduser("~"), ".cache", "scraping_tools", "chrome")
+
+# CDP(Network.setBlockedURLs)でブロックするURLのパターン
+FONT_URLS: tuple = ("*.woff", "*.woff?*", "*.woff2", "*.woff2?*", "*.ttf", "*.ttf?*", "*.otf", "*.otf?*", "*fonts.googleapis.com/*", "*fonts.gstatic.com/*")
+STYLE_URLS: tuple = ("*.css", "*.css?*")
+MEDIA_URLS: tuple = ("*.mp4", "*.mp4?*", "*.webm", "*.webm?*", "*.m3u8", "*.m3u8?*", "*.mp3", "*.mp3?*", "*.m4a", "*.m4a?*")
+ANALYTICS_URLS: tuple = (
+    "*google-analytics.com/*",
+    "*googletagmanager.com/*",
+    "*googletagservices.com/*",
+    "*googlesyndication.com/*",
+    "*doubleclick.net/*",
+    "*connect.facebook.net/*",
+    "*platform.twitter.com/*",
+    "*static.ads-twitter.com/*",
+    "*clarity.ms/*",
+    "*hotjar.com/*",
+    "*criteo.com/*",
+    "*criteo.net/*",
+)
+
+# バックグラウンドで動くサービスを無効にする起動オプション
+BACKGROUND_ARGS: tuple = (
+    "--disable-background-networking",
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+    "--disable-component-update",
+    "--disable-client-side-phishing-detection",
+    "--disable-default-apps",
+    "--disable-domain-reliability",
+    "--disable-sync",
+    "--disable-features=Translate,OptimizationHints,MediaRouter",
+    "--metrics-recording-only",
+    "--mute-audio",
+    "--no-default-browser-check",
+    "--no-first-run",
+)
+
+
+class BrowserProfile(NamedTuple):
+    """Chromeの起動とページ読み込みの設定
+
+    page_load_strategy:
+        normal: 画像などを含めてページの読み込みが終わるまで待つ(Seleniumの既定)
+        eager: DOMの構築が終わるまで待つ(DOMContentLoaded)
+        none: 待たない(要素はWebDriverWaitで待つ必要がある)
+    blocked_urls: ブロックするURLのパターン(CDPのNetwork.setBlockedURLs)
+    disable_background: バックグラウンドで動くサービス(更新の確認、同期など)を無効にする
+    user_data_dir: 使い回すユーザーデータのディレクトリ(キャッシュやCookieが残るので2回目以降の読み込みが速くなる)
+        Noneの場合は毎回新しいプロファイルで起動する
+    """
+
+    name: str
+    page_load_strategy: str = "normal"
+    blocked_urls: tuple = ()
+    disable_background: bool = False
+    user_data_dir: str = None
+
+
+PROFILES: dict[str, BrowserProfile] = {
+    # これまでと同じ設定
+    "default": BrowserProfile("default"),
+    # DOMの構築まで待ち、フォント、動画、解析用のスクリプトを読み込まない
+    "eager": BrowserProfile("eager", "eager", FONT_URLS + MEDIA_URLS + ANALYTICS_URLS, True),
+    # eagerに加えてCSSも読み込まない(要素のクリックや表示を待つ処理が不安定になる場合がある)
+    "lean": BrowserProfile("lean", "eager", FONT_URLS + STYLE_URLS + MEDIA_URLS + ANALYTICS_URLS, True),
+    # leanの設定でページの読み込みを待たない
+    "none": BrowserProfile("none", "none", FONT_URLS + STYLE_URLS + MEDIA_URLS + ANALYTICS_URLS, True),
+    # eagerの設定でユーザーデータを使い回す
+    "warm": BrowserProfile("warm", "eager", FONT_URLS + MEDIA_URLS + ANALYTICS_URLS, True, DEFAULT_USER_DATA_DIR),
+}
+
+
+def register_profile(profile: BrowserProfile) -> None:
+    """プロファイルを追加する(同じ名前のプロファイルは置き換える)"""
+    PROFILES[profile.name] = profile
+
+
+def get_profile(name: str = None) -> BrowserProfile:
+    """名前からプロファイルを取得する
+
+    nameがNoneの場合は環境変数SCRAPING_TOOLS_BROWSER_PROFILE、それもない場合はdefaultを使用する。
+    """
+    name = name or os.environ.get(BROWSER_PROFILE_ENV) or "default"
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"unknown browser profile: {name} (available: {', '.join(PROFILES)})")
+
+
+def _user_data_dir(path: str) -> str:
+    """使用中(ロックされている)でないユーザーデータのディレクトリを取得する
+
+    同じディレクトリは同時に1つのChromeしか使えないため、使用中の場合は連番を付けたディレクトリを使う。
+    """
+    for index in range(64):
+        candidate: str = path if index == 0 else f"{path}-{index}"
+        # Chromeの起動中はSingletonLock(シンボリックリンク)が存在する
+        if not os.path.lexists(os.path.join(candidate, "SingletonLock")):
+            os.makedirs(candidate, exist_ok=True)
+            return candidate
+    raise RuntimeError(f"all user data dirs are in use: {path}")
+
+
+def apply_options(options: webdriver.ChromeOptions, profile: BrowserProfile) -> webdriver.ChromeOptions:
+    """プロファイルの起動オプションを設定する"""
+    options.page_load_strategy = profile.page_load_strategy
+    if profile.disable_background:
+        for argument in BACKGROUND_ARGS:
+            options.add_argument(argument)
+    if profile.user_data_dir:
+        options.add_argument(f"--user-data-dir={_user_data_dir(profile.user_data_dir)}")
+    return options
+
+
+def apply_blocking(driver: Any, profile: BrowserProfile) -> None:
+    """プロファイルのURLのブロックを設定する
+
+    CDPの設定は開いているタブにのみ適用されるため、新しく開いたタブでは読み込まれる。
+    """
+    if not profile.blocked_urls:
+        return
+    if not hasattr(driver, "execute_cdp_cmd"):
+        logger.warning(f"browser profile {profile.name}: url blocking requires a Chromium based driver")
+        return
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(profile.blocked_urls)})
@@ -0,0 +1,168 @@
+from __future__ import annotations
+import logging
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+from .base_class import Content
+from .store import ContentStore, get_fields, get_platform
+
+
+logger = logging.getLogger(__name__)
+
+# (platform, type, id)
+Key = tuple[str, str, str]
+
+
+class ChangeEvent(NamedTuple):
+    """コンテンツの変化を表すイベント
+
+    kind: new(追加), deleted(前回の取得結果から消えた), changed(属性が変化した)
+    field, old, new: changedの場合のみ設定する
+    """
+
+    kind: str
+    platform: str
+    type: str
+    id: str
+    field: str = None
+    old: object = None
+    new: object = None
+    content: Content = None
+
+
+def _key(content: Content) -> Key:
+    return (get_platform(content), content.type, content.id)
+
+
+def _freeze(value: object) -> object:
+    return tuple(value) if isinstance(value, list) else value
+
+
+class _Subscriber(NamedTuple):
+    callback: Callable[[ChangeEvent], None]
+    fields: frozenset
+    kinds: frozenset
+
+    def accepts(self, event: ChangeEvent) -> bool:
+        if self.kinds and event.kind not in self.kinds:
+            return False
+        if self.fields and event.kind == "changed" and event.field not in self.fields:
+            return False
+        return True
+
+
+class ChangeStream:
+    """取得結果を前回の取得結果と比較して、変化をイベントとして流すクラス
+
+    前回の取得結果はメモリ上に属性値のタプルで保持する。storeを指定した場合はContentStoreに保存された値と比較する。
+    どちらの場合も値がNoneの属性は不明とみなし、前回の値から変化したとは扱わない。
+    購読者は属性名とイベントの種類で絞り込むことができ、変化があったものだけが通知される。
+
+    削除の検出は、取得元(チャンネルの一覧など)を表すscopeを指定した場合のみ行う。
+    同じscopeの前回の取得結果にあって今回ないコンテンツをdeletedとして通知するため、
+    scopeには一覧の全体を取得する処理の結果だけを渡す。
+
+    Example:
+        >>> stream = ChangeStream()
+        >>> stream.subscribe(print, fields=["status", "title"])
+        >>> for event in stream.publish(NicoNicoChannel("ch2646073").get_live(), scope="ch2646073:live"):
+        ...     pass
+    """
+
+    def __init__(self, store: ContentStore = None) -> None:
+        """比較方法を設定する
+
+        Args:
+            store: 比較と保存に使うContentStore(省略した場合はメモリ上で比較する)
+        """
+        self.store = store
+        # (platform, type, id)をキーにした属性値のタプル
+        self._snapshots: dict[Key, tuple] = {}
+        # scopeごとの前回の取得結果のキーの集合
+        self._scopes: dict[str, set[Key]] = {}
+        self._fields: dict[type, list[str]] = {}
+        self._subscribers: list[_Subscriber] = []
+
+    def subscribe(self, callback: Callable[[ChangeEvent], None], fields: Iterable[str] = None, kinds: Iterable[str] = None) -> None:
+        """イベントの購読者を追加する
+
+        Args:
+            callback: イベントを受け取る関数
+            fields: 通知するchangedイベントの属性名(省略した場合は全て)
+            kinds: 通知するイベントの種類(new, deleted, changed。省略した場合は全て)
+        """
+        self._subscribers.append(_Subscriber(callback, frozenset(fields or ()), frozenset(kinds or ())))
+
+    def publish(self, contents: Iterable[Content], scope: str = None) -> Iterator[ChangeEvent]:
+        """取得結果を比較してイベントを購読者に通知しながら1件ずつ返すジェネレーター(引数はdiffと同じ)"""
+        for event in self.diff(contents, scope):
+            for subscriber in self._subscribers:
+                if subscriber.accepts(event):
+                    subscriber.callback(event)
+            yield event
+
+    def diff(self, contents: Iterable[Content], scope: str = None) -> Iterator[ChangeEvent]:
+        """取得結果を前回の取得結果と比較してイベントを1件ずつ返すジェネレーター
+
+        比較した後、今回の取得結果を次回の比較対象にする。
+
+        Args:
+            contents: 取得結果
+            scope: 取得元を識別する文字列(WatchTarget.keyなど)。指定した場合は同じscopeの前回の取得結果から
+                消えたコンテンツをdeletedとして通知する(省略した場合は削除を検出しない)
+        """
+        contents = list(contents)
+        if self.store is not None:
+            yield from self._diff_with_store(contents)
+        else:
+            yield from self._diff_with_snapshot(contents)
+        if scope is not None:
+            yield from self._diff_scope(scope, {_key(content) for content in contents})
+
+    def _get_fields(self, content: Content) -> list[str]:
+        cls = type(content)
+        if cls not in self._fields:
+            self._fields[cls] = [field for field in get_fields(cls) if field != "id"]
+        return self._fields[cls]
+
+    def _diff_with_snapshot(self, contents: list[Content]) -> Iterator[ChangeEvent]:
+        for content in contents:
+            key: Key = _key(content)
+            fields: list[str] = self._get_fields(content)
+            # リストは後から変更されても比較に影響しないようにタプルにする
+            values: tuple = tuple(_freeze(getattr(content, field, None)) for field in fields)
+
+            previous: tuple = self._snapshots.get(key)
+            if previous is None:
+                self._snapshots[key] = values
+                yield ChangeEvent("new", *key, content=content)
+                continue
+            # ContentStoreと同じく、Noneの属性は不明とみなして前回の値を使う
+            values = tuple(old if new is None else new for old, new in zip(previous, values))
+            self._snapshots[key] = values
+            # タプルが一致しない場合のみ属性ごとに比較する
+            if previous != values:
+                for field, old, new in zip(fields, previous, values):
+                    if old != new:
+                        yield ChangeEvent("changed", *key, field, old, new, content)
+
+    def _diff_with_store(self, contents: list[Content]) -> Iterator[ChangeEvent]:
+        by_key: dict[Key, Content] = {_key(content): content for content in contents}
+        for change in self.store.upsert(contents):
+            content: Content = by_key.get((change.platform, change.type, change.id))
+            if change.is_new:
+                yield ChangeEvent("new", change.platform, change.type, change.id, content=content)
+                continue
+            for field, (old, new) in change.fields.items():
+                yield ChangeEvent("changed", change.platform, change.type, change.id, field, old, new, content)
+
+    def _diff_scope(self, scope: str, keys: set[Key]) -> Iterator[ChangeEvent]:
+        previous: set[Key] = self._scopes.get(scope)
+        self._scopes[scope] = keys
+        # 初回の取得結果は基準として扱う
+        if previous is None:
+            return
+        for key in sorted(previous - keys):
+            # 他のscopeにもないコンテンツは比較用の値も破棄する
+            if all(key not in other for other in self._scopes.values()):
+                self._snapshots.pop(key, None)
+            yield ChangeEvent("deleted", *key)
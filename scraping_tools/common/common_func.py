@@ -1,8 +1,13 @@
+import logging
 import time
 from datetime import datetime, timedelta
 import re
+from contextlib import contextmanager
 from functools import wraps
 
+import requests
+import feedparser
+from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -10,6 +15,26 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.remote.webelement import WebElement
 from selenium.common.exceptions import NoSuchElementException, TimeoutException, StaleElementReferenceException
 
+from .retry import RetryPolicy, TransientError, PermanentError, call_with_retry, get_host, raise_for_status, classify_status
+from .parsing import parse_duration
+from .replay import get_cassette
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# HTTPリクエストのタイムアウト秒数
+HTTP_TIMEOUT: int = 20
+
+# 高速なlxmlを使用する(requirements.txtに含まれているが、インストールされていない場合は標準のパーサーを使用する)
+try:
+    import lxml  # noqa: F401
+except ImportError:
+    HTML_PARSER: str = "html.parser"
+    logger.warning("lxml is not installed, parse HTML with html.parser (slower)")
+else:
+    HTML_PARSER: str = "lxml"
+
 
 # 正規表現に一致する要素を1つ取得する
 def get_matching_element(base: WebElement, tag: str, attribute: str, pattern: str, timeout: int = 10) -> WebElement:
@@ -90,32 +115,103 @@ def get_matching_all_elements(base: WebElement, tag: str, attribute: str, patter
             return match_elements
 
 
+# 最後の要素までスクロールして要素が追加されるまで待機する
+def scroll_until_count(driver: webdriver.Chrome, item_xpath: str, count: int, end_xpath: str = None, timeout: int = 10) -> int:
+    """最後の要素までスクロールし、要素数がcountを超えるまで待機する
+
+    end_xpathに一致する要素(「すべて表示しています」など)が現れた場合も待機を終了する。
+    タイムアウトした場合も例外は発生させず、その時点の要素数を返す。
+    """
+    # 最後の要素までスクロールして要素数を返すスクリプト(1往復で済ませる)
+    script = """
+        const count = document.evaluate(`count(${arguments[0]})`, document, null, XPathResult.NUMBER_TYPE, null).numberValue;
+        const last = document.evaluate(`(${arguments[0]})[last()]`, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        if (last) last.scrollIntoView();
+        const end = arguments[1] ? document.evaluate(arguments[1], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue : null;
+        return [count, end !== null];
+    """
+    result: list = [count, False]
+
+    def appended(driver: webdriver.Chrome) -> bool:
+        result[:] = driver.execute_script(script, item_xpath, end_xpath)
+        return result[0] > count or result[1]
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.2).until(appended)
+    except TimeoutException:
+        pass
+
+    return int(result[0])
+
+
+# 無限スクロールで追加された要素のみを順に取得する
+def iter_appended_elements(driver: webdriver.Chrome, item_xpath: str, limit: int, end_xpath: str = None, timeout: int = 10):
+    """無限スクロールのページから、新しく追加された要素のみを順に返すジェネレーター
+
+    取得済みの要素数を記録し、XPathの位置指定で未取得の要素だけを取得する。
+    limit個取得するか、end_xpathに一致する要素が現れるか、要素が追加されなくなったら終了する。
+    """
+    seen = 0
+    while seen < limit:
+        # 未取得の要素のみを取得
+        elements: list = driver.find_elements(By.XPATH, f"({item_xpath})[position() > {seen}]")
+        for element in elements[: limit - seen]:
+            seen += 1
+            yield element
+        if seen >= limit:
+            return
+
+        # 最後の要素までスクロールして要素が追加されるのを待つ
+        current = scroll_until_count(driver, item_xpath, seen, end_xpath=end_xpath, timeout=timeout)
+        # 要素が増えなかった場合は終了
+        if current <= seen:
+            return
+
+
+# WebDriverのコマンド数を数える
+@contextmanager
+def count_commands(driver: webdriver.Chrome):
+    """with文の中でWebDriverに送られたコマンド数(往復回数)を数える
+
+    Example:
+        >>> with count_commands(driver) as counter:
+        ...     driver.find_element(By.TAG_NAME, "body")
+        >>> counter["count"]
+        1
+    """
+    counter = {"count": 0}
+    # EventFiringWebDriver(記録・再生用のラッパーなど)はコマンドを内側のドライバに送るため、内側のexecuteを置き換える
+    driver = getattr(driver, "wrapped_driver", driver)
+    execute = driver.execute
+    # 既にインスタンス属性として置き換えられている場合(入れ子など)は元に戻す
+    overridden: bool = "execute" in vars(driver)
+
+    def counting_execute(*args, **kwargs):
+        counter["count"] += 1
+        return execute(*args, **kwargs)
+
+    driver.execute = counting_execute
+    try:
+        yield counter
+    finally:
+        if overridden:
+            driver.execute = execute
+        else:
+            del driver.execute
+
+
 # 時間文字列をtimedeltaオブジェクトに変換する
 def parse_video_duration(duration_str: str) -> timedelta:
     """時間文字列をtimedeltaオブジェクトに変換する
 
     例: 1:23:45 -> timedelta(hours=1, minutes=23, seconds=45)
+    解析はparsing.parse_durationで行い、同じ文字列の結果はキャッシュする。
     """
-    # 時間、分、秒に分割
-    parts: list = duration_str.split(":")
-    # 時間、分、秒を取得
-    if len(parts) == 3:
-        seconds: int = int(parts[-1])
-        minutes: int = int(parts[-2])
-        hours: int = int(parts[-3])
-    elif len(parts) == 2:
-        seconds: int = int(parts[-1])
-        minutes: int = int(parts[-2])
-        hours: int = 0
-    # 時間、分、秒に分割できなかった場合はエラー
-    else:
+    try:
+        return parse_duration(duration_str)
+    except ValueError:
         raise ValueError(f"invalid duration_str (duration_str:{duration_str})")
 
-    # timedelta オブジェクトを作成
-    video_duration = timedelta(hours=hours, minutes=minutes, seconds=seconds)
-
-    return video_duration
-
 
 # ブラウザを開く
 async def open_browser(timeout: int = 5, gui: bool = False, img_load: bool = False) -> webdriver:
@@ -137,3 +233,75 @@ async def open_browser(timeout: int = 5, gui: bool = False, img_load: bool = Fal
     browser.implicitly_wait(timeout)
 
     return browser
+
+
+# リトライ付きでGETリクエストを送る
+def http_get(url: str, policy: RetryPolicy = None, **kwargs) -> requests.Response:
+    """リトライ付きでGETリクエストを送る
+
+    ステータスコードが400以上の場合はTransientErrorまたはPermanentErrorを発生させる
+    記録/再生モード(replay.use_cassette)の場合はレスポンスを記録/再生する
+    """
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+
+    def send() -> requests.Response:
+        cassette = get_cassette()
+        if cassette is not None:
+            return cassette.http_get(requests.get, url, **kwargs)
+        return requests.get(url, **kwargs)
+
+    def get() -> requests.Response:
+        if not metrics.is_enabled():
+            return raise_for_status(send())
+        started: float = time.perf_counter()
+        try:
+            res: requests.Response = send()
+        except Exception:
+            metrics.observe_http(url, "error", time.perf_counter() - started, 0)
+            raise
+        metrics.observe_http(url, res.status_code, time.perf_counter() - started, len(res.content))
+        return raise_for_status(res)
+
+    return call_with_retry(get, host=get_host(url), policy=policy)
+
+
+# HTMLをパースする
+def parse_html(html: str) -> BeautifulSoup:
+    """HTMLをBeautifulSoupでパースする
+
+    lxmlを使用する(インストールされていない場合はimport時に警告を出して標準のhtml.parserを使用する)
+    """
+    with metrics.parse_timer():
+        return BeautifulSoup(html, HTML_PARSER)
+
+
+# リトライ付きでフィードを取得する
+def fetch_feed(url: str, policy: RetryPolicy = None) -> feedparser.FeedParserDict:
+    """リトライ付きでRSS/Atomフィードを取得する
+
+    ステータスコードがない場合(通信エラー)はTransientError、パースに失敗した場合はPermanentErrorを発生させる
+    記録/再生モード(replay.use_cassette)の場合はrequestsで取得したフィードを記録/再生する
+    """
+
+    def parse() -> feedparser.FeedParserDict:
+        started: float = time.perf_counter()
+        cassette = get_cassette()
+        if cassette is not None:
+            res: requests.Response = cassette.http_get(requests.get, url, timeout=HTTP_TIMEOUT)
+            feed = feedparser.parse(res.content, response_headers={name.lower(): value for name, value in res.headers.items()})
+            feed["status"] = res.status_code
+        else:
+            feed = feedparser.parse(url)
+        # feedparserは取得とパースを分けられないため、合計の時間をHTTPリクエストとして記録する
+        if metrics.is_enabled():
+            metrics.observe_http(url, feed.get("status", "error"), time.perf_counter() - started, 0)
+        # 通信エラーの場合はstatusが存在しない
+        if "status" not in feed:
+            raise TransientError(f"feed err. url: {url}, error: {feed.get('bozo_exception')}")
+        if feed["status"] >= 400:
+            raise classify_status(feed["status"], url)
+        if feed["bozo"]:
+            raise PermanentError(f"feed err. url: {url}, error: {feed.get('bozo_exception')}")
+        return feed
+
+    return call_with_retry(parse, host=get_host(url), policy=policy)
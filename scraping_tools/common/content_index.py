@@ -0,0 +1,254 @@
+from __future__ import annotations
+import logging
+from bisect import bisect_left, insort
+from typing import Any, Iterable, Iterator
+
+from .base_class import Content
+from .store import get_platform
+from .timestamp import to_timestamp
+
+
+logger = logging.getLogger(__name__)
+
+# ハッシュ索引を作る属性
+HASH_FIELDS = ("poster_id", "type", "status")
+# ソート済み索引を作る日時の属性
+SORTED_FIELDS = ("posted_at", "updated_at", "start_at", "end_at")
+
+# (platform, type, id)
+Key = tuple[str, str, str]
+
+
+def to_sort_key(value: Any) -> float:
+    """日時をソート用の数値(UNIX時間)に変換する(変換できない場合はNone)
+
+    タイムゾーンのない日時はTimestampと同じく日本時間とみなす。
+    """
+    try:
+        timestamp = to_timestamp(value)
+    except ValueError:
+        return None
+    return float(timestamp) if timestamp is not None else None
+
+
+class ContentIndex:
+    """コンテンツの集合に対する複数の索引
+
+    投稿者ID、種類、状態などはハッシュ索引、日時はソート済み索引で検索する。
+    addで追加したコンテンツは既存の索引に反映されるので、取得する度に作り直す必要はない。
+
+    Example:
+        >>> index = ContentIndex()
+        >>> index.add_all(NicoNicoChannel("ch2646073").get_video())
+        >>> index.add_all(NicoNicoChannel("ch2646073").get_live())
+        >>> index.query(
+        ...     where={"poster_id": "ch2646073", "type": "video"},
+        ...     between={"posted_at": (datetime(2024, 1, 1), None)},
+        ...     order_by="-posted_at",
+        ...     limit=20,
+        ... )
+    """
+
+    def __init__(self, hash_fields: Iterable[str] = HASH_FIELDS, sorted_fields: Iterable[str] = SORTED_FIELDS) -> None:
+        self.hash_fields: tuple[str, ...] = tuple(hash_fields)
+        self.sorted_fields: tuple[str, ...] = tuple(sorted_fields)
+        self._contents: dict[Key, Content] = {}
+        # 索引に登録した値(更新時に古いエントリを消すために使う)
+        self._indexed: dict[Key, tuple] = {}
+        # 属性名 -> 値 -> キーの集合
+        self._hash: dict[str, dict[Any, set[Key]]] = {field: {} for field in self.hash_fields}
+        # 属性名 -> (ソート用の数値, キー)の昇順のリスト
+        self._sorted: dict[str, list[tuple[float, Key]]] = {field: [] for field in self.sorted_fields}
+
+    @staticmethod
+    def _key(content: Content) -> Key:
+        return (get_platform(content), content.type, content.id)
+
+    def _values(self, content: Content) -> tuple:
+        hash_values = tuple(getattr(content, field, None) for field in self.hash_fields)
+        sort_keys = tuple(to_sort_key(getattr(content, field, None)) for field in self.sorted_fields)
+        return hash_values + sort_keys
+
+    def add(self, content: Content) -> None:
+        """コンテンツを追加する(追加済みの場合は置き換えて索引を更新する)"""
+        key: Key = self._key(content)
+        values: tuple = self._values(content)
+        old_values: tuple = self._indexed.get(key)
+        self._contents[key] = content
+        if old_values == values:
+            return
+        if old_values is not None:
+            self._unindex(key, old_values)
+        self._index(key, values)
+
+    def add_all(self, contents: Iterable[Content]) -> None:
+        for content in contents:
+            self.add(content)
+
+    def remove(self, content: Content) -> None:
+        """コンテンツを削除する"""
+        key: Key = self._key(content)
+        values: tuple = self._indexed.get(key)
+        if values is None:
+            return
+        self._unindex(key, values)
+        del self._contents[key]
+
+    def _index(self, key: Key, values: tuple) -> None:
+        self._indexed[key] = values
+        hash_count = len(self.hash_fields)
+        for field, value in zip(self.hash_fields, values[:hash_count]):
+            if value is not None:
+                self._hash[field].setdefault(value, set()).add(key)
+        for field, sort_key in zip(self.sorted_fields, values[hash_count:]):
+            if sort_key is not None:
+                insort(self._sorted[field], (sort_key, key))
+
+    def _unindex(self, key: Key, values: tuple) -> None:
+        del self._indexed[key]
+        hash_count = len(self.hash_fields)
+        for field, value in zip(self.hash_fields, values[:hash_count]):
+            if value is None:
+                continue
+            keys: set[Key] = self._hash[field].get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._hash[field][value]
+        for field, sort_key in zip(self.sorted_fields, values[hash_count:]):
+            if sort_key is None:
+                continue
+            entries = self._sorted[field]
+            i = bisect_left(entries, (sort_key, key))
+            if i < len(entries) and entries[i] == (sort_key, key):
+                del entries[i]
+
+    def __len__(self) -> int:
+        return len(self._contents)
+
+    def __contains__(self, content: Content) -> bool:
+        return self._key(content) in self._contents
+
+    def values(self, field: str) -> list:
+        """ハッシュ索引に登録されている値のリスト"""
+        return list(self._hash[field])
+
+    def _match(self, where: dict[str, Any]) -> set[Key]:
+        """等価条件に一致するキーの集合(条件がない場合はNone)"""
+        result: set[Key] = None
+        # 小さい集合から順に積集合を取る
+        candidates: list[set[Key]] = []
+        for field, value in where.items():
+            if field not in self._hash:
+                raise ValueError(f"{field} is not a hash indexed field.")
+            if isinstance(value, (list, tuple, set, frozenset)):
+                keys: set[Key] = set()
+                for item in value:
+                    keys |= self._hash[field].get(item, set())
+            else:
+                keys = self._hash[field].get(value, set())
+            candidates.append(keys)
+        for keys in sorted(candidates, key=len):
+            result = set(keys) if result is None else result & keys
+            if not result:
+                break
+        return result
+
+    def _range(self, field: str, start: Any, end: Any, descending: bool = False) -> Iterator[Key]:
+        """ソート済み索引からstart以上end未満のキーを順に返す"""
+        if field not in self._sorted:
+            raise ValueError(f"{field} is not a sorted indexed field.")
+        entries = self._sorted[field]
+        start_key, end_key = to_sort_key(start), to_sort_key(end)
+        low = bisect_left(entries, (start_key,)) if start_key is not None else 0
+        high = bisect_left(entries, (end_key,)) if end_key is not None else len(entries)
+        indexes = range(high - 1, low - 1, -1) if descending else range(low, high)
+        for i in indexes:
+            yield entries[i][1]
+
+    def iter_query(
+        self,
+        where: dict[str, Any] = None,
+        between: dict[str, tuple[Any, Any]] = None,
+        order_by: str = None,
+    ) -> Iterator[Content]:
+        """条件に一致するコンテンツを1件ずつ返す
+
+        Args:
+            where: ハッシュ索引の属性の等価条件。リストなどを指定した場合はいずれかに一致(IN)
+            between: 日時の属性の範囲条件(開始, 終了)。開始以上終了未満で、Noneは制限なし
+            order_by: 並び替える属性名。先頭に-を付けると降順。
+                ソート済み索引の属性で並び替える場合、値がないコンテンツは含まれない
+        """
+        where = where or {}
+        between = between or {}
+        descending: bool = bool(order_by) and order_by.startswith("-")
+        order_field: str = order_by.lstrip("-") if order_by else None
+
+        matched: set[Key] = self._match(where) if where else None
+        if matched is not None and not matched:
+            return
+
+        # 範囲条件の属性、または並び替える属性のソート済み索引を走査する
+        scan_field: str = None
+        if order_field in self._sorted:
+            scan_field = order_field
+        elif between:
+            scan_field = next(iter(between))
+
+        if scan_field is not None:
+            start, end = between.get(scan_field, (None, None))
+            keys: Iterable[Key] = self._range(scan_field, start, end, descending and scan_field == order_field)
+            # 等価条件の方が絞り込めていて並び替えが不要な場合は等価条件の結果を使う
+            if matched is not None and scan_field != order_field and len(matched) < len(self._sorted[scan_field]):
+                keys = matched
+                others = between
+            else:
+                others = {field: bounds for field, bounds in between.items() if field != scan_field}
+        else:
+            keys = matched if matched is not None else self._contents.keys()
+            others = between
+
+        # 残りの条件で絞り込む
+        ranges = {field: (to_sort_key(start), to_sort_key(end)) for field, (start, end) in others.items()}
+        hash_count = len(self.hash_fields)
+        results: Iterable[Content] = self._filter(keys, matched if keys is not matched else None, ranges, hash_count)
+
+        if order_field and order_field != scan_field:
+            # 索引のない属性は並び替える(Noneは最後)
+            results = list(results)
+            present = [content for content in results if getattr(content, order_field, None) is not None]
+            missing = [content for content in results if getattr(content, order_field, None) is None]
+            results = sorted(present, key=lambda content: getattr(content, order_field), reverse=descending) + missing
+        yield from results
+
+    def _filter(self, keys: Iterable[Key], matched: set[Key], ranges: dict[str, tuple[float, float]], hash_count: int) -> Iterator[Content]:
+        for key in keys:
+            if matched is not None and key not in matched:
+                continue
+            values: tuple = self._indexed[key]
+            ok = True
+            for field, (start, end) in ranges.items():
+                if field not in self._sorted:
+                    raise ValueError(f"{field} is not a sorted indexed field.")
+                sort_key = values[hash_count + self.sorted_fields.index(field)]
+                if sort_key is None or (start is not None and sort_key < start) or (end is not None and sort_key >= end):
+                    ok = False
+                    break
+            if ok:
+                yield self._contents[key]
+
+    def query(
+        self,
+        where: dict[str, Any] = None,
+        between: dict[str, tuple[Any, Any]] = None,
+        order_by: str = None,
+        limit: int = None,
+    ) -> list[Content]:
+        """条件に一致するコンテンツのリストを返す(引数はiter_queryと同じ)"""
+        results = []
+        for content in self.iter_query(where, between, order_by):
+            if limit is not None and len(results) >= limit:
+                break
+            results.append(content)
+        return results
@@ -0,0 +1,160 @@
+from __future__ import annotations
+import csv
+import gzip
+import json
+import logging
+from datetime import date, datetime
+from typing import Any, Iterable
+
+from .base_class import Content
+from .timestamp import TIMESTAMP_FIELDS, Timestamp
+
+# orjsonがインストールされていれば高速なシリアライザーを使用する
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+logger = logging.getLogger(__name__)
+
+
+def to_row(item: Content | dict) -> dict:
+    """ContentまたはDLsiteの作品情報の辞書を書き出し用の辞書に変換する
+
+    日時(Timestamp)はISO8601形式の文字列で書き出す。
+    """
+    if isinstance(item, Content):
+        row = item.to_dict()
+        for field in TIMESTAMP_FIELDS:
+            value = row.get(field)
+            if isinstance(value, Timestamp):
+                row[field] = value.isoformat()
+        return row
+    return item
+
+
+def _default(value: Any) -> Any:
+    """JSONに変換できない値の変換"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    if isinstance(value, Content):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(row: dict) -> bytes:
+    """辞書を1行のJSON(UTF-8)に変換する"""
+    if orjson is not None:
+        return orjson.dumps(row, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(row, ensure_ascii=False, default=_default).encode("utf-8")
+
+
+def _is_gzip(path: str, compress: bool) -> bool:
+    return compress if compress is not None else path.endswith(".gz")
+
+
+class JsonlWriter:
+    """ContentまたはDLsiteの作品情報を1件ずつJSON Linesで書き出すクラス
+
+    pathが.gzで終わる場合(またはcompress=True)はgzipで圧縮する。
+
+    Example:
+        >>> with JsonlWriter("videos.jsonl.gz") as writer:
+        ...     for video in channel.iter_video(limit=500):
+        ...         writer.write(video)
+    """
+
+    def __init__(self, path: str, compress: bool = None) -> None:
+        self.path = path
+        self.count: int = 0
+        if _is_gzip(path, compress):
+            self._file = gzip.open(path, "wb")
+        else:
+            self._file = open(path, "wb")
+
+    def write(self, item: Content | dict) -> None:
+        self._file.write(dumps(to_row(item)))
+        self._file.write(b"\n")
+        self.count += 1
+
+    def write_all(self, items: Iterable[Content | dict]) -> int:
+        for item in items:
+            self.write(item)
+        return self.count
+
+    def close(self) -> None:
+        self._file.close()
+        logger.debug(f"wrote {self.count} rows to {self.path}")
+
+    def __enter__(self) -> JsonlWriter:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+class CsvWriter:
+    """ContentまたはDLsiteの作品情報を1件ずつCSVで書き出すクラス
+
+    列はfieldsで指定する(省略した場合は最初の1件のキー)。
+    リストや辞書の値はJSON、datetimeはISO8601形式の文字列で書き出す。
+    pathが.gzで終わる場合(またはcompress=True)はgzipで圧縮する。
+    """
+
+    def __init__(self, path: str, fields: list[str] = None, compress: bool = None) -> None:
+        self.path = path
+        self.fields = fields
+        self.count: int = 0
+        if _is_gzip(path, compress):
+            self._file = gzip.open(path, "wt", encoding="utf-8", newline="")
+        else:
+            self._file = open(path, "w", encoding="utf-8", newline="")
+        self._writer: csv.DictWriter = None
+
+    def write(self, item: Content | dict) -> None:
+        row: dict = to_row(item)
+        # 最初の1件でヘッダーを書き出す
+        if self._writer is None:
+            self.fields = self.fields or list(row)
+            self._writer = csv.DictWriter(self._file, fieldnames=self.fields, extrasaction="ignore")
+            self._writer.writeheader()
+        self._writer.writerow({field: self._to_cell(row.get(field)) for field in self.fields})
+        self.count += 1
+
+    def write_all(self, items: Iterable[Content | dict]) -> int:
+        for item in items:
+            self.write(item)
+        return self.count
+
+    @staticmethod
+    def _to_cell(value: Any) -> Any:
+        if isinstance(value, (list, tuple, set, dict)):
+            return dumps(value).decode("utf-8")
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return value
+
+    def close(self) -> None:
+        self._file.close()
+        logger.debug(f"wrote {self.count} rows to {self.path}")
+
+    def __enter__(self) -> CsvWriter:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+def write_jsonl(items: Iterable[Content | dict], path: str, compress: bool = None) -> int:
+    """ContentまたはDLsiteの作品情報をJSON Linesで書き出し、書き出した件数を返す"""
+    with JsonlWriter(path, compress=compress) as writer:
+        return writer.write_all(items)
+
+
+def write_csv(items: Iterable[Content | dict], path: str, fields: list[str] = None, compress: bool = None) -> int:
+    """ContentまたはDLsiteの作品情報をCSVで書き出し、書き出した件数を返す"""
+    with CsvWriter(path, fields=fields, compress=compress) as writer:
+        return writer.write_all(items)
@@ -0,0 +1,121 @@
+from __future__ import annotations
+import sys
+import unicodedata
+from typing import Any, Iterable
+
+# 重複が多いので共有する属性(投稿者の情報はチャンネル内の全てのコンテンツで同じ)
+INTERNED_FIELDS = frozenset(["poster_id", "poster_name", "poster_url"])
+# プールの上限(超えたら空にして作り直す)
+MAX_POOL_SIZE = 200_000
+
+_enabled: bool = True
+# 正規化前の文字列をキーにした正規化済みの文字列
+_normalized_pool: dict[str, str] = {}
+# タグなど正規化しない文字列のプール
+_pool: dict[str, str] = {}
+
+
+def set_interning(enabled: bool) -> None:
+    """文字列の共有を有効または無効にする"""
+    global _enabled
+    _enabled = enabled
+
+
+def is_interning_enabled() -> bool:
+    return _enabled
+
+
+def clear_pool() -> None:
+    """プールを空にする(共有済みの文字列はそのまま)"""
+    _normalized_pool.clear()
+    _pool.clear()
+
+
+def intern_normalized(value: str) -> str:
+    """NFKCで正規化した文字列を共有する
+
+    同じ文字列の正規化は1回だけ行う。
+    """
+    result = _normalized_pool.get(value)
+    if result is None:
+        if len(_normalized_pool) >= MAX_POOL_SIZE:
+            _normalized_pool.clear()
+        normalized = unicodedata.normalize("NFKC", value)
+        result = _normalized_pool[value] = _pool.setdefault(normalized, normalized)
+    return result
+
+
+def intern_string(value: str) -> str:
+    """正規化せずに文字列を共有する"""
+    result = _pool.get(value)
+    if result is None:
+        if len(_pool) >= MAX_POOL_SIZE:
+            _pool.clear()
+        result = _pool[value] = value
+    return result
+
+
+def intern_tags(tags: list) -> list:
+    """タグのリストの各要素を共有する"""
+    return [intern_string(tag) if isinstance(tag, str) else tag for tag in tags]
+
+
+def _sizeof(value: Any, seen: set[int]) -> int:
+    """値のメモリ使用量(seenに含まれるオブジェクトは数えない)"""
+    if seen is not None:
+        if id(value) in seen:
+            return 0
+        seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_sizeof(item, seen) for item in value)
+    elif isinstance(value, dict):
+        size += sum(_sizeof(key, seen) + _sizeof(item, seen) for key, item in value.items())
+    return size
+
+
+def _attribute_values(content: Any) -> list:
+    names: list[str] = []
+    for klass in type(content).__mro__:
+        names.extend(klass.__dict__.get("__slots__", []))
+    values = [getattr(content, name, None) for name in names]
+    instance_dict: dict = getattr(content, "__dict__", None)
+    if instance_dict:
+        values.append(instance_dict)
+    return values
+
+
+def memory_report(contents: Iterable[Any]) -> dict:
+    """コンテンツのメモリ使用量を返す
+
+    bytes: 共有されているオブジェクトを1回だけ数えた実際の使用量
+    bytes_without_sharing: 全ての属性値が別々のオブジェクトだった場合の使用量(共有しない場合の見積もり)
+    None, True, Falseなどのシングルトンはどちらも数えない。
+
+    Example:
+        >>> videos = NicoNicoChannel("ch2646073").get_video(limit=1000)
+        >>> memory_report(videos)
+        {'count': 1000, 'bytes': ..., 'bytes_per_object': ..., 'bytes_without_sharing': ..., ...}
+    """
+    singletons: set[int] = {id(None), id(True), id(False)}
+    seen: set[int] = set(singletons)
+    count = 0
+    shared = 0
+    unshared = 0
+    for content in contents:
+        count += 1
+        object_size = sys.getsizeof(content)
+        shared += object_size
+        unshared += object_size
+        for value in _attribute_values(content):
+            shared += _sizeof(value, seen)
+            unshared += _sizeof(value, set(singletons))
+
+    return {
+        "count": count,
+        "bytes": shared,
+        "bytes_per_object": shared / count if count else 0.0,
+        "bytes_without_sharing": unshared,
+        "bytes_per_object_without_sharing": unshared / count if count else 0.0,
+        "saved_ratio": 1 - shared / unshared if unshared else 0.0,
+    }
@@ -0,0 +1,469 @@
+from __future__ import annotations
+import atexit
+import inspect
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Iterator
+from urllib.parse import urlsplit
+
+from . import profiling, tracing
+
+
+logger = logging.getLogger(__name__)
+
+# 計測を有効にする環境変数
+METRICS_ENV: str = "SCRAPING_TOOLS_METRICS"
+# 終了時にPrometheusのテキスト形式で書き出すファイル(指定した場合は計測も有効になる)
+METRICS_FILE_ENV: str = "SCRAPING_TOOLS_METRICS_FILE"
+
+# ヒストグラムのバケット(秒)
+DEFAULT_BUCKETS: tuple = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LABEL_NAMES: tuple = ("platform", "method")
+
+# ホスト名とプラットフォームの対応(スクレイピング処理の外で送られたリクエスト用)
+HOST_PLATFORMS: dict[str, str] = {
+    "nicovideo.jp": "niconico",
+    "nimg.jp": "niconico",
+    "nicochannel.jp": "channelplus",
+    "youtube.com": "youtube",
+    "googleapis.com": "youtube",
+    "dlsite.com": "dlsite",
+    "dlsite.jp": "dlsite",
+}
+
+_enabled: bool = os.environ.get(METRICS_ENV, "").lower() in ("1", "true") or bool(os.environ.get(METRICS_FILE_ENV))
+_lock = threading.Lock()
+# 実行中のスクレイピング処理のラベル(platform, method)
+_current: ContextVar[tuple] = ContextVar("scraping_metrics_labels", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    labels: list[str] = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+class Counter:
+    """ラベル毎に値を加算するカウンター"""
+
+    def __init__(self, name: str, help: str, label_names: tuple = LABEL_NAMES) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, labels: tuple, amount: float = 1.0) -> None:
+        with _lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def get(self, labels: tuple) -> float:
+        return self._values.get(labels, 0.0)
+
+    def reset(self) -> None:
+        with _lock:
+            self._values.clear()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with _lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """ラベル毎に値の分布(バケット毎の件数、合計、件数)を記録するヒストグラム"""
+
+    def __init__(self, name: str, help: str, label_names: tuple = LABEL_NAMES, buckets: tuple = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        # ラベル -> [バケット毎の件数..., +Infの件数, 合計]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float) -> None:
+        index: int = bisect_left(self.buckets, value)
+        with _lock:
+            values: list = self._values.get(labels)
+            if values is None:
+                values = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            values[index] += 1
+            values[-1] += value
+
+    def count(self, labels: tuple) -> int:
+        values: list = self._values.get(labels)
+        return sum(values[:-1]) if values else 0
+
+    def reset(self) -> None:
+        with _lock:
+            self._values.clear()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            items = sorted((labels, list(values)) for labels, values in self._values.items())
+        for labels, values in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values[:-1]):
+                cumulative += count
+                le: str = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket_label: str = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {values[-1]:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+# ----- メトリクスの定義 -----
+
+SCRAPES = Counter("scraping_scrapes_total", "スクレイピング処理の実行回数")
+SCRAPE_ERRORS = Counter("scraping_scrape_errors_total", "例外で終了したスクレイピング処理の数", LABEL_NAMES + ("error",))
+SCRAPE_SECONDS = Histogram("scraping_scrape_seconds", "スクレイピング処理全体の所要時間")
+ITEMS = Counter("scraping_items_total", "取得したアイテム(コンテンツ、作品情報)の数")
+PAGE_LOADS = Counter("scraping_page_loads_total", "ブラウザで開いたページの数")
+PAGE_LOAD_SECONDS = Histogram("scraping_page_load_seconds", "ブラウザでページを開くのにかかった時間")
+WEBDRIVER_COMMANDS = Counter("scraping_webdriver_commands_total", "WebDriverに送ったコマンドの数(往復回数)")
+WEBDRIVER_COMMAND_SECONDS = Histogram("scraping_webdriver_command_seconds", "WebDriverのコマンドの所要時間")
+HTTP_REQUESTS = Counter("scraping_http_requests_total", "HTTPリクエストの数", LABEL_NAMES + ("status",))
+HTTP_SECONDS = Histogram("scraping_http_request_seconds", "HTTPリクエストの所要時間")
+HTTP_BYTES = Counter("scraping_http_response_bytes_total", "HTTPレスポンスの本文のバイト数")
+PARSE_SECONDS = Histogram("scraping_parse_seconds", "HTML、XML、フィードのパースにかかった時間")
+
+REGISTRY: list = [
+    SCRAPES,
+    SCRAPE_ERRORS,
+    SCRAPE_SECONDS,
+    ITEMS,
+    PAGE_LOADS,
+    PAGE_LOAD_SECONDS,
+    WEBDRIVER_COMMANDS,
+    WEBDRIVER_COMMAND_SECONDS,
+    HTTP_REQUESTS,
+    HTTP_SECONDS,
+    HTTP_BYTES,
+    PARSE_SECONDS,
+]
+
+
+# ----- 有効/無効 -----
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable_metrics(enabled: bool = True) -> None:
+    """計測を有効(または無効)にする
+
+    無効の場合は、各処理で有効かどうかを確認するだけなので計測のコストはほぼかからない。
+    ブラウザのコマンド数は、有効にした後に開いたブラウザのみ計測する。
+    """
+    global _enabled
+    _enabled = enabled
+
+
+def reset_metrics() -> None:
+    """計測した値を全て消去する"""
+    for metric in REGISTRY:
+        metric.reset()
+
+
+# ----- ラベル -----
+
+
+def platform_of_url(url: str) -> str:
+    host: str = urlsplit(url).hostname or ""
+    for suffix, platform in HOST_PLATFORMS.items():
+        if host == suffix or host.endswith("." + suffix):
+            return platform
+    return "unknown"
+
+
+def platform_of_module(module: str) -> str:
+    """モジュール名(scraping_tools.NicoNico.niconicoなど)からプラットフォーム名を取得する"""
+    parts: list = module.split(".")
+    return parts[1].lower() if len(parts) > 2 and parts[0] == "scraping_tools" else "unknown"
+
+
+def current_labels(platform: str = "unknown") -> tuple:
+    """実行中のスクレイピング処理のラベル(処理の外の場合はplatformと空のmethod)"""
+    return _current.get() or (platform, "")
+
+
+# ----- 計測 -----
+
+
+def _count_items(result: Any) -> int:
+    if result is None:
+        return 0
+    if isinstance(result, (list, tuple, set, dict)):
+        return len(result)
+    return 1
+
+
+def instrument(platform: str) -> Callable:
+    """スクレイピング処理の所要時間、取得したアイテム数、例外を計測するデコレーター
+
+    methodのラベルは関数の修飾名(NicoNicoChannel.get_videoなど)。
+    処理中のHTTPリクエスト、ページの読み込み、WebDriverのコマンドにも同じラベルを付ける。
+    計測中の処理から呼ばれた別の処理(get_videoの中のiter_videoなど)は外側の処理として計測する。
+    ジェネレーターの場合は、返した要素をアイテムとして数え、最後まで回した時点までを所要時間とする。
+    トレース(tracing.enable_tracing)が有効な場合は、処理中のWebDriverのコマンドを記録して集計する。
+    プロファイル(profiling.enable_profiling)が有効な場合は、処理毎にプロファイルを書き出す。
+
+    Example:
+        >>> @instrument("niconico")
+        ... def get_video(self, limit: int = 20) -> list[NicoNicoVideo]:
+    """
+
+    def decorator(func: Callable) -> Callable:
+        method: str = func.__qualname__
+        labels: tuple = (platform, method)
+
+        def active() -> bool:
+            return (_enabled or tracing.is_enabled() or profiling.is_enabled()) and _current.get() is None
+
+        def start() -> tuple:
+            if _enabled:
+                SCRAPES.inc(labels)
+            trace = tracing.begin_scrape(f"{platform}:{method}") if tracing.is_enabled() else None
+            job = profiling.begin_job(f"{platform}_{method}") if profiling.is_enabled() else None
+            return time.perf_counter(), trace, job
+
+        def enter(trace: Any) -> tuple:
+            # ラベルとトレースは処理を進めている間だけ設定する(呼び出し元の処理には付けない)
+            return _current.set(labels), tracing._current.set(trace) if trace is not None else None
+
+        def leave(tokens: tuple) -> None:
+            _current.reset(tokens[0])
+            if tokens[1] is not None:
+                tracing._current.reset(tokens[1])
+
+        def finish(started: float, trace: Any, job: Any, items: int, error: BaseException = None) -> None:
+            if job is not None:
+                profiling.end_job(job)
+            if trace is not None:
+                tracing.end_scrape(trace, items)
+            if not _enabled:
+                return
+            SCRAPE_SECONDS.observe(labels, time.perf_counter() - started)
+            if items:
+                ITEMS.inc(labels, items)
+            if error is not None:
+                SCRAPE_ERRORS.inc(labels + (type(error).__name__,))
+
+        if inspect.isasyncgenfunction(func):
+
+            @wraps(func)
+            async def async_gen_wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not active():
+                    async for item in func(*args, **kwargs):
+                        yield item
+                    return
+                (started, trace, job), items, error = start(), 0, None
+                generator = func(*args, **kwargs)
+                try:
+                    while True:
+                        tokens = enter(trace)
+                        try:
+                            item = await generator.__anext__()
+                        except StopAsyncIteration:
+                            break
+                        finally:
+                            leave(tokens)
+                        items += 1
+                        yield item
+                except GeneratorExit:
+                    # 呼び出し元が途中で止めた場合はエラーとして数えない
+                    raise
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    await generator.aclose()
+                    finish(started, trace, job, items, error)
+
+            return async_gen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not active():
+                    return await func(*args, **kwargs)
+                (started, trace, job), result, error = start(), None, None
+                tokens = enter(trace)
+                try:
+                    result = await func(*args, **kwargs)
+                    return result
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    leave(tokens)
+                    finish(started, trace, job, _count_items(result), error)
+
+            return async_wrapper
+
+        if inspect.isgeneratorfunction(func):
+
+            @wraps(func)
+            def gen_wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not active():
+                    return (yield from func(*args, **kwargs))
+                (started, trace, job), items, error = start(), 0, None
+                generator = func(*args, **kwargs)
+                try:
+                    while True:
+                        tokens = enter(trace)
+                        try:
+                            item = next(generator)
+                        except StopIteration:
+                            break
+                        finally:
+                            leave(tokens)
+                        items += 1
+                        yield item
+                except GeneratorExit:
+                    # 呼び出し元が途中で止めた場合はエラーとして数えない
+                    raise
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    generator.close()
+                    finish(started, trace, job, items, error)
+
+            return gen_wrapper
+
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not active():
+                return func(*args, **kwargs)
+            (started, trace, job), result, error = start(), None, None
+            tokens = enter(trace)
+            try:
+                result = func(*args, **kwargs)
+                return result
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                leave(tokens)
+                finish(started, trace, job, _count_items(result), error)
+
+        return wrapper
+
+    return decorator
+
+
+def observe_http(url: str, status: int, seconds: float, size: int) -> None:
+    """HTTPリクエストを記録する(statusは通信エラーの場合"error")"""
+    labels: tuple = current_labels(platform_of_url(url))
+    HTTP_REQUESTS.inc(labels + (str(status),))
+    HTTP_SECONDS.observe(labels, seconds)
+    if size:
+        HTTP_BYTES.inc(labels, size)
+
+
+def observe_page_load(platform: str, seconds: float) -> None:
+    labels: tuple = current_labels(platform)
+    PAGE_LOADS.inc(labels)
+    PAGE_LOAD_SECONDS.observe(labels, seconds)
+
+
+@contextmanager
+def parse_timer(platform: str = "unknown") -> Iterator[None]:
+    """with文の中のパースにかかった時間を記録する"""
+    if not _enabled:
+        yield
+        return
+    started: float = time.perf_counter()
+    try:
+        yield
+    finally:
+        PARSE_SECONDS.observe(current_labels(platform), time.perf_counter() - started)
+
+
+def instrument_driver(driver: Any, platform: str = "unknown") -> Any:
+    """WebDriverに送るコマンドの数と所要時間を計測するようにする(無効の場合は何もしない)"""
+    if not _enabled:
+        return driver
+    execute: Callable = driver.execute
+
+    def instrumented_execute(driver_command: str, params: dict = None) -> Any:
+        labels: tuple = current_labels(platform)
+        WEBDRIVER_COMMANDS.inc(labels)
+        started: float = time.perf_counter()
+        try:
+            return execute(driver_command, params)
+        finally:
+            WEBDRIVER_COMMAND_SECONDS.observe(labels, time.perf_counter() - started)
+
+    driver.execute = instrumented_execute
+    return driver
+
+
+# ----- 書き出し -----
+
+
+def render_prometheus() -> str:
+    """計測した値をPrometheusのテキスト形式で返す"""
+    lines: list[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def dump_metrics(path: str) -> None:
+    """計測した値をPrometheusのテキスト形式でファイルに書き出す(node_exporterのtextfile collectorなど用)"""
+    # 書き出し途中のファイルを読まれないように一時ファイルから置き換える
+    temp_path: str = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(temp_path, path)
+
+
+def start_metrics_server(port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """/metricsで計測した値を返すHTTPサーバーをバックグラウンドで起動する
+
+    停止する場合は、返したサーバーのshutdown()を呼ぶ。
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body: bytes = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug(f"metrics server: {format % args}")
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"metrics server started at http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+if os.environ.get(METRICS_FILE_ENV):
+    atexit.register(dump_metrics, os.environ[METRICS_FILE_ENV])
@@ -0,0 +1,131 @@
+from __future__ import annotations
+import base64
+import json
+import logging
+import os
+import re
+from typing import Any, NamedTuple
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+logger = logging.getLogger(__name__)
+
+# ネットワークのキャプチャを有効にする環境変数
+CAPTURE_ENV: str = "SCRAPING_TOOLS_CAPTURE_NETWORK"
+
+
+class CapturedResponse(NamedTuple):
+    """キャプチャしたレスポンス
+
+    bodyはJSONの場合はパースした値、それ以外(HTMLなど)の場合は文字列。
+    """
+
+    url: str
+    status: int
+    mime_type: str
+    body: Any
+
+
+def is_capture_enabled() -> bool:
+    return os.environ.get(CAPTURE_ENV, "").lower() in ("1", "true")
+
+
+def enable_performance_log(options: webdriver.ChromeOptions) -> webdriver.ChromeOptions:
+    """ChromeDriverのパフォーマンスログ(CDPのNetworkイベント)を有効にする"""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return options
+
+
+class NetworkCapture:
+    """パフォーマンスログから、登録したURLパターンに一致するレスポンスの本文を取得するクラス
+
+    SPAがXHRで取得するJSONを、描画を待たずにそのまま使うために使用する。
+    パフォーマンスログ(enable_performance_log)を有効にしたChromeのWebDriverが必要。
+    キャプチャできるのは操作中のタブのレスポンスのみ。
+
+    Example:
+        >>> capture = NetworkCapture(driver, [r"/fc/fanclub_sites/\\d+/video_pages\\?"])
+        >>> capture.clear()
+        >>> driver.get(url)
+        >>> responses = capture.wait_for(timeout=10)
+    """
+
+    def __init__(self, driver: Any, patterns: list[str] = ()) -> None:
+        self._driver = driver
+        self._patterns: list[re.Pattern] = [re.compile(pattern) for pattern in patterns]
+        # 本文の受信を待っているレスポンス(requestId -> (url, status, mimeType))
+        self._pending: dict[str, tuple] = {}
+        self.responses: list[CapturedResponse] = []
+
+    def register(self, pattern: str) -> None:
+        """キャプチャするURLのパターン(正規表現)を追加する"""
+        if all(registered.pattern != pattern for registered in self._patterns):
+            self._patterns.append(re.compile(pattern))
+
+    def _matches(self, url: str) -> bool:
+        return any(pattern.search(url) for pattern in self._patterns)
+
+    def clear(self) -> None:
+        """それまでのログとキャプチャしたレスポンスを破棄する(ページを開く前に呼ぶ)"""
+        self._driver.get_log("performance")
+        self._pending.clear()
+        self.responses.clear()
+
+    def poll(self) -> list[CapturedResponse]:
+        """パフォーマンスログを読み、本文の受信が終わったレスポンスを取得する
+
+        Returns:
+            list[CapturedResponse]: 新しくキャプチャしたレスポンス
+        """
+        captured: list[CapturedResponse] = []
+        for entry in self._driver.get_log("performance"):
+            message: dict = json.loads(entry["message"])["message"]
+            method: str = message.get("method")
+            params: dict = message.get("params", {})
+            if method == "Network.responseReceived":
+                response: dict = params["response"]
+                if self._matches(response["url"]):
+                    self._pending[params["requestId"]] = (response["url"], response.get("status"), response.get("mimeType", ""))
+            elif method == "Network.loadingFinished" and params.get("requestId") in self._pending:
+                request_id: str = params["requestId"]
+                url, status, mime_type = self._pending.pop(request_id)
+                try:
+                    body: Any = self._get_body(request_id, mime_type)
+                except (WebDriverException, ValueError) as e:
+                    logger.warning(f"failed to get response body. url: {url}, error: {e}")
+                    continue
+                captured.append(CapturedResponse(url, status, mime_type, body))
+            elif method == "Network.loadingFailed":
+                self._pending.pop(params.get("requestId"), None)
+        self.responses.extend(captured)
+        return captured
+
+    def _get_body(self, request_id: str, mime_type: str) -> Any:
+        result: dict = self._driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+        body: str = result["body"]
+        if result.get("base64Encoded"):
+            body = base64.b64decode(body).decode("utf-8")
+        return json.loads(body) if "json" in mime_type else body
+
+    def wait_for(self, pattern: str = None, timeout: float = 20, count: int = 1) -> list[CapturedResponse]:
+        """URLがpatternに一致するレスポンスをcount個キャプチャするまで待つ
+
+        patternを省略した場合は登録した全てのパターンが対象(patternは自動で登録する)。
+        既にキャプチャ済みのレスポンスも含めて返す。
+
+        Raises:
+            TimeoutException: timeout秒以内にキャプチャできなかった場合
+        """
+        if pattern is not None:
+            self.register(pattern)
+        compiled: re.Pattern = re.compile(pattern) if pattern is not None else None
+
+        def matched(_: Any) -> list[CapturedResponse]:
+            self.poll()
+            responses = [response for response in self.responses if compiled is None or compiled.search(response.url)]
+            return responses if len(responses) >= count else None
+
+        return WebDriverWait(self._driver, timeout, poll_frequency=0.1).until(matched)
@@ -0,0 +1,235 @@
+from __future__ import annotations
+import logging
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from pprint import pformat
+
+from .timestamp import JST
+
+
+logger = logging.getLogger(__name__)
+
+# 同じ文字列の解析結果を保持する数
+CACHE_SIZE = 4096
+
+# 全角数字などを半角にする
+_TRANSLATION = str.maketrans("０１２３４５６７８９：／　", "0123456789:/ ")
+
+# ISO8601形式 ex:"2023-09-23T22:00:00+09:00", "2023-09-23 22:00:00", "2024-05-01T11:00:00Z"
+ISO_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?(?:Z|[+-]\d{2}:?\d{2})?$")
+# RSSの日時 ex:"Fri, 16 Jun 2023 12:00:00 +0900"
+RFC822_PATTERN = re.compile(r"(\d{1,2}) (Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec) (\d{4}) (\d{1,2}):(\d{2})(?::(\d{2}))? ?([+-]\d{4}|GMT|UTC)?")
+# 年月日(スラッシュ区切り) ex:"2023/07/06", "2023/07/06 12:00", "放送開始：2023/09/04 (月) 22:50:00"
+SLASH_DATE_PATTERN = re.compile(r"(\d{4})/(\d{1,2})/(\d{1,2})(?:\s*\([^)]*\))?(?:\s*(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?)?")
+# 年月日(漢字) ex:"09月23日 (土) 22時00分", "2023年9月23日 22:00"
+KANJI_DATE_PATTERN = re.compile(r"(?:(\d{4})年)?(\d{1,2})月(\d{1,2})日(?:\s*\([^)]*\))?(?:\s*(\d{1,2})(?:時|:)(\d{1,2})分?)?")
+# 年のない月日と時刻 ex:"09/16 21:00"
+MONTH_DAY_PATTERN = re.compile(r"^(\d{1,2})/(\d{1,2})(?:\s*\([^)]*\))?\s+(\d{1,2}):(\d{1,2})$")
+# 今日、明日、昨日と時刻 ex:"今日 21:00"
+DAY_WORD_PATTERN = re.compile(r"(今日|本日|明日|昨日)\s*(\d{1,2}):(\d{1,2})")
+# 相対時間 ex:"3日前", "12時間前", "30分前"
+RELATIVE_PATTERN = re.compile(r"(\d+)\s*(秒|分|時間|日|週間|週|か月|ヶ月|ケ月|カ月|年)前")
+
+# 動画の長さ ex:"1:23:45", "23:45", "123:45"
+COLON_DURATION_PATTERN = re.compile(r"^(?:(\d+):)?(\d+):(\d{1,2})$")
+# ISO8601形式の長さ ex:"PT1H23M45S", "P1DT2H"
+ISO_DURATION_PATTERN = re.compile(r"^P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+(?:\.\d+)?)S)?)?$")
+# 漢字の長さ ex:"1時間23分45秒", "45秒"
+KANJI_DURATION_PATTERN = re.compile(r"^(?:(\d+)時間)?(?:(\d+)分)?(?:(\d+)秒)?$")
+
+MONTHS = {name: i for i, name in enumerate(["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"], 1)}
+DAY_WORD_OFFSETS = {"今日": 0, "本日": 0, "明日": 1, "昨日": -1}
+# 相対時間の単位(月と年は30日と365日とみなす)
+RELATIVE_UNITS = {
+    "秒": timedelta(seconds=1),
+    "分": timedelta(minutes=1),
+    "時間": timedelta(hours=1),
+    "日": timedelta(days=1),
+    "週間": timedelta(weeks=1),
+    "週": timedelta(weeks=1),
+    "か月": timedelta(days=30),
+    "ヶ月": timedelta(days=30),
+    "ケ月": timedelta(days=30),
+    "カ月": timedelta(days=30),
+    "年": timedelta(days=365),
+}
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _match_datetime(text: str) -> tuple:
+    """日時の文字列を解析する(現在時刻に依存しない部分だけをキャッシュする)
+
+    Returns:
+        ("absolute", datetime): 年を含む日時(タイムゾーンがない場合はnaive)
+        ("month_day", month, day, hour, minute): 年のない日時
+        ("day_word", days, hour, minute): 今日、明日、昨日
+        ("relative", timedelta): 〇日前など
+    """
+    text = text.translate(_TRANSLATION).strip()
+
+    if ISO_PATTERN.match(text):
+        return ("absolute", datetime.fromisoformat(text[:-1] + "+00:00" if text.endswith("Z") else text))
+
+    match = RFC822_PATTERN.search(text)
+    if match:
+        day, month, year, hour, minute, second, offset = match.groups()
+        tz = None
+        if offset in ("GMT", "UTC"):
+            tz = timezone.utc
+        elif offset:
+            sign = -1 if offset[0] == "-" else 1
+            tz = timezone(sign * timedelta(hours=int(offset[1:3]), minutes=int(offset[3:5])))
+        return ("absolute", datetime(int(year), MONTHS[month], int(day), int(hour), int(minute), int(second or 0), tzinfo=tz))
+
+    match = SLASH_DATE_PATTERN.search(text)
+    if match:
+        year, month, day, hour, minute, second = match.groups()
+        return ("absolute", datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0)))
+
+    match = KANJI_DATE_PATTERN.search(text)
+    if match:
+        year, month, day, hour, minute = match.groups()
+        if year:
+            return ("absolute", datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0)))
+        return ("month_day", int(month), int(day), int(hour or 0), int(minute or 0))
+
+    match = MONTH_DAY_PATTERN.match(text)
+    if match:
+        month, day, hour, minute = match.groups()
+        return ("month_day", int(month), int(day), int(hour), int(minute))
+
+    match = DAY_WORD_PATTERN.search(text)
+    if match:
+        word, hour, minute = match.groups()
+        return ("day_word", DAY_WORD_OFFSETS[word], int(hour), int(minute))
+
+    match = RELATIVE_PATTERN.search(text)
+    if match:
+        value, unit = match.groups()
+        return ("relative", int(value) * RELATIVE_UNITS[unit])
+
+    raise ValueError(f"invalid datetime string: {text!r}")
+
+
+def parse_datetime(text: str, now: datetime = None, tz: timezone = JST) -> datetime:
+    """サイトに表示される日時の文字列をタイムゾーン付きのdatetimeに変換する
+
+    タイムゾーンのない日時はtz(日本時間)の時刻とみなす。
+    年のない日時は、現在の月より前の月なら来年、それ以外は今年とみなす。
+    同じ文字列の解析結果はキャッシュするので、一覧の日時を繰り返し変換しても速い。
+
+    Args:
+        text: 日時の文字列 ex:"2023/07/06", "09月23日 (土) 22時00分", "今日 21:00", "3日前", "Fri, 16 Jun 2023 12:00:00 +0900"
+        now: 相対的な日時の基準(省略した場合は現在時刻)
+
+    Raises:
+        ValueError: 対応していない形式の場合
+    """
+    result: tuple = _match_datetime(text)
+    kind: str = result[0]
+    if kind == "absolute":
+        value: datetime = result[1]
+        return value if value.tzinfo is not None else value.replace(tzinfo=tz)
+
+    if now is None:
+        now = datetime.now(tz)
+    elif now.tzinfo is None:
+        now = now.replace(tzinfo=tz)
+    else:
+        now = now.astimezone(tz)
+    if kind == "relative":
+        return now - result[1]
+    if kind == "day_word":
+        _, days, hour, minute = result
+        return (now + timedelta(days=days)).replace(hour=hour, minute=minute, second=0, microsecond=0)
+    # 月をまたいでいる場合は来年の日時にする
+    _, month, day, hour, minute = result
+    year: int = now.year + 1 if month < now.month else now.year
+    return datetime(year, month, day, hour, minute, tzinfo=tz)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_duration(text: str) -> timedelta:
+    """動画の長さの文字列をtimedeltaに変換する
+
+    例: "1:23:45", "123:45", "PT1H23M45S", "1時間23分45秒", "90"(秒)
+
+    Raises:
+        ValueError: 対応していない形式の場合
+    """
+    text = text.translate(_TRANSLATION).strip()
+
+    match = COLON_DURATION_PATTERN.match(text)
+    if match:
+        hours, minutes, seconds = match.groups()
+        return timedelta(hours=int(hours or 0), minutes=int(minutes), seconds=int(seconds))
+
+    match = ISO_DURATION_PATTERN.match(text)
+    if match and text not in ("P", "PT"):
+        days, hours, minutes, seconds = match.groups()
+        return timedelta(days=int(days or 0), hours=int(hours or 0), minutes=int(minutes or 0), seconds=float(seconds or 0))
+
+    match = KANJI_DURATION_PATTERN.match(text)
+    if match and text:
+        hours, minutes, seconds = match.groups()
+        return timedelta(hours=int(hours or 0), minutes=int(minutes or 0), seconds=int(seconds or 0))
+
+    if text.isdigit():
+        return timedelta(seconds=int(text))
+
+    raise ValueError(f"invalid duration string: {text!r}")
+
+
+def clear_cache() -> None:
+    """解析結果のキャッシュを空にする"""
+    _match_datetime.cache_clear()
+    parse_duration.cache_clear()
+
+
+# ベンチマークに使う各サイトの表示形式
+BENCHMARK_SAMPLES = {
+    "niconico_live_future": ("09月23日 (土) 22時00分", lambda text: datetime.strptime(re.sub(r"\s*\([^)]*\)", "", text), "%m月%d日 %H時%M分")),
+    "niconico_live_past": ("放送開始：2023/09/04 (月) 22:50:00", lambda text: datetime.strptime(re.sub(r"\s*\([^)]*\)", "", text), "放送開始：%Y/%m/%d %H:%M:%S")),
+    "niconico_video": ("2023/09/04 22:50", lambda text: datetime.strptime(text, "%Y/%m/%d %H:%M")),
+    "niconico_feed": ("Fri, 16 Jun 2023 12:00:00 +0900", lambda text: datetime.strptime(text, "%a, %d %b %Y %H:%M:%S %z")),
+    "niconico_news": ("2023-09-04 22:50:00", lambda text: datetime.strptime(text, "%Y-%m-%d %H:%M:%S")),
+    "channelplus_posted_at": ("2023/07/06", lambda text: datetime.strptime(text, "%Y/%m/%d")),
+    "channelplus_start_at": ("09/16 21:00", lambda text: datetime.strptime(text, "%m/%d %H:%M")),
+}
+
+
+def benchmark(repeat: int = 20000) -> dict:
+    """各サイトの日時の形式について、1秒あたりの変換数を従来の方法と比較する
+
+    cold: 毎回キャッシュを空にした場合, warm: 同じ文字列を繰り返し変換した場合
+
+    Example:
+        >>> benchmark()
+        {'niconico_live_future': {'legacy': ..., 'cold': ..., 'warm': ...}, ...}
+    """
+
+    def per_second(func, text: str, clear: bool = False) -> float:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            if clear:
+                _match_datetime.cache_clear()
+            func(text)
+        return repeat / (time.perf_counter() - start)
+
+    now = datetime.now(JST)
+    result = {}
+    for name, (text, legacy) in BENCHMARK_SAMPLES.items():
+        result[name] = {
+            "legacy": per_second(legacy, text),
+            "cold": per_second(lambda text: parse_datetime(text, now), text, clear=True),
+            "warm": per_second(lambda text: parse_datetime(text, now), text),
+        }
+    logger.info(f"parsed per second: {pformat(result)}")
+    return result
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    benchmark()
@@ -0,0 +1,226 @@
+from __future__ import annotations
+import cProfile
+import logging
+import os
+import re
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator
+
+
+logger = logging.getLogger(__name__)
+
+# プロファイルを有効にする環境変数(値は出力先のディレクトリ、1またはtrueの場合はDEFAULT_DIRECTORY)
+PROFILE_ENV: str = "SCRAPING_TOOLS_PROFILE"
+DEFAULT_DIRECTORY: str = "profiles"
+# スタックを取得する間隔(秒)
+DEFAULT_INTERVAL: float = 0.005
+# 書き出す割り当て箇所の数
+TOP_ALLOCATIONS: int = 30
+
+
+def _directory_from_env() -> str:
+    value: str = os.environ.get(PROFILE_ENV, "")
+    if value.lower() in ("", "0", "false"):
+        return None
+    return DEFAULT_DIRECTORY if value.lower() in ("1", "true") else value
+
+
+_directory: str = _directory_from_env()
+_interval: float = DEFAULT_INTERVAL
+# プロファイラーは同時に1つしか動かせないため、実行中のジョブを1つに制限する
+_lock = threading.Lock()
+_active: ProfileJob = None
+
+
+class ProfileJob:
+    """1つのスクレイピング処理のプロファイル
+
+    次のファイルを<directory>/<日時>_<name>.*に書き出す。
+        .prof: cProfileの結果(pstatsやsnakevizで読み込む)
+        .collapsed: 一定間隔で取得したスタックの折り畳み形式(flamegraph.plやspeedscopeで読み込む)
+        .alloc.txt: 処理中にメモリを割り当てた箇所の上位(tracemalloc)
+    """
+
+    def __init__(self, name: str, directory: str = DEFAULT_DIRECTORY, interval: float = DEFAULT_INTERVAL) -> None:
+        self.name = name
+        self.directory = directory
+        self.interval = interval
+        self.paths: dict[str, str] = {}
+        self._profile = cProfile.Profile()
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._sampler: threading.Thread = None
+        self._thread_id: int = None
+        self._started_tracemalloc: bool = False
+        self._snapshot: tracemalloc.Snapshot = None
+
+    def start(self) -> None:
+        """プロファイルを開始する(処理を実行するスレッドで呼ぶ)
+
+        別のプロファイラーが動いている場合はenable()がValueErrorを送出するため、
+        スタックの取得とtracemallocより先に開始する。
+        """
+        self._profile.enable()
+        try:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            self._snapshot = tracemalloc.take_snapshot()
+            self._thread_id = threading.get_ident()
+            self._sampler = threading.Thread(target=self._sample, name=f"profiler-{self.name}", daemon=True)
+            self._sampler.start()
+        except BaseException:
+            self._cancel()
+            raise
+
+    def _cancel(self) -> None:
+        """開始に失敗したプロファイルを止める(ファイルは書き出さない)"""
+        self._profile.disable()
+        self._stop.set()
+        if self._sampler is not None and self._sampler.is_alive():
+            self._sampler.join()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def stop(self) -> dict[str, str]:
+        """プロファイルを終了してファイルに書き出す
+
+        Returns:
+            dict[str, str]: 種類(prof, collapsed, alloc)と書き出したファイルのパス
+        """
+        self._profile.disable()
+        self._stop.set()
+        self._sampler.join()
+        snapshot: tracemalloc.Snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+        os.makedirs(self.directory, exist_ok=True)
+        # ファイル名に使えない文字を置き換える
+        name: str = re.sub(r"[^\w.-]", "_", self.name)
+        base: str = os.path.join(self.directory, f"{datetime.now():%Y%m%d-%H%M%S-%f}_{name}")
+
+        self.paths["prof"] = f"{base}.prof"
+        self._profile.dump_stats(self.paths["prof"])
+
+        self.paths["collapsed"] = f"{base}.collapsed"
+        with open(self.paths["collapsed"], "w", encoding="utf-8") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        self.paths["alloc"] = f"{base}.alloc.txt"
+        stats: list[tracemalloc.StatisticDiff] = snapshot.compare_to(self._snapshot, "lineno")
+        with open(self.paths["alloc"], "w", encoding="utf-8") as f:
+            f.write(f"{self.name}: peak {peak / 1024:.1f} KiB, {sum(self._stacks.values())} samples\n")
+            for stat in stats[:TOP_ALLOCATIONS]:
+                f.write(f"{stat}\n")
+
+        return self.paths
+
+    def _sample(self) -> None:
+        """処理を実行するスレッドのスタックを一定間隔で取得する"""
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack: list[str] = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self._stacks[";".join(reversed(stack))] += 1
+
+
+# ----- 有効/無効 -----
+
+
+def is_enabled() -> bool:
+    return _directory is not None
+
+
+def enable_profiling(directory: str = DEFAULT_DIRECTORY, interval: float = DEFAULT_INTERVAL) -> None:
+    """スクレイピング処理(metrics.instrumentを付けたメソッド)毎のプロファイルを有効にする
+
+    directoryにNoneを指定すると無効にする。プロファイラーは同時に1つしか動かせないため、
+    別の処理のプロファイル中に始まった処理(asyncioで並行する処理など)はプロファイルしない。
+    ジェネレーターやasyncioの処理では、プロファイル中に同じスレッドで動いた別の処理も結果に含まれる。
+    """
+    global _directory, _interval
+    _directory = directory
+    _interval = interval
+
+
+# ----- プロファイル -----
+
+
+def _claim(job: ProfileJob) -> bool:
+    """実行中のジョブがなければjobを実行中にしてプロファイルを開始する"""
+    global _active
+    with _lock:
+        if _active is not None:
+            return False
+        _active = job
+    try:
+        job.start()
+    except BaseException:
+        _release()
+        raise
+    return True
+
+
+def _release() -> None:
+    global _active
+    with _lock:
+        _active = None
+
+
+def begin_job(name: str) -> ProfileJob:
+    """スクレイピング処理のプロファイルを開始する(metrics.instrumentから呼ばれる)
+
+    別の処理のプロファイル中の場合はNoneを返す。
+    """
+    job = ProfileJob(name, _directory, _interval)
+    try:
+        claimed: bool = _claim(job)
+    # 別のプロファイラーが動いている場合など
+    except ValueError as e:
+        logger.warning(f"can't profile {name}: {e}")
+        return None
+    if not claimed:
+        logger.debug(f"skip profiling {name}: another job is being profiled")
+        return None
+    return job
+
+
+def end_job(job: ProfileJob) -> None:
+    """スクレイピング処理のプロファイルを終了してファイルに書き出す"""
+    try:
+        paths: dict[str, str] = job.stop()
+    finally:
+        _release()
+    logger.info(f"profile of {job.name}: {', '.join(paths.values())}")
+
+
+@contextmanager
+def profile_scrape(name: str = "scrape", directory: str = None, interval: float = DEFAULT_INTERVAL) -> Iterator[ProfileJob]:
+    """with文の中の処理をプロファイルする
+
+    Example:
+        >>> with profile_scrape("get_video", "profiles") as job:
+        ...     channel.get_video(limit=20)
+        >>> job.paths["collapsed"]
+        'profiles/20240101-120000-000000_get_video.collapsed'
+    """
+    job = ProfileJob(name, directory or _directory or DEFAULT_DIRECTORY, interval)
+    if not _claim(job):
+        raise RuntimeError(f"can't profile {name}: another job is being profiled")
+    try:
+        yield job
+    finally:
+        end_job(job)
@@ -0,0 +1,425 @@
+from __future__ import annotations
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import weakref
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Iterator
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from selenium.webdriver.support.event_firing_webdriver import EventFiringWebDriver
+from selenium.webdriver.support.abstract_event_listener import AbstractEventListener
+
+from .retry import PermanentError
+
+
+logger = logging.getLogger(__name__)
+
+# 記録/再生するディレクトリとモードを指定する環境変数
+CASSETTE_ENV: str = "SCRAPING_TOOLS_CASSETTE"
+CASSETTE_MODE_ENV: str = "SCRAPING_TOOLS_CASSETTE_MODE"
+# キーに含めないクエリパラメーター(APIキーなど)
+SECRET_PARAMS: frozenset = frozenset(["key", "api_key", "access_token", "token"])
+
+# 再生時に実行しないスクリプトタグ(JSON-LDなどのデータは残す)
+_SCRIPT_TAG_PATTERN = re.compile(r"<script\b([^>]*)>", re.IGNORECASE)
+_DATA_SCRIPT_PATTERN = re.compile(r"""\btype\s*=\s*["']?application/(?:ld\+)?json""", re.IGNORECASE)
+_TYPE_ATTRIBUTE_PATTERN = re.compile(r"""\btype\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+)""", re.IGNORECASE)
+_HEAD_PATTERN = re.compile(r"<head\b[^>]*>", re.IGNORECASE)
+# 再生したページでクリックによる遷移を起こさないスクリプト(遷移先は記録済みのページを開く)
+_CLICK_BLOCKER = '<script>document.addEventListener("click", (e) => e.preventDefault(), true);</script>'
+
+
+class ReplayMissError(PermanentError):
+    """再生モードで記録にないリクエストや遷移が行われた場合の例外"""
+
+
+def request_key(url: str, params: dict = None) -> str:
+    """リクエストを識別するキー(クエリパラメーターを並べ替え、APIキーなどを除く)"""
+    parts = urlsplit(url)
+    query: list = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query.extend((name, str(value)) for name, value in params.items() if value is not None)
+    query = sorted((name, value) for name, value in query if name not in SECRET_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def redact_url(url: str) -> str:
+    """URLからAPIキーなどのクエリパラメーターを除く"""
+    parts = urlsplit(url)
+    query: list = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True) if name not in SECRET_PARAMS]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
+
+
+class Cassette:
+    """HTTPのレスポンス、APIのレスポンス、ブラウザで表示したページを記録/再生するクラス
+
+    record: 実際にリクエストを送り、レスポンスをpathのディレクトリに保存する。
+    replay: 保存したレスポンスを返し、ネットワークに接続しない。
+        ブラウザの遷移は、記録したページ(page_source)をローカルのHTTPサーバーから開く。
+
+    同じリクエストが複数回記録されている場合は記録した順に返し、最後のレスポンスは繰り返し返す。
+    ブラウザのページ(遷移とクリック)は記録した順に再生するので、同じ処理を同じ順に実行する必要がある。
+
+    Example:
+        >>> with use_cassette("cassettes/ch2646073", mode="record"):
+        ...     NicoNicoChannel("ch2646073").get_video()
+        >>> with use_cassette("cassettes/ch2646073"):
+        ...     videos = NicoNicoChannel("ch2646073").get_video()
+    """
+
+    def __init__(self, path: str, mode: str = "replay") -> None:
+        if mode not in ("record", "replay"):
+            raise ValueError("mode must be 'record' or 'replay'.")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        # kind -> key -> 記録したエントリのリスト
+        self._entries: dict[str, dict[str, list[dict]]] = {}
+        # ブラウザで表示したページ(記録した順)
+        self._pages: list[dict] = []
+        # 再生位置
+        self._cursors: dict[tuple, int] = {}
+        self._page_cursor: int = 0
+        self._drivers: weakref.WeakSet = weakref.WeakSet()
+        self._server: ThreadingHTTPServer = None
+        self._closed: bool = False
+
+        if mode == "replay":
+            with open(os.path.join(path, "index.json"), encoding="utf-8") as f:
+                index: dict = json.load(f)
+            self._entries = index["entries"]
+            self._pages = index["pages"]
+        else:
+            os.makedirs(os.path.join(path, "bodies"), exist_ok=True)
+
+    # ----- 記録と再生 -----
+
+    def _write_body(self, body: bytes) -> str:
+        """レスポンスの本文を保存してファイル名を返す(同じ内容は1つのファイルにまとめる)"""
+        name: str = hashlib.sha1(body).hexdigest()
+        file_path: str = os.path.join(self.path, "bodies", name)
+        if not os.path.exists(file_path):
+            with open(file_path, "wb") as f:
+                f.write(body)
+        return name
+
+    def _read_body(self, name: str) -> bytes:
+        with open(os.path.join(self.path, "bodies", name), "rb") as f:
+            return f.read()
+
+    def _record(self, kind: str, key: str, entry: dict) -> None:
+        with self._lock:
+            self._entries.setdefault(kind, {}).setdefault(key, []).append(entry)
+
+    def _play(self, kind: str, key: str) -> dict:
+        with self._lock:
+            entries: list = self._entries.get(kind, {}).get(key)
+            if not entries:
+                raise ReplayMissError(f"not recorded. kind: {kind}, key: {key}")
+            index: int = self._cursors.get((kind, key), 0)
+            self._cursors[(kind, key)] = index + 1
+            return entries[min(index, len(entries) - 1)]
+
+    def http_get(self, get: Callable[..., requests.Response], url: str, **kwargs: Any) -> requests.Response:
+        """GETリクエストのレスポンスを記録/再生する(getは実際にリクエストを送る関数)"""
+        key: str = request_key(url, kwargs.get("params"))
+        if self.mode == "replay":
+            entry: dict = self._play("http", key)
+            res = requests.Response()
+            res.status_code = entry["status"]
+            res.reason = entry.get("reason")
+            res.url = entry["url"]
+            res.headers = CaseInsensitiveDict(entry["headers"])
+            res.encoding = entry.get("encoding")
+            res._content = self._read_body(entry["body"])
+            return res
+
+        res: requests.Response = get(url, **kwargs)
+        entry = {
+            "status": res.status_code,
+            "reason": res.reason,
+            "url": redact_url(res.url),
+            "headers": dict(res.headers),
+            "encoding": res.encoding,
+            "body": self._write_body(res.content),
+        }
+        self._record("http", key, entry)
+        return res
+
+    def call_json(self, kind: str, key: str, call: Callable[[], Any]) -> Any:
+        """JSONに変換できる結果を返す処理(APIクライアントなど)の結果を記録/再生する"""
+        if self.mode == "replay":
+            return json.loads(self._read_body(self._play(kind, key)["body"]))
+        result = call()
+        self._record(kind, key, {"body": self._write_body(json.dumps(result, ensure_ascii=False).encode("utf-8"))})
+        return result
+
+    # ----- ブラウザのページ -----
+
+    def wrap_driver(self, driver: Any) -> CassetteWebDriver:
+        """WebDriverを、ページとスクリプトの結果を記録/再生するラッパーで包む"""
+        wrapped = CassetteWebDriver(driver, self)
+        self._drivers.add(wrapped)
+        return wrapped
+
+    def add_page(self, kind: str, url: str) -> dict:
+        """遷移(kind="get")またはクリック(kind="click")で表示されたページを追加する"""
+        with self._lock:
+            page = {"index": len(self._pages), "kind": kind, "url": url, "current_url": url, "body": None, "scripts": {}}
+            self._pages.append(page)
+        return page
+
+    def update_page(self, page: dict, current_url: str, html: str) -> None:
+        """ページの最新の状態(スクロールで追加された要素なども含む)を保存する"""
+        page["current_url"] = current_url
+        page["body"] = self._write_body(html.encode("utf-8"))
+
+    def next_page(self, kind: str, url: str = None) -> dict:
+        """次に再生するページを返す"""
+        with self._lock:
+            if self._page_cursor >= len(self._pages):
+                raise ReplayMissError(f"no more recorded pages. kind: {kind}, url: {url}")
+            page: dict = self._pages[self._page_cursor]
+            if page["kind"] != kind or (kind == "get" and page["url"] != url):
+                raise ReplayMissError(f"unexpected navigation. recorded: {page['kind']} {page['url']}, actual: {kind} {url}")
+            self._page_cursor += 1
+        return page
+
+    def page_url(self, page: dict) -> str:
+        """記録したページを開くローカルのURL"""
+        if self._server is None:
+            self._start_server()
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/pages/{page['index']}"
+
+    def render_page(self, page: dict) -> bytes:
+        """記録したページを再生用のHTMLに変換する
+
+        データ以外のスクリプトを無効にし、相対URLが元のURLで解決されるようにbaseタグを追加する。
+        """
+        html: str = self._read_body(page["body"]).decode("utf-8") if page["body"] else "<html><head></head><body></body></html>"
+
+        def disable(match: re.Match) -> str:
+            attributes: str = match.group(1)
+            if _DATA_SCRIPT_PATTERN.search(attributes):
+                return match.group(0)
+            return f'<script type="text/plain"{_TYPE_ATTRIBUTE_PATTERN.sub("", attributes)}>'
+
+        html = _SCRIPT_TAG_PATTERN.sub(disable, html)
+        inserted: str = f'<base href="{page["current_url"]}">{_CLICK_BLOCKER}'
+        head = _HEAD_PATTERN.search(html)
+        if head:
+            html = html[: head.end()] + inserted + html[head.end() :]
+        else:
+            html = inserted + html
+        return html.encode("utf-8")
+
+    def _start_server(self) -> None:
+        cassette = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                match = re.fullmatch(r"/pages/(\d+)", self.path)
+                if not match or int(match.group(1)) >= len(cassette._pages):
+                    self.send_error(404)
+                    return
+                body: bytes = cassette.render_page(cassette._pages[int(match.group(1))])
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                logger.debug(f"replay server: {format % args}")
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logger.debug(f"replay server started at {self._server.server_address}")
+
+    # ----- 終了処理 -----
+
+    def close(self) -> None:
+        """記録モードの場合は開いているブラウザの最新の状態を保存し、インデックスを書き出す"""
+        if self._closed:
+            return
+        self._closed = True
+        if self.mode == "record":
+            for driver in list(self._drivers):
+                try:
+                    driver.snapshot_all()
+                except Exception as e:
+                    logger.warning(f"can't save page: {e}")
+            with open(os.path.join(self.path, "index.json"), "w", encoding="utf-8") as f:
+                json.dump({"entries": self._entries, "pages": self._pages}, f, ensure_ascii=False, indent=1)
+            logger.info(f"recorded {sum(len(entries) for kind in self._entries.values() for entries in kind.values())} responses and {len(self._pages)} pages to {self.path}")
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self) -> Cassette:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+class _CassetteListener(AbstractEventListener):
+    """遷移とクリックの前後でページを記録/再生するリスナー"""
+
+    def __init__(self) -> None:
+        self.wrapper: CassetteWebDriver = None
+
+    def before_navigate_to(self, url: str, driver: Any) -> None:
+        self.wrapper._snapshot()
+
+    def after_navigate_to(self, url: str, driver: Any) -> None:
+        # 再生モードの遷移はCassetteWebDriver.getで処理する
+        if self.wrapper._cassette.mode == "record":
+            self.wrapper._set_page(self.wrapper._cassette.add_page("get", url))
+
+    def before_click(self, element: Any, driver: Any) -> None:
+        if self.wrapper._cassette.mode == "record":
+            self.wrapper._snapshot()
+
+    def after_click(self, element: Any, driver: Any) -> None:
+        cassette: Cassette = self.wrapper._cassette
+        if cassette.mode == "record":
+            self.wrapper._set_page(cassette.add_page("click", driver.current_url))
+        else:
+            # クリックによる変化の代わりに、クリック後に記録したページを開く
+            page: dict = cassette.next_page("click")
+            self.wrapper._set_page(page)
+            driver.get(cassette.page_url(page))
+
+    def before_close(self, driver: Any) -> None:
+        self.wrapper._snapshot()
+
+    def before_quit(self, driver: Any) -> None:
+        self.wrapper.snapshot_all()
+
+    def after_quit(self, driver: Any) -> None:
+        self.wrapper._pages.clear()
+
+
+class CassetteWebDriver(EventFiringWebDriver):
+    """ページ(page_source)とスクリプトの結果を記録/再生するWebDriverのラッパー
+
+    記録モードでは、遷移やクリックの直前とブラウザを閉じる時にページの最新の状態を保存する。
+    再生モードでは、getで記録したページをローカルのHTTPサーバーから開き、
+    current_urlとexecute_scriptの結果は記録した値を返す。
+    """
+
+    def __init__(self, driver: Any, cassette: Cassette) -> None:
+        listener = _CassetteListener()
+        super().__init__(driver, listener)
+        listener.wrapper = self
+        self._cassette = cassette
+        # ウィンドウ(タブ)毎に表示しているページ
+        self._pages: dict[str, dict] = {}
+        self._script_cursors: dict[tuple, int] = {}
+
+    def _set_page(self, page: dict) -> None:
+        self._pages[self.wrapped_driver.current_window_handle] = page
+
+    def _current_page(self) -> dict:
+        return self._pages.get(self.wrapped_driver.current_window_handle)
+
+    def _snapshot(self) -> None:
+        if self._cassette.mode != "record":
+            return
+        page: dict = self._current_page()
+        if page is not None:
+            self._cassette.update_page(page, self.wrapped_driver.current_url, self.wrapped_driver.page_source)
+
+    def snapshot_all(self) -> None:
+        """全てのウィンドウ(タブ)のページの最新の状態を保存する"""
+        if self._cassette.mode != "record" or not self._pages:
+            return
+        driver = self.wrapped_driver
+        current: str = driver.current_window_handle
+        for handle in driver.window_handles:
+            if handle in self._pages:
+                driver.switch_to.window(handle)
+                self._snapshot()
+        driver.switch_to.window(current)
+
+    def get(self, url: str) -> None:
+        if self._cassette.mode == "record":
+            return super().get(url)
+        page: dict = self._cassette.next_page("get", url)
+        self._set_page(page)
+        self.wrapped_driver.get(self._cassette.page_url(page))
+
+    @property
+    def current_url(self) -> str:
+        page: dict = self._current_page() if self._cassette.mode == "replay" else None
+        return page["current_url"] if page is not None else self.wrapped_driver.current_url
+
+    def execute_script(self, script: str, *args: Any) -> Any:
+        key: str = hashlib.sha1(script.encode("utf-8")).hexdigest()[:16]
+        page: dict = self._current_page()
+        if self._cassette.mode == "replay" and page is not None:
+            results: list = page["scripts"].get(key, [])
+            index: int = self._script_cursors.get((page["index"], key), 0)
+            # 記録した結果を使い切った場合は、再生したページで実際に実行する
+            if index < len(results):
+                self._script_cursors[(page["index"], key)] = index + 1
+                return results[index]
+            return super().execute_script(script, *args)
+
+        result = super().execute_script(script, *args)
+        if self._cassette.mode == "record" and page is not None:
+            # 要素などJSONに変換できない結果は記録しない(再生時に実行する)
+            try:
+                json.dumps(result)
+            except TypeError:
+                pass
+            else:
+                page["scripts"].setdefault(key, []).append(result)
+        return result
+
+
+_active: Cassette = None
+_env_checked: bool = False
+
+
+def get_cassette() -> Cassette:
+    """有効なCassetteを返す(無効の場合はNone)
+
+    use_cassetteの中、または環境変数SCRAPING_TOOLS_CASSETTEにディレクトリが指定されている場合に有効になる。
+    モードは環境変数SCRAPING_TOOLS_CASSETTE_MODE(record/replay、省略時はreplay)で指定する。
+    """
+    global _active, _env_checked
+    if _active is None and not _env_checked:
+        _env_checked = True
+        path: str = os.environ.get(CASSETTE_ENV)
+        if path:
+            _active = Cassette(path, os.environ.get(CASSETTE_MODE_ENV, "replay"))
+            atexit.register(_active.close)
+    return _active
+
+
+@contextmanager
+def use_cassette(path: str, mode: str = "replay") -> Iterator[Cassette]:
+    """with文の中のHTTPリクエスト、フィード、YouTube API、ブラウザのページを記録/再生する
+
+    ブラウザはwith文の中で開いたもののみが対象になる。
+    """
+    global _active
+    previous: Cassette = _active
+    cassette = Cassette(path, mode)
+    _active = cassette
+    try:
+        yield cassette
+    finally:
+        _active = previous
+        cassette.close()
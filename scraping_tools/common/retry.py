@@ -0,0 +1,267 @@
+from __future__ import annotations
+import logging
+import random
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable
+from urllib.parse import urlsplit
+
+import requests
+from selenium.common.exceptions import (
+    InvalidElementStateException,
+    InvalidSelectorException,
+    NoSuchAttributeException,
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException,
+)
+from selenium.webdriver.support import wait
+
+
+logger = logging.getLogger(__name__)
+
+# 一時的な失敗とみなすHTTPステータスコード
+TRANSIENT_STATUS_CODES: frozenset = frozenset([408, 425, 429, 500, 502, 503, 504])
+# 要素の検索や操作の失敗(ページの構造が想定と異なるため、リトライしても回復しない)
+ELEMENT_ERRORS: tuple = (
+    NoSuchElementException,
+    StaleElementReferenceException,
+    InvalidSelectorException,
+    InvalidElementStateException,
+    NoSuchAttributeException,
+)
+
+
+class RetryPolicy:
+    """リトライの方針を管理するクラス
+
+    指数バックオフ(full jitter)で待機時間を決定する。
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        multiplier: float = 2.0,
+        jitter: bool = True,
+    ) -> None:
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be 1 or more.")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+
+    def get_delay(self, attempt: int) -> float:
+        """attempt回目(1始まり)の失敗後に待機する秒数を返す"""
+        delay: float = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        # ジッターを加えて同時リトライが重ならないようにする
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+
+class CircuitBreaker:
+    """ホスト毎のサーキットブレーカー
+
+    連続してfailure_threshold回失敗するとopenになり、reset_timeout秒の間は即座に失敗する。
+    reset_timeout経過後はhalf_openになり、1回だけ試行を許可する。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, host: str, failure_threshold: int = 5, reset_timeout: float = 60.0) -> None:
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state: str = self.CLOSED
+        self.failure_count: int = 0
+        self.opened_at: float = None
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """呼び出し前に状態を確認する
+
+        openの場合はCircuitOpenErrorを発生させる。
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            # reset_timeoutを経過していればhalf_openにして1回だけ通す
+            remaining: float = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+                logger.info(f"circuit half-opened. host: {self.host}")
+                return
+            raise CircuitOpenError(self.host, max(remaining, 0))
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"circuit closed. host: {self.host}")
+            self.state = self.CLOSED
+            self.failure_count = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failure_count += 1
+            # half_openで失敗した場合、または閾値を超えた場合はopenにする
+            if self.state == self.HALF_OPEN or self.failure_count >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"circuit opened. host: {self.host}, failures: {self.failure_count}")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(host: str) -> CircuitBreaker:
+    """ホストに対応するサーキットブレーカーを取得する(なければ作成する)"""
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+
+def get_host(url: str) -> str:
+    """URLからホスト名を取得する"""
+    return urlsplit(url).hostname or url
+
+
+def classify_status(status_code: int, url: str = None) -> ScrapingError:
+    """HTTPステータスコードから例外を生成する
+
+    4xx(一部を除く)はPermanentError、それ以外はTransientErrorとする。
+    """
+    if status_code in TRANSIENT_STATUS_CODES or status_code >= 500:
+        return TransientError(f"status code err. status_code: {status_code}, url: {url}", status_code=status_code)
+    return PermanentError(f"status code err. status_code: {status_code}, url: {url}", status_code=status_code)
+
+
+def raise_for_status(res: requests.Response) -> requests.Response:
+    """レスポンスのステータスコードが400以上の場合は分類した例外を発生させる"""
+    if res.status_code >= 400:
+        raise classify_status(res.status_code, res.url)
+    return res
+
+
+def _is_wait_timeout(e: Exception) -> bool:
+    """WebDriverWait.untilで要素を待っている間のタイムアウトか否か
+
+    ページの読み込みのタイムアウトと同じTimeoutExceptionなので、発生した場所で判別する。
+    """
+    if not isinstance(e, TimeoutException):
+        return False
+    tb = e.__traceback__
+    while tb is not None:
+        if tb.tb_frame.f_code.co_filename == wait.__file__:
+            return True
+        tb = tb.tb_next
+    return False
+
+
+def classify_exception(e: Exception) -> ScrapingError:
+    """任意の例外をTransientErrorかPermanentErrorに分類する
+
+    WebDriverの例外のうち、要素が見つからない、古くなったなどの失敗と要素を待つ間のタイムアウトはPermanentError、
+    セッションや通信のエラー、ページの読み込みのタイムアウトはTransientErrorとする。
+    """
+    if isinstance(e, ScrapingError):
+        return e
+    if isinstance(e, ELEMENT_ERRORS) or _is_wait_timeout(e):
+        return PermanentError(f"{type(e).__name__}: {e}")
+    # 通信エラーやタイムアウトは一時的な失敗
+    if isinstance(e, (requests.ConnectionError, requests.Timeout, TimeoutException, WebDriverException, TimeoutError, ConnectionError)):
+        return TransientError(f"{type(e).__name__}: {e}")
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return classify_status(e.response.status_code, e.response.url)
+    # googleapiclientのHttpErrorなど、レスポンスを持つ例外
+    status = getattr(getattr(e, "resp", None), "status", None)
+    if isinstance(status, int):
+        return classify_status(status, getattr(e, "uri", None))
+    return PermanentError(f"{type(e).__name__}: {e}")
+
+
+def call_with_retry(func: Callable, *args: Any, host: str, policy: RetryPolicy = None, **kwargs: Any) -> Any:
+    """リトライ方針とサーキットブレーカーを適用して関数を呼び出す
+
+    TransientErrorはリトライし、PermanentErrorはそのまま発生させる。
+    リトライ回数を使い切った場合はTransientErrorを発生させる。
+    """
+    policy = policy or DEFAULT_POLICY
+    breaker: CircuitBreaker = get_circuit_breaker(host)
+
+    attempt = 0
+    while True:
+        attempt += 1
+        # openの場合はリクエストを送らずに失敗する
+        breaker.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            error: ScrapingError = classify_exception(e)
+            # 恒久的な失敗はホストの障害ではないのでブレーカーには数えず、元の例外をそのまま発生させる
+            if isinstance(error, PermanentError):
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            if attempt >= policy.max_attempts:
+                logger.error(f"gave up after {attempt} attempts. host: {host}, error: {error}")
+                if error is e:
+                    raise
+                raise error from e
+            delay: float = policy.get_delay(attempt)
+            logger.warning(f"retrying in {delay:.2f}s ({attempt}/{policy.max_attempts}). host: {host}, error: {error}")
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+
+def with_retry(host: str, policy: RetryPolicy = None) -> Callable:
+    """call_with_retryを適用するデコレーター"""
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return call_with_retry(func, *args, host=host, policy=policy, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# スクレイピング処理の基底例外
+class ScrapingError(Exception):
+    def __init__(self, message: str, status_code: int = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# リトライで回復する可能性がある失敗(タイムアウト、5xx、429など)
+class TransientError(ScrapingError):
+    pass
+
+
+# リトライしても回復しない失敗(404、パース失敗など)
+class PermanentError(ScrapingError):
+    pass
+
+
+# サーキットブレーカーがopenの場合の例外
+class CircuitOpenError(TransientError):
+    def __init__(self, host: str, retry_after: float) -> None:
+        super().__init__(f"circuit is open. host: {host}, retry after {retry_after:.1f}s")
+        self.host = host
+        self.retry_after = retry_after
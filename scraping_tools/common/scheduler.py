@@ -0,0 +1,244 @@
+from __future__ import annotations
+import heapq
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from .retry import CircuitOpenError
+
+
+logger = logging.getLogger(__name__)
+
+
+class WatchTarget:
+    """監視対象(チャンネルのコンテンツ一覧など)を管理するクラス
+
+    取得結果から新しいコンテンツの出現頻度を学習し、ポーリング間隔を調整する。
+    """
+
+    # 出現頻度の指数移動平均の重み
+    alpha: float = 0.3
+
+    def __init__(
+        self,
+        key: str,
+        fetch: Callable[[], list],
+        min_interval: float = 300,
+        max_interval: float = 86400,
+        interval: float = None,
+    ) -> None:
+        """監視対象を設定する
+
+        Args:
+            key (str): 監視対象を識別するキー
+            fetch (Callable[[], list]): コンテンツ(Contentまたは文字列のID)のリストを返す関数
+            min_interval (float): ポーリング間隔の下限(秒)
+            max_interval (float): ポーリング間隔の上限(秒)
+            interval (float): 最初のポーリング間隔(秒)。未指定の場合はmin_intervalとmax_intervalの相乗平均
+        """
+        if min_interval <= 0 or min_interval > max_interval:
+            raise ValueError("min_interval must be positive and not greater than max_interval.")
+        self.key = key
+        self.fetch = fetch
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval: float = interval or (min_interval * max_interval) ** 0.5
+        # 1秒あたりの新着数の推定値
+        self.rate: float = None
+        self.next_run_at: float = time.time()
+        self.last_run_at: float = None
+        self.seen_ids: set[str] = set()
+        self.run_count: int = 0
+        self.error_count: int = 0
+
+    @classmethod
+    def for_channel(cls, channel: Any, method: str = "get_video", min_interval: float = 300, max_interval: float = 86400, **kwargs: Any) -> WatchTarget:
+        """NicoNicoChannel, ChannelPlusChannel, YTChannelなどのメソッドを監視対象にする
+
+        Example:
+            >>> WatchTarget.for_channel(NicoNicoChannel("ch2646073"), "get_video", limit=20)
+            >>> WatchTarget.for_channel(YTChannel("UC..."), "get_ids_from_feed")
+        """
+        key = f"{type(channel).__name__}:{channel.id}:{method}"
+        return cls(key, lambda: getattr(channel, method)(**kwargs), min_interval=min_interval, max_interval=max_interval)
+
+    def update(self, items: list, now: float) -> list:
+        """取得結果を反映してポーリング間隔を更新し、新しいコンテンツのリストを返す
+
+        初回の取得結果は基準として扱い、新しいコンテンツとはみなさない。
+        """
+        ids = [item if isinstance(item, str) else item.id for item in items]
+        is_first: bool = self.last_run_at is None
+        new_items = [] if is_first else [item for item, id in zip(items, ids) if id not in self.seen_ids]
+        self.seen_ids.update(ids)
+
+        # 新着の出現頻度を更新
+        if not is_first:
+            elapsed: float = max(now - self.last_run_at, 1)
+            rate: float = len(new_items) / elapsed
+            self.rate = rate if self.rate is None else self.alpha * rate + (1 - self.alpha) * self.rate
+            # 1回のポーリングで1件程度の新着がある間隔にする
+            interval: float = 1 / self.rate if self.rate > 0 else self.max_interval
+            self.interval = min(self.max_interval, max(self.min_interval, interval))
+
+        self.last_run_at = now
+        self.run_count += 1
+        self.next_run_at = now + self.interval
+
+        return new_items
+
+    def backoff(self, now: float, delay: float = None) -> None:
+        """取得に失敗した場合に次回の実行を遅らせる"""
+        self.error_count += 1
+        if delay is None:
+            # 失敗が続く間は間隔を倍にしていく
+            self.interval = min(self.max_interval, self.interval * 2)
+            delay = self.interval
+        self.next_run_at = now + delay
+
+
+class WatchScheduler:
+    """監視対象を定期的に取得するスケジューラー
+
+    実行予定時刻を過ぎた監視対象から順に、最大workers個を並行で実行する。
+
+    Example:
+        >>> scheduler = WatchScheduler(workers=4, on_update=lambda target, items: print(target.key, items))
+        >>> scheduler.add(WatchTarget.for_channel(NicoNicoChannel("ch2646073"), "get_video"))
+        >>> scheduler.start()
+        >>> scheduler.metrics()
+    """
+
+    def __init__(self, workers: int = 4, on_update: Callable[[WatchTarget, list], None] = None) -> None:
+        self.workers = workers
+        self.on_update = on_update
+        self._targets: dict[str, WatchTarget] = {}
+        # (次回の実行時刻, 登録順, キー)のヒープ
+        self._heap: list[tuple[float, int, str]] = []
+        self._counter: int = 0
+        self._running: set[str] = set()
+        self._condition = threading.Condition()
+        self._executor: ThreadPoolExecutor = None
+        self._thread: threading.Thread = None
+        self._stopped: bool = True
+        self._run_count: int = 0
+        self._error_count: int = 0
+
+    def add(self, target: WatchTarget) -> None:
+        """監視対象を追加する(同じキーの監視対象は置き換える)"""
+        with self._condition:
+            self._targets[target.key] = target
+            self._push(target)
+            self._condition.notify()
+
+    def remove(self, key: str) -> None:
+        """監視対象を削除する"""
+        with self._condition:
+            self._targets.pop(key, None)
+
+    def start(self) -> None:
+        """バックグラウンドのスレッドでスケジューラーを開始する"""
+        with self._condition:
+            if not self._stopped:
+                return
+            self._stopped = False
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="watch")
+        self._thread = threading.Thread(target=self._loop, name="watch-scheduler", daemon=True)
+        self._thread.start()
+
+    def run_forever(self) -> None:
+        """スケジューラーを開始し、stopが呼ばれるまでブロックする"""
+        self.start()
+        self._thread.join()
+
+    def stop(self, wait: bool = True) -> None:
+        """スケジューラーを停止する"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+        if self._executor:
+            self._executor.shutdown(wait=wait)
+
+    def metrics(self) -> dict:
+        """キューの深さと遅延などの状態を返す
+
+        queue_depth: 実行予定時刻を過ぎて実行を待っている監視対象の数
+        max_lag, mean_lag: 実行を待っている監視対象の、実行予定時刻からの遅れ(秒)
+        """
+        now = time.time()
+        with self._condition:
+            lags = [now - target.next_run_at for key, target in self._targets.items() if key not in self._running and target.next_run_at <= now]
+            return {
+                "targets": len(self._targets),
+                "running": len(self._running),
+                "queue_depth": len(lags),
+                "max_lag": max(lags) if lags else 0.0,
+                "mean_lag": sum(lags) / len(lags) if lags else 0.0,
+                "runs": self._run_count,
+                "errors": self._error_count,
+                "intervals": {key: target.interval for key, target in self._targets.items()},
+            }
+
+    def _push(self, target: WatchTarget) -> None:
+        self._counter += 1
+        heapq.heappush(self._heap, (target.next_run_at, self._counter, target.key))
+
+    def _loop(self) -> None:
+        with self._condition:
+            while not self._stopped:
+                now = time.time()
+                # 実行予定時刻を過ぎたものから、空いているワーカーの数だけ実行する
+                while self._heap and len(self._running) < self.workers:
+                    next_run_at, _, key = self._heap[0]
+                    target: WatchTarget = self._targets.get(key)
+                    # 削除された、または再登録されて古くなったエントリは捨てる
+                    if target is None or target.next_run_at != next_run_at or key in self._running:
+                        heapq.heappop(self._heap)
+                        continue
+                    if next_run_at > now:
+                        break
+                    heapq.heappop(self._heap)
+                    self._running.add(key)
+                    self._executor.submit(self._run, target)
+
+                # 次の実行予定時刻まで待機(ジョブの完了や追加で起こされる)
+                timeout = self._heap[0][0] - now if self._heap and len(self._running) < self.workers else None
+                self._condition.wait(timeout=max(timeout, 0) if timeout is not None else 1.0)
+
+    def _run(self, target: WatchTarget) -> None:
+        started_at = time.time()
+        try:
+            items: list = target.fetch()
+        except CircuitOpenError as e:
+            # ホストが停止している間は再試行しない
+            logger.warning(f"skip {target.key}: {e}")
+            with self._condition:
+                target.backoff(time.time(), delay=max(e.retry_after, target.min_interval))
+                self._error_count += 1
+        except Exception as e:
+            logger.error(f"failed to fetch {target.key}: {e}")
+            with self._condition:
+                target.backoff(time.time())
+                self._error_count += 1
+        else:
+            with self._condition:
+                new_items = target.update(items, started_at)
+                self._run_count += 1
+            logger.debug(f"fetched {target.key}: {len(new_items)} new items, next interval {target.interval:.0f}s")
+            if new_items and self.on_update:
+                try:
+                    self.on_update(target, new_items)
+                except Exception as e:
+                    logger.error(f"on_update failed for {target.key}: {e}")
+        finally:
+            with self._condition:
+                self._running.discard(target.key)
+                # 実行中にaddで置き換えられた場合は、新しい監視対象を登録する
+                current: WatchTarget = self._targets.get(target.key)
+                if current is not None:
+                    self._push(current)
+                self._condition.notify()
@@ -0,0 +1,438 @@
+from __future__ import annotations
+import importlib
+import json
+import logging
+import math
+import mmap
+import sys
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, Iterator
+
+from .base_class import Content
+from .store import get_fields
+from .timestamp import Timestamp
+
+
+logger = logging.getLogger(__name__)
+
+# ファイルの先頭に書き込む識別子とバージョン
+MAGIC = b"SCRSNAP\x00"
+VERSION = 1
+# 識別子(8バイト), バージョン(4バイト), メタデータの長さ(4バイト)
+HEADER_SIZE = 16
+# 各セクションの先頭を揃えるバイト数
+ALIGNMENT = 8
+
+# 値がNoneであることを表す値
+NONE_INT = -(2**63)
+NONE_INDEX = 0xFFFFFFFF
+NONE_BOOL = 2
+NAIVE_OFFSET = -32768
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _kind_of(value: Any) -> str:
+    """値から列の種類を判定する"""
+    # boolとTimestampはintのサブクラスなので先に判定する
+    if isinstance(value, Timestamp):
+        return "timestamp"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, str):
+        return "str"
+    if isinstance(value, datetime):
+        return "datetime"
+    if isinstance(value, timedelta):
+        return "timedelta"
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return "strlist"
+    return "json"
+
+
+def _merge_kind(current: str, kind: str) -> str:
+    """列の種類を合わせる(intとfloatはfloat、intとtimestampはint、それ以外が混在する場合はjson)"""
+    if current is None or current == kind:
+        return kind
+    if {current, kind} == {"int", "timestamp"}:
+        return "int"
+    if {current, kind} == {"int", "float"}:
+        return "float"
+    return "json"
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return str(value)
+
+
+def _to_micros(value: timedelta) -> int:
+    return (value.days * 86400 + value.seconds) * 1_000_000 + value.microseconds
+
+
+class _StringTable:
+    """文字列をUTF-8で連結して保持する表(同じ文字列は1回だけ保存する)"""
+
+    def __init__(self) -> None:
+        self.indexes: dict[str, int] = {}
+        self.offsets = array("q", [0])
+        self.blob = bytearray()
+
+    def add(self, value: str) -> int:
+        index = self.indexes.get(value)
+        if index is None:
+            index = len(self.indexes)
+            self.indexes[value] = index
+            self.blob += value.encode("utf-8")
+            self.offsets.append(len(self.blob))
+        return index
+
+
+def write_snapshot(contents: Iterable[Content], path: str) -> int:
+    """Video/Live/Newsのコンテンツをバイナリのスナップショットに書き出し、書き出した件数を返す
+
+    属性ごとに固定長の列として保存し、文字列は文字列表に、IDはソート済みの索引に保存する。
+    日時(Timestamp)はUNIX時間の整数の列になる。
+    読み込みはSnapshotReaderで行う。
+
+    逐次的には書き出さない。列の種類の判定とIDの索引の作成に全件が必要なため、
+    contentsは最初にlistにして、全件と変換後の列をメモリ上に置いてからファイルに書き込む。
+
+    Example:
+        >>> write_snapshot(channel.get_video(), "videos.snap")
+        >>> with SnapshotReader("videos.snap") as reader:
+        ...     video = reader.get("sm12345")
+    """
+    contents = list(contents)
+    count = len(contents)
+
+    # クラスごとの属性名と、全クラスの属性名の和集合
+    classes: list[type] = []
+    class_fields: dict[type, list[str]] = {}
+    names: list[str] = []
+    for content in contents:
+        cls = type(content)
+        if cls not in class_fields:
+            classes.append(cls)
+            class_fields[cls] = [field for field in get_fields(cls) if field != "id"]
+            names.extend(field for field in class_fields[cls] if field not in names)
+
+    # 値から列の種類を判定する
+    kinds: dict[str, str] = dict.fromkeys(names)
+    for content in contents:
+        for name in class_fields[type(content)]:
+            value = getattr(content, name, None)
+            if value is not None:
+                kinds[name] = _merge_kind(kinds[name], _kind_of(value))
+
+    strings = _StringTable()
+    lists = array("I")
+    class_indexes: dict[type, int] = {cls: i for i, cls in enumerate(classes)}
+    class_column = array("H", (class_indexes[type(content)] for content in contents))
+    id_column = array("I", (strings.add(content.id) for content in contents))
+
+    # 列ごとに値を変換する
+    columns: list[tuple[str, str, list[array]]] = []
+    for name in names:
+        kind: str = kinds[name] or "str"
+        values = [getattr(content, name, None) for content in contents]
+        columns.append((name, kind, _encode_column(kind, values, strings, lists)))
+
+    # IDの順に並べた行番号(IDによる検索に使う)
+    id_index = array("I", sorted(range(count), key=lambda row: contents[row].id.encode("utf-8")))
+
+    # セクションを並べてオフセットを決める
+    sections: list[bytes | bytearray | array] = []
+    offset = 0
+
+    def add_section(data: bytes | bytearray | array) -> int:
+        nonlocal offset
+        start = offset
+        sections.append(data)
+        size = len(data) * data.itemsize if isinstance(data, array) else len(data)
+        padding = -size % ALIGNMENT
+        if padding:
+            sections.append(b"\x00" * padding)
+        offset += size + padding
+        return start
+
+    meta: dict = {
+        "count": count,
+        "byteorder": sys.byteorder,
+        "classes": [f"{cls.__module__}:{cls.__qualname__}" for cls in classes],
+        "class_column": [add_section(class_column), "H"],
+        "id_column": [add_section(id_column), "I"],
+        "id_index": [add_section(id_index), "I"],
+        "columns": [
+            {"name": name, "kind": kind, "arrays": [[add_section(data), data.typecode] for data in arrays]}
+            for name, kind, arrays in columns
+        ],
+        "strings": {
+            "count": len(strings.indexes),
+            "offsets": add_section(strings.offsets),
+            "blob": add_section(strings.blob),
+        },
+        "lists": [add_section(lists), "I", len(lists)],
+    }
+
+    meta_bytes: bytes = json.dumps(meta).encode("utf-8")
+    meta_bytes += b" " * (-(HEADER_SIZE + len(meta_bytes)) % ALIGNMENT)
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(VERSION.to_bytes(4, "little"))
+        f.write(len(meta_bytes).to_bytes(4, "little"))
+        f.write(meta_bytes)
+        for section in sections:
+            f.write(section)
+
+    logger.debug(f"wrote snapshot {path}: {count} contents, {len(strings.indexes)} strings")
+    return count
+
+
+def _encode_column(kind: str, values: list, strings: _StringTable, lists: array) -> list[array]:
+    """列の値を固定長の配列に変換する"""
+    if kind in ("int", "timestamp"):
+        return [array("q", (NONE_INT if value is None else value for value in values))]
+    if kind == "float":
+        return [array("d", (math.nan if value is None else value for value in values))]
+    if kind == "bool":
+        return [array("B", (NONE_BOOL if value is None else int(value) for value in values))]
+    if kind == "str":
+        return [array("I", (NONE_INDEX if value is None else strings.add(value) for value in values))]
+    if kind == "json":
+        return [array("I", (NONE_INDEX if value is None else strings.add(json.dumps(value, ensure_ascii=False, default=_json_default)) for value in values))]
+    if kind == "timedelta":
+        return [array("q", (NONE_INT if value is None else _to_micros(value) for value in values))]
+    if kind == "datetime":
+        # 現地時刻のエポックからのマイクロ秒と、UTCとの差(分)に分けて保存する
+        micros, offsets = array("q"), array("h")
+        for value in values:
+            if value is None:
+                micros.append(NONE_INT)
+                offsets.append(NAIVE_OFFSET)
+                continue
+            utcoffset: timedelta = value.utcoffset()
+            micros.append(_to_micros(value.replace(tzinfo=None) - EPOCH))
+            offsets.append(NAIVE_OFFSET if utcoffset is None else int(utcoffset.total_seconds() // 60))
+        return [micros, offsets]
+    if kind == "strlist":
+        # 文字列のインデックスをlistsに連結し、開始位置と要素数を保存する
+        starts, counts = array("I"), array("I")
+        for value in values:
+            starts.append(len(lists))
+            if value is None:
+                counts.append(NONE_INDEX)
+                continue
+            counts.append(len(value))
+            lists.extend(strings.add(item) for item in value)
+        return [starts, counts]
+    raise ValueError(f"unknown column kind: {kind}")
+
+
+class SnapshotReader:
+    """write_snapshotで書き出したスナップショットをmmapで読み込むクラス
+
+    開くときにファイル全体を読み込まないので、件数に関係なくすぐに開ける。
+    Contentは行番号またはIDでアクセスした時に初めて生成する。
+    1つの属性だけを走査する場合はcolumnを使う。
+
+    Example:
+        >>> with SnapshotReader("videos.snap") as reader:
+        ...     video = reader.get("sm12345")
+        ...     total = sum(count for count in reader.column("view_count") if count)
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views: list[memoryview] = []
+        try:
+            self._load()
+        except BaseException:
+            self.close()
+            raise
+
+    def _load(self) -> None:
+        if self._mmap[:8] != MAGIC:
+            raise ValueError(f"not a snapshot file: {self.path}")
+        version = int.from_bytes(self._mmap[8:12], "little")
+        if version != VERSION:
+            raise ValueError(f"unsupported snapshot version: {version}")
+        meta_size = int.from_bytes(self._mmap[12:16], "little")
+        meta: dict = json.loads(self._mmap[HEADER_SIZE : HEADER_SIZE + meta_size])
+        if meta["byteorder"] != sys.byteorder:
+            raise ValueError(f"snapshot byte order ({meta['byteorder']}) does not match this machine")
+
+        self._base: int = HEADER_SIZE + meta_size
+        self._count: int = meta["count"]
+        self._class_names: list[str] = meta["classes"]
+        self._classes: list[type] = [None] * len(self._class_names)
+        self._class_fields: dict[type, frozenset] = {}
+        self._class_column = self._view(*meta["class_column"], self._count)
+        self._id_column = self._view(*meta["id_column"], self._count)
+        self._id_index = self._view(*meta["id_index"], self._count)
+
+        strings: dict = meta["strings"]
+        self._string_offsets = self._view(strings["offsets"], "q", strings["count"] + 1)
+        self._string_base: int = self._base + strings["blob"]
+        self._lists = self._view(*meta["lists"])
+
+        # 属性名をキーにした(種類, 配列のリスト)
+        self._columns: dict[str, tuple[str, list[memoryview]]] = {
+            column["name"]: (column["kind"], [self._view(offset, typecode, self._count) for offset, typecode in column["arrays"]])
+            for column in meta["columns"]
+        }
+
+    def _view(self, offset: int, typecode: str, length: int) -> memoryview:
+        size: int = array(typecode).itemsize * length
+        start: int = self._base + offset
+        view = memoryview(self._mmap)[start : start + size].cast(typecode)
+        self._views.append(view)
+        return view
+
+    def close(self) -> None:
+        # memoryviewを解放しないとmmapを閉じられない
+        for view in self._views:
+            view.release()
+        self._views.clear()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> SnapshotReader:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def fields(self) -> list[str]:
+        """保存されている属性名のリスト"""
+        return list(self._columns)
+
+    def _string(self, index: int) -> str:
+        start, end = self._string_offsets[index], self._string_offsets[index + 1]
+        return self._mmap[self._string_base + start : self._string_base + end].decode("utf-8")
+
+    def _string_bytes(self, index: int) -> bytes:
+        start, end = self._string_offsets[index], self._string_offsets[index + 1]
+        return self._mmap[self._string_base + start : self._string_base + end]
+
+    def _value(self, kind: str, arrays: list[memoryview], row: int) -> Any:
+        """列の種類に応じて値を復元する"""
+        value = arrays[0][row]
+        if kind == "int":
+            return None if value == NONE_INT else value
+        if kind == "timestamp":
+            return None if value == NONE_INT else Timestamp(value)
+        if kind == "float":
+            return None if math.isnan(value) else value
+        if kind == "bool":
+            return None if value == NONE_BOOL else bool(value)
+        if kind == "str":
+            return None if value == NONE_INDEX else self._string(value)
+        if kind == "json":
+            return None if value == NONE_INDEX else json.loads(self._string(value))
+        if kind == "timedelta":
+            return None if value == NONE_INT else timedelta(microseconds=value)
+        if kind == "datetime":
+            if value == NONE_INT:
+                return None
+            result: datetime = EPOCH + timedelta(microseconds=value)
+            offset = arrays[1][row]
+            return result if offset == NAIVE_OFFSET else result.replace(tzinfo=timezone(timedelta(minutes=offset)))
+        if kind == "strlist":
+            count = arrays[1][row]
+            if count == NONE_INDEX:
+                return None
+            return [self._string(index) for index in self._lists[value : value + count]]
+        raise ValueError(f"unknown column kind: {kind}")
+
+    def _get_class(self, index: int) -> type:
+        cls: type = self._classes[index]
+        if cls is None:
+            module_name, qualname = self._class_names[index].split(":")
+            cls = importlib.import_module(module_name)
+            for name in qualname.split("."):
+                cls = getattr(cls, name)
+            self._classes[index] = cls
+            self._class_fields[cls] = frozenset(get_fields(cls))
+        return cls
+
+    def __getitem__(self, row: int) -> Content:
+        """行番号でコンテンツを取得する"""
+        if row < 0:
+            row += self._count
+        if not 0 <= row < self._count:
+            raise IndexError("snapshot index out of range")
+
+        cls: type = self._get_class(self._class_column[row])
+        # __init__のID検証と文字列の正規化は書き出す前に済んでいるので省略する
+        content: Content = cls.__new__(cls)
+        object.__setattr__(content, "id", self._string(self._id_column[row]))
+        fields: frozenset = self._class_fields[cls]
+        for name, (kind, arrays) in self._columns.items():
+            if name in fields:
+                object.__setattr__(content, name, self._value(kind, arrays, row))
+        return content
+
+    def __iter__(self) -> Iterator[Content]:
+        for row in range(self._count):
+            yield self[row]
+
+    def find(self, id: str) -> int:
+        """IDの行番号を二分探索で取得する(存在しない場合は-1)"""
+        target: bytes = id.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._string_bytes(self._id_column[self._id_index[middle]]) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count:
+            row: int = self._id_index[low]
+            if self._string_bytes(self._id_column[row]) == target:
+                return row
+        return -1
+
+    def get(self, id: str, default: Content = None) -> Content:
+        """IDでコンテンツを取得する"""
+        row: int = self.find(id)
+        return self[row] if row >= 0 else default
+
+    def __contains__(self, id: str) -> bool:
+        return self.find(id) >= 0
+
+    def ids(self) -> Iterator[str]:
+        """保存順にIDを返す"""
+        for index in self._id_column:
+            yield self._string(index)
+
+    def column(self, name: str, raw: bool = False) -> Iterator[Any] | memoryview:
+        """1つの属性の値を保存順に返す
+
+        Args:
+            name: 属性名
+            raw: Trueの場合は変換前の配列(memoryview)を返す。
+                数値の列はNoneを表す値(NONE_INT, NaN)を含む
+        """
+        if name == "id":
+            return self.ids()
+        kind, arrays = self._columns[name]
+        if raw:
+            return arrays[0]
+        if kind == "int":
+            return (None if value == NONE_INT else value for value in arrays[0])
+        return (self._value(kind, arrays, row) for row in range(self._count))
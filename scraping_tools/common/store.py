@@ -0,0 +1,243 @@
+from __future__ import annotations
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Iterable, Iterator, NamedTuple
+
+from .base_class import Content, Live, News, Video
+
+
+logger = logging.getLogger(__name__)
+
+# コンテンツの種類とクラスの対応
+CONTENT_TYPES: dict[str, type] = {
+    "video": Video,
+    "live": Live,
+    "news": News,
+}
+# 1回のSELECTで指定するIDの数(SQLiteの変数の上限より小さくする)
+SELECT_CHUNK_SIZE = 500
+
+
+class Change(NamedTuple):
+    """upsertで追加または変更されたコンテンツ"""
+
+    platform: str
+    type: str
+    id: str
+    is_new: bool
+    # 属性名をキーにした(変更前, 変更後)
+    fields: dict[str, tuple]
+
+
+def get_platform(content: Content) -> str:
+    """コンテンツのプラットフォーム名を取得する
+
+    クラスの_platform属性(NicoNicoVideoの場合はNicoNico)を使う。
+    設定されていない場合はscraping_tools直下のパッケージ名(scraping_tools.DLsite.Maniax.WorkならDLsite)とする。
+    """
+    platform: str = getattr(type(content), "_platform", None)
+    if platform:
+        return platform
+    parts: list = type(content).__module__.split(".")
+    if parts[0] == "scraping_tools" and len(parts) >= 3:
+        return parts[1]
+    return parts[-2] if len(parts) >= 2 else parts[-1]
+
+
+def get_fields(cls: type) -> list[str]:
+    """クラス階層の__slots__から保存する属性名のリストを取得する"""
+    fields = []
+    for klass in reversed(cls.__mro__):
+        for name in klass.__dict__.get("__slots__", []):
+            if name not in fields:
+                fields.append(name)
+    return fields
+
+
+class ContentStore:
+    """Contentを保存するSQLiteのストア
+
+    コンテンツの種類ごとにテーブルを作成し、(platform, type, id)をキーにする。
+    upsertは保存済みの値と比較して、変更された属性を返す。
+
+    Example:
+        >>> store = ContentStore("contents.db")
+        >>> changes = store.upsert(NicoNicoChannel("ch2646073").get_video(limit=100))
+        >>> for change in changes:
+        ...     print(change.id, change.fields)
+    """
+
+    def __init__(self, path: str = ":memory:") -> None:
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        # 読み込みと書き込みを並行できるようにWALモードにする
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._fields: dict[str, list[str]] = {}
+        for type_, cls in CONTENT_TYPES.items():
+            self._create_table(type_, cls)
+
+    def _create_table(self, type_: str, cls: type) -> None:
+        fields: list[str] = [field for field in get_fields(cls) if field != "id"]
+        self._fields[type_] = fields
+        columns: str = ", ".join(f'"{field}"' for field in fields)
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS "{type_}" (platform TEXT NOT NULL, type TEXT NOT NULL, id TEXT NOT NULL, {columns}, PRIMARY KEY (platform, type, id))')
+        # 既存のテーブルに足りない列を追加する
+        existing: set[str] = {row[1] for row in self._conn.execute(f'PRAGMA table_info("{type_}")')}
+        for field in fields:
+            if field not in existing:
+                self._conn.execute(f'ALTER TABLE "{type_}" ADD COLUMN "{field}"')
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> ContentStore:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    @staticmethod
+    def _deserialize(field: str, value: Any) -> Any:
+        """SQLiteから読み込んだ値を元の型に戻す"""
+        # リストはJSONで保存している
+        if field == "tags" and isinstance(value, str):
+            return json.loads(value)
+        if field == "is_deleted" and value is not None:
+            return bool(value)
+        return value
+
+    @staticmethod
+    def _serialize(value: Any) -> Any:
+        """SQLiteに保存できる値に変換する"""
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, (list, tuple, dict)):
+            return json.dumps(value, ensure_ascii=False)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+    def upsert(self, contents: Iterable[Content], platform: str = None) -> list[Change]:
+        """コンテンツをまとめて追加または更新し、追加または変更されたコンテンツのリストを返す
+
+        1つのトランザクションで実行する。値がNoneの属性は不明とみなし、保存済みの値を上書きしない。
+
+        Args:
+            contents: 保存するコンテンツ
+            platform: プラットフォーム名(省略した場合はget_platformで判定する)
+        """
+        # 種類とプラットフォームごとにまとめる
+        groups: dict[tuple[str, str], dict[str, Content]] = {}
+        for content in contents:
+            key = (content.type, platform or get_platform(content))
+            groups.setdefault(key, {})[content.id] = content
+
+        changes: list[Change] = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for (type_, platform_), group in groups.items():
+                    changes.extend(self._upsert_group(type_, platform_, group))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        logger.debug(f"upserted {sum(len(group) for group in groups.values())} contents, {len(changes)} changed")
+        return changes
+
+    def _upsert_group(self, type_: str, platform: str, group: dict[str, Content]) -> list[Change]:
+        fields: list[str] = self._fields[type_]
+        columns: str = ", ".join(f'"{field}"' for field in fields)
+
+        # 保存済みの行をまとめて取得
+        stored: dict[str, tuple] = {}
+        ids: list[str] = list(group)
+        for i in range(0, len(ids), SELECT_CHUNK_SIZE):
+            chunk = ids[i : i + SELECT_CHUNK_SIZE]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f'SELECT id, {columns} FROM "{type_}" WHERE platform = ? AND type = ? AND id IN ({placeholders})',
+                [platform, type_, *chunk],
+            )
+            for row in rows:
+                stored[row[0]] = row[1:]
+
+        changes: list[Change] = []
+        rows_to_write: list[list] = []
+        for id, content in group.items():
+            new_values: list = [self._serialize(getattr(content, field, None)) for field in fields]
+            old_values: tuple = stored.get(id)
+            if old_values is None:
+                changed = {field: (None, self._deserialize(field, value)) for field, value in zip(fields, new_values) if value is not None}
+                changes.append(Change(platform, type_, id, True, changed))
+                rows_to_write.append([platform, type_, id, *new_values])
+                continue
+
+            # Noneの属性は保存済みの値を使う
+            merged: list = [old if new is None else new for old, new in zip(old_values, new_values)]
+            # 変更の有無は元の型の値で比較する
+            changed = {}
+            for field, old, new in zip(fields, old_values, merged):
+                if old == new:
+                    continue
+                old, new = self._deserialize(field, old), self._deserialize(field, new)
+                if old != new:
+                    changed[field] = (old, new)
+            if changed:
+                changes.append(Change(platform, type_, id, False, changed))
+                rows_to_write.append([platform, type_, id, *merged])
+
+        if rows_to_write:
+            placeholders = ", ".join("?" * (len(fields) + 3))
+            updates = ", ".join(f'"{field}" = excluded."{field}"' for field in fields)
+            self._conn.executemany(
+                f'INSERT INTO "{type_}" (platform, type, id, {columns}) VALUES ({placeholders}) ON CONFLICT (platform, type, id) DO UPDATE SET {updates}',
+                rows_to_write,
+            )
+
+        return changes
+
+    def get(self, platform: str, type_: str, id: str) -> dict:
+        """保存済みのコンテンツを辞書で取得する(存在しない場合はNone)"""
+        fields: list[str] = self._fields[type_]
+        columns: str = ", ".join(f'"{field}"' for field in fields)
+        with self._lock:
+            row = self._conn.execute(f'SELECT id, {columns} FROM "{type_}" WHERE platform = ? AND type = ? AND id = ?', [platform, type_, id]).fetchone()
+        return self._to_dict(fields, row) if row else None
+
+    def iter_dicts(self, type_: str, platform: str = None) -> Iterator[dict]:
+        """保存済みのコンテンツを辞書で1件ずつ返す"""
+        fields: list[str] = self._fields[type_]
+        columns: str = ", ".join(f'"{field}"' for field in fields)
+        query = f'SELECT id, {columns} FROM "{type_}"'
+        params: list = []
+        if platform:
+            query += " WHERE platform = ?"
+            params.append(platform)
+        # 共有している接続は他のスレッドの書き込みと同時に使えないため、ロックを取ってまとめて読み込む
+        with self._lock:
+            rows: list[tuple] = self._conn.execute(query, params).fetchall()
+        for row in rows:
+            yield self._to_dict(fields, row)
+
+    def count(self, type_: str, platform: str = None) -> int:
+        query = f'SELECT COUNT(*) FROM "{type_}"'
+        params: list = []
+        if platform:
+            query += " WHERE platform = ?"
+            params.append(platform)
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()[0]
+
+    @classmethod
+    def _to_dict(cls, fields: list[str], row: tuple) -> dict:
+        dict_ = {"id": row[0]}
+        for field, value in zip(fields, row[1:]):
+            dict_[field] = cls._deserialize(field, value)
+        return dict_
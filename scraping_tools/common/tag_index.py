@@ -0,0 +1,271 @@
+from __future__ import annotations
+import heapq
+import logging
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator
+
+from .base_class import Content
+from .store import get_platform
+
+
+logger = logging.getLogger(__name__)
+
+
+class TagVocabulary:
+    """タグと整数のタグIDを対応させる辞書"""
+
+    def __init__(self, tags: Iterable[str] = ()) -> None:
+        self._ids: dict[str, int] = {}
+        self._tags: list[str] = []
+        for tag in tags:
+            self.add(tag)
+
+    def add(self, tag: str) -> int:
+        """タグを登録してタグIDを返す(登録済みの場合は既存のタグID)"""
+        tag_id = self._ids.get(tag)
+        if tag_id is None:
+            tag_id = self._ids[tag] = len(self._tags)
+            self._tags.append(tag)
+        return tag_id
+
+    def get_id(self, tag: str) -> int:
+        """タグIDを返す(未登録の場合はNone)"""
+        return self._ids.get(tag)
+
+    def get_tag(self, tag_id: int) -> str:
+        return self._tags[tag_id]
+
+    def encode(self, tags: Iterable[str]) -> array:
+        """タグのリストをタグIDの配列に変換する(重複は除く)"""
+        return array("I", sorted({self.add(tag) for tag in tags}))
+
+    def decode(self, tag_ids: Iterable[int]) -> list[str]:
+        return [self._tags[tag_id] for tag_id in tag_ids]
+
+    def __len__(self) -> int:
+        return len(self._tags)
+
+    def __contains__(self, tag: str) -> bool:
+        return tag in self._ids
+
+
+class TagIndex:
+    """タグの転置索引
+
+    コンテンツごとにタグIDの配列を、タグごとにコンテンツ番号の配列(ポスティング)を保持する。
+    配列はarray("I")なので、1件あたり4バイトで保持できる。
+    同じコンテンツを追加し直した場合は古いコンテンツ番号を削除済みにし、compactで詰める。
+
+    Example:
+        >>> index = TagIndex()
+        >>> for channel in channels:
+        ...     index.add_all(channel.get_video())
+        >>> index.query(all_of=["ゲーム実況"], any_of=["Minecraft", "マイクラ"], poster_ids=channel_ids)
+        >>> index.top_k(10)
+    """
+
+    def __init__(self, vocabulary: TagVocabulary = None) -> None:
+        self.vocabulary: TagVocabulary = vocabulary or TagVocabulary()
+        self._contents: list[Content] = []
+        self._doc_tags: list[array] = []
+        # (platform, type, id)をキーにした現在のコンテンツ番号
+        self._docs: dict[tuple[str, str, str], int] = {}
+        # タグIDごとのコンテンツ番号の配列(昇順)
+        self._postings: list[array] = []
+        # タグIDごとの有効なコンテンツの数
+        self._counts: list[int] = []
+        self._deleted: int = 0
+
+    @staticmethod
+    def _key(content: Content) -> tuple[str, str, str]:
+        return (get_platform(content), content.type, content.id)
+
+    def add(self, content: Content) -> None:
+        """コンテンツを追加する(追加済みの場合はタグを更新する)"""
+        key = self._key(content)
+        tag_ids: array = self.vocabulary.encode(content.tags or ())
+        old_doc: int = self._docs.get(key)
+        if old_doc is not None:
+            if self._doc_tags[old_doc] == tag_ids:
+                self._contents[old_doc] = content
+                return
+            self._delete(old_doc)
+
+        doc: int = len(self._contents)
+        self._contents.append(content)
+        self._doc_tags.append(tag_ids)
+        self._docs[key] = doc
+        # コンテンツ番号は増えていくだけなのでポスティングは昇順のまま
+        for tag_id in tag_ids:
+            while tag_id >= len(self._postings):
+                self._postings.append(array("I"))
+                self._counts.append(0)
+            self._postings[tag_id].append(doc)
+            self._counts[tag_id] += 1
+
+    def add_all(self, contents: Iterable[Content]) -> None:
+        for content in contents:
+            self.add(content)
+
+    def remove(self, content: Content) -> None:
+        """コンテンツを削除する"""
+        doc: int = self._docs.pop(self._key(content), None)
+        if doc is not None:
+            self._delete(doc)
+
+    def _delete(self, doc: int) -> None:
+        # ポスティングからは消さず、compactまで削除済みとして扱う
+        for tag_id in self._doc_tags[doc]:
+            self._counts[tag_id] -= 1
+        self._contents[doc] = None
+        self._deleted += 1
+
+    def compact(self) -> None:
+        """削除済みのコンテンツを詰めてポスティングを作り直す"""
+        contents, doc_tags = self._contents, self._doc_tags
+        self._contents, self._doc_tags, self._docs = [], [], {}
+        self._postings = [array("I") for _ in self._postings]
+        self._counts = [0] * len(self._counts)
+        self._deleted = 0
+        for content, tag_ids in zip(contents, doc_tags):
+            if content is None:
+                continue
+            doc = len(self._contents)
+            self._contents.append(content)
+            self._doc_tags.append(tag_ids)
+            self._docs[self._key(content)] = doc
+            for tag_id in tag_ids:
+                self._postings[tag_id].append(doc)
+                self._counts[tag_id] += 1
+
+    def __len__(self) -> int:
+        return len(self._contents) - self._deleted
+
+    def __contains__(self, content: Content) -> bool:
+        return self._key(content) in self._docs
+
+    def tag_ids(self, content: Content) -> array:
+        """コンテンツのタグIDの配列を返す"""
+        return self._doc_tags[self._docs[self._key(content)]]
+
+    def _posting(self, tag: str) -> array:
+        tag_id: int = self.vocabulary.get_id(tag)
+        if tag_id is None or tag_id >= len(self._postings):
+            return array("I")
+        return self._postings[tag_id]
+
+    @staticmethod
+    def _intersect(postings: list[array]) -> list[int]:
+        """昇順の配列の共通部分(短い配列の要素を長い配列から二分探索する)"""
+        postings = sorted(postings, key=len)
+        result: list[int] = list(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            matched = []
+            low = 0
+            for doc in result:
+                low = bisect_left(posting, doc, low)
+                if low == len(posting):
+                    break
+                if posting[low] == doc:
+                    matched.append(doc)
+            result = matched
+        return result
+
+    def query_docs(self, all_of: Iterable[str] = None, any_of: Iterable[str] = None, none_of: Iterable[str] = None) -> list[int]:
+        """条件に一致するコンテンツ番号のリストを昇順で返す(削除済みを含む)"""
+        groups: list[list[int]] = []
+        if all_of:
+            groups.append(self._intersect([self._posting(tag) for tag in set(all_of)]))
+        if any_of:
+            union: set[int] = set()
+            for tag in set(any_of):
+                union.update(self._posting(tag))
+            groups.append(sorted(union))
+        if not groups:
+            docs: list[int] = list(range(len(self._contents)))
+        elif len(groups) == 1:
+            docs = groups[0]
+        else:
+            docs = self._intersect([array("I", group) for group in groups])
+        if none_of:
+            excluded: set[int] = set()
+            for tag in set(none_of):
+                excluded.update(self._posting(tag))
+            docs = [doc for doc in docs if doc not in excluded]
+        return docs
+
+    def iter_query(
+        self,
+        all_of: Iterable[str] = None,
+        any_of: Iterable[str] = None,
+        none_of: Iterable[str] = None,
+        poster_ids: Iterable[str] = None,
+    ) -> Iterator[Content]:
+        """条件に一致するコンテンツを追加順に1件ずつ返す
+
+        Args:
+            all_of: 全て付いているタグ(AND)
+            any_of: いずれかが付いているタグ(OR)
+            none_of: 付いていないタグ(NOT)
+            poster_ids: 投稿者IDの絞り込み
+        """
+        poster_ids = set(poster_ids) if poster_ids is not None else None
+        for doc in self.query_docs(all_of, any_of, none_of):
+            content: Content = self._contents[doc]
+            if content is None:
+                continue
+            if poster_ids is not None and content.poster_id not in poster_ids:
+                continue
+            yield content
+
+    def query(
+        self,
+        all_of: Iterable[str] = None,
+        any_of: Iterable[str] = None,
+        none_of: Iterable[str] = None,
+        poster_ids: Iterable[str] = None,
+        limit: int = None,
+    ) -> list[Content]:
+        """条件に一致するコンテンツのリストを返す(引数はiter_queryと同じ)"""
+        results = []
+        for content in self.iter_query(all_of, any_of, none_of, poster_ids):
+            if limit is not None and len(results) >= limit:
+                break
+            results.append(content)
+        return results
+
+    def count(self, tag: str) -> int:
+        """タグが付いているコンテンツの数"""
+        tag_id: int = self.vocabulary.get_id(tag)
+        return self._counts[tag_id] if tag_id is not None and tag_id < len(self._counts) else 0
+
+    def top_k(self, k: int = 10, contents: Iterable[Content] = None) -> list[tuple[str, int]]:
+        """件数の多いタグを(タグ, 件数)のリストで返す
+
+        contentsを指定した場合はそのコンテンツ(queryの結果など)の中で数える。
+        """
+        if contents is None:
+            counts: Iterable[tuple[int, int]] = enumerate(self._counts)
+        else:
+            counter: dict[int, int] = {}
+            for content in contents:
+                doc: int = self._docs.get(self._key(content))
+                if doc is None:
+                    continue
+                for tag_id in self._doc_tags[doc]:
+                    counter[tag_id] = counter.get(tag_id, 0) + 1
+            counts = counter.items()
+        top = heapq.nlargest(k, ((count, tag_id) for tag_id, count in counts if count > 0), key=lambda item: (item[0], -item[1]))
+        return [(self.vocabulary.get_tag(tag_id), count) for count, tag_id in top]
+
+    def memory_usage(self) -> dict:
+        """タグIDの配列とポスティングのバイト数"""
+        return {
+            "tags": len(self.vocabulary),
+            "contents": len(self),
+            "postings_bytes": sum(posting.buffer_info()[1] * posting.itemsize for posting in self._postings),
+            "doc_tags_bytes": sum(tag_ids.buffer_info()[1] * tag_ids.itemsize for tag_ids in self._doc_tags),
+        }
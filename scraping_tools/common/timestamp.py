@@ -0,0 +1,75 @@
+from __future__ import annotations
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+# タイムゾーンのない日時はサイトの表示時刻(日本時間)とみなす
+JST = timezone(timedelta(hours=9), "JST")
+DEFAULT_TIMEZONE = JST
+
+# Contentの日時の属性
+TIMESTAMP_FIELDS = frozenset(["posted_at", "updated_at", "start_at", "end_at", "archive_enabled_at"])
+
+
+class Timestamp(int):
+    """UNIX時間(秒)の整数で保持する日時
+
+    intなので並び替えや比較は整数の比較で行える。
+    ISO8601形式の文字列はisoformatまたはstrで必要になった時に生成する。
+
+    Example:
+        >>> ts = Timestamp.from_datetime(datetime(2023, 9, 23, 22, 0))
+        >>> int(ts)
+        1695474000
+        >>> str(ts)
+        '2023-09-23T22:00:00+09:00'
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_datetime(cls, value: datetime, tz: timezone = DEFAULT_TIMEZONE) -> Timestamp:
+        """datetimeから変換する(タイムゾーンのない日時はtzの時刻とみなす)"""
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=tz)
+        return cls(int(value.timestamp()))
+
+    @classmethod
+    def parse(cls, value: str, tz: timezone = DEFAULT_TIMEZONE) -> Timestamp:
+        """ISO8601形式の文字列から変換する(末尾のZはUTC)"""
+        if value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        return cls.from_datetime(datetime.fromisoformat(value), tz)
+
+    @classmethod
+    def now(cls) -> Timestamp:
+        return cls(int(datetime.now(timezone.utc).timestamp()))
+
+    def to_datetime(self, tz: timezone = DEFAULT_TIMEZONE) -> datetime:
+        """タイムゾーン付きのdatetimeに変換する"""
+        return datetime.fromtimestamp(int(self), tz)
+
+    def isoformat(self, tz: timezone = DEFAULT_TIMEZONE) -> str:
+        return self.to_datetime(tz).isoformat()
+
+    def __str__(self) -> str:
+        return self.isoformat()
+
+    def __repr__(self) -> str:
+        return f"Timestamp({int(self)}, '{self.isoformat()}')"
+
+
+def to_timestamp(value: Any, tz: timezone = DEFAULT_TIMEZONE) -> Timestamp:
+    """datetime, ISO8601形式の文字列, UNIX時間をTimestampに変換する(Noneはそのまま)
+
+    Raises:
+        ValueError: 変換できない値の場合
+    """
+    if value is None or isinstance(value, Timestamp):
+        return value
+    if isinstance(value, datetime):
+        return Timestamp.from_datetime(value, tz)
+    if isinstance(value, str):
+        return Timestamp.parse(value, tz)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return Timestamp(int(value))
+    raise ValueError(f"invalid timestamp: {value!r}")
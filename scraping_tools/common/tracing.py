@@ -0,0 +1,252 @@
+from __future__ import annotations
+import logging
+import os
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, NamedTuple
+
+import selenium
+
+logger = logging.getLogger(__name__)
+
+# トレースを有効にする環境変数
+TRACE_ENV: str = "SCRAPING_TOOLS_TRACE"
+# 保持するスクレイピング処理のトレースの数
+RECENT_TRACES: int = 100
+# 要素を探すコマンド(セレクター毎に集計する)
+FIND_COMMANDS: frozenset = frozenset({"findElement", "findElements", "findChildElement", "findChildElements"})
+
+_enabled: bool = os.environ.get(TRACE_ENV, "").lower() in ("1", "true")
+# 実行中のトレース
+_current: ContextVar[CommandTrace] = ContextVar("scraping_command_trace", default=None)
+# 終了したスクレイピング処理のトレース
+_recent: deque = deque(maxlen=RECENT_TRACES)
+
+# 呼び出し元として扱わないファイル(Seleniumとトレース、計測、記録/再生の処理)
+_INTERNAL_DIRS: tuple = (os.path.dirname(os.path.abspath(selenium.__file__)),)
+_COMMON_DIR: str = os.path.dirname(os.path.abspath(__file__))
+_INTERNAL_FILES: frozenset = frozenset(os.path.join(_COMMON_DIR, name) for name in ("tracing.py", "metrics.py", "replay.py"))
+
+
+class CommandRecord(NamedTuple):
+    """WebDriverに送った1つのコマンド"""
+
+    command: str
+    # セレクター(xpath: //div など)、URL、スクリプトの名前など
+    target: str
+    seconds: float
+    # 呼び出し元(niconico.py:245 __video_page など)
+    caller: str
+
+
+class CommandTrace:
+    """WebDriverに送ったコマンドの記録
+
+    summary()でアイテムあたりのコマンド数、呼び出し元毎の所要時間、時間のかかったセレクターを集計する。
+    """
+
+    def __init__(self, name: str = "") -> None:
+        self.name = name
+        self.records: list[CommandRecord] = []
+        self.items: int = 0
+        self.started: float = time.perf_counter()
+        self.seconds: float = 0.0
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def add(self, record: CommandRecord) -> None:
+        self.records.append(record)
+
+    def finish(self, items: int = None) -> None:
+        self.seconds = time.perf_counter() - self.started
+        if items is not None:
+            self.items = items
+
+    @staticmethod
+    def _aggregate(records: list[CommandRecord], key: Callable[[CommandRecord], str], name: str, top: int) -> list[dict]:
+        groups: dict[str, dict] = {}
+        for record in records:
+            group: dict = groups.setdefault(key(record), {name: key(record), "count": 0, "seconds": 0.0, "max_seconds": 0.0})
+            group["count"] += 1
+            group["seconds"] += record.seconds
+            group["max_seconds"] = max(group["max_seconds"], record.seconds)
+        return sorted(groups.values(), key=lambda group: group["seconds"], reverse=True)[:top]
+
+    def summary(self, top: int = 10) -> dict:
+        """コマンドを集計する
+
+        Returns:
+            dict: name, items, commands, seconds(コマンドの合計時間), commands_per_item, seconds_per_item,
+                by_command(コマンド毎), by_caller(呼び出し元毎), slowest_selectors(要素を探すコマンドのセレクター毎)
+                by_で始まる項目とslowest_selectorsは合計時間の長い順にtop件
+        """
+        seconds: float = sum(record.seconds for record in self.records)
+        return {
+            "name": self.name,
+            "items": self.items,
+            "commands": len(self.records),
+            "seconds": seconds,
+            "commands_per_item": len(self.records) / self.items if self.items else None,
+            "seconds_per_item": seconds / self.items if self.items else None,
+            "by_command": self._aggregate(self.records, lambda record: record.command, "command", top),
+            "by_caller": self._aggregate(self.records, lambda record: record.caller, "caller", top),
+            "slowest_selectors": self._aggregate(
+                [record for record in self.records if record.command in FIND_COMMANDS],
+                lambda record: record.target,
+                "selector",
+                top,
+            ),
+        }
+
+    def format_summary(self, top: int = 10) -> str:
+        """summary()を読みやすい文字列にする"""
+        summary: dict = self.summary(top)
+        per_item: str = f", {summary['commands_per_item']:.1f} commands/item" if summary["items"] else ""
+        lines: list[str] = [
+            f"{summary['name'] or 'trace'}: {summary['commands']} commands in {summary['seconds']:.3f}s"
+            f" ({summary['items']} items{per_item})"
+        ]
+        for title, key, name in (("by caller", "by_caller", "caller"), ("slowest selectors", "slowest_selectors", "selector")):
+            if not summary[key]:
+                continue
+            lines.append(f"  {title}:")
+            for group in summary[key]:
+                lines.append(f"    {group['seconds']:8.3f}s {group['count']:5d}x  {group[name]}")
+        return "\n".join(lines)
+
+
+# ----- 有効/無効 -----
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable_tracing(enabled: bool = True) -> None:
+    """スクレイピング処理毎のトレースを有効(または無効)にする
+
+    有効にした後に開いたブラウザのコマンドを、実行中のスクレイピング処理(metrics.instrumentを付けたメソッド)毎に記録し、
+    処理の終了時に集計をログに出力する。集計はrecent_traces()でも取得できる。
+    """
+    global _enabled
+    _enabled = enabled
+
+
+def recent_traces() -> list[CommandTrace]:
+    """終了したスクレイピング処理のトレース(古い順、最大RECENT_TRACES件)"""
+    return list(_recent)
+
+
+# ----- 記録 -----
+
+
+def _is_internal(filename: str) -> bool:
+    return filename in _INTERNAL_FILES or filename.startswith(_INTERNAL_DIRS)
+
+
+def _format_frame(frame: Any) -> str:
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+
+def _caller() -> str:
+    """コマンドを送った処理を取得する
+
+    共通関数(common_func.get_matching_elementなど)から送られた場合は、共通関数を呼んだ処理も付ける。
+    """
+    frame = sys._getframe(2)
+    while frame is not None and _is_internal(os.path.abspath(frame.f_code.co_filename)):
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    caller: str = _format_frame(frame)
+    if os.path.dirname(os.path.abspath(frame.f_code.co_filename)) == _COMMON_DIR:
+        outer = frame.f_back
+        while outer is not None and os.path.dirname(os.path.abspath(outer.f_code.co_filename)) == _COMMON_DIR:
+            outer = outer.f_back
+        if outer is not None:
+            caller += f" < {_format_frame(outer)}"
+    return caller
+
+
+def _target(driver_command: str, params: dict) -> str:
+    """コマンドの対象(セレクター、URL、スクリプトの名前)を取得する"""
+    if not params:
+        return ""
+    if "using" in params:
+        return f"{params['using']}: {params.get('value')}"
+    if "url" in params:
+        return params["url"]
+    if "script" in params:
+        script: str = params["script"].strip()
+        # Seleniumのget_attributeなどは「/* getAttribute */」で始まるスクリプトを送る
+        if script.startswith("/*"):
+            name: str = script[2 : script.find("*/")].strip()
+            args: list = params.get("args") or []
+            return f"{name}: {args[1]}" if len(args) > 1 and isinstance(args[1], str) else name
+        return script[:80]
+    if "name" in params:
+        return params["name"]
+    return ""
+
+
+def trace_driver(driver: Any) -> Any:
+    """WebDriverに送るコマンドを、実行中のトレースに記録するようにする
+
+    トレースが実行中でない場合は、コンテキスト変数を確認するだけでコマンドを送る。
+    記録/再生のラッパー(EventFiringWebDriver)の場合は、中のWebDriverに設定する。
+    """
+    driver = getattr(driver, "wrapped_driver", driver)
+    if getattr(driver, "_command_tracing", False):
+        return driver
+    execute: Callable = driver.execute
+
+    def tracing_execute(driver_command: str, params: dict = None) -> Any:
+        trace: CommandTrace = _current.get()
+        if trace is None:
+            return execute(driver_command, params)
+        started: float = time.perf_counter()
+        try:
+            return execute(driver_command, params)
+        finally:
+            trace.add(CommandRecord(driver_command, _target(driver_command, params), time.perf_counter() - started, _caller()))
+
+    driver.execute = tracing_execute
+    driver._command_tracing = True
+    return driver
+
+
+@contextmanager
+def trace_commands(driver: Any, name: str = "") -> Iterator[CommandTrace]:
+    """with文の中でWebDriverに送られたコマンドを記録する
+
+    Example:
+        >>> with trace_commands(channel._driver, "get_video") as trace:
+        ...     videos = channel.get_video(limit=20)
+        >>> trace.items = len(videos)
+        >>> print(trace.format_summary())
+    """
+    trace_driver(driver)
+    trace = CommandTrace(name)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        trace.finish()
+
+
+def begin_scrape(name: str) -> CommandTrace:
+    """スクレイピング処理のトレースを作成する(metrics.instrumentから呼ばれる)"""
+    return CommandTrace(name)
+
+
+def end_scrape(trace: CommandTrace, items: int) -> None:
+    """スクレイピング処理のトレースを終了し、集計をログに出力する"""
+    trace.finish(items)
+    _recent.append(trace)
+    if trace.records:
+        logger.info(trace.format_summary())
@@ -0,0 +1,4 @@
+import os
+
+# scraping_tools.YouTubeはインポート時にAPIキーを読むため、テストではダミーの値を設定する
+os.environ.setdefault("YOUTUBE_API_KEY", "dummy")
@@ -0,0 +1,85 @@
+from scraping_tools.NicoNico.niconico import NicoNicoLive, NicoNicoVideo
+from scraping_tools.common.changes import ChangeStream
+from scraping_tools.common.store import ContentStore
+
+
+def make_video(poster_id: str, id: str, title: str = None) -> NicoNicoVideo:
+    video = NicoNicoVideo(id)
+    video.poster_id = poster_id
+    video.title = title or id
+    return video
+
+
+def make_live(poster_id: str, id: str) -> NicoNicoLive:
+    live = NicoNicoLive(id)
+    live.poster_id = poster_id
+    return live
+
+
+def kinds(events) -> list:
+    return [(event.kind, event.id) for event in events]
+
+
+def test_two_channels_sharing_a_stream_do_not_delete_each_other():
+    stream = ChangeStream()
+    assert kinds(stream.diff([make_video("ch1", "sm1")], scope="ch1")) == [("new", "sm1")]
+    assert kinds(stream.diff([make_video("ch2", "sm2")], scope="ch2")) == [("new", "sm2")]
+
+    assert kinds(stream.diff([make_video("ch1", "sm1", "renamed")], scope="ch1")) == [("changed", "sm1")]
+    assert kinds(stream.diff([make_video("ch2", "sm2")], scope="ch2")) == []
+
+    assert kinds(stream.diff([], scope="ch1")) == [("deleted", "sm1")]
+    assert kinds(stream.diff([make_video("ch2", "sm2")], scope="ch2")) == []
+
+
+def test_types_missing_from_a_batch_are_deleted():
+    stream = ChangeStream()
+    list(stream.diff([make_video("ch1", "sm1"), make_live("ch1", "lv1")], scope="ch1"))
+
+    assert kinds(stream.diff([make_video("ch1", "sm1")], scope="ch1")) == [("deleted", "lv1")]
+
+
+def test_without_scope_deletions_are_not_detected():
+    stream = ChangeStream()
+    list(stream.diff([make_video("ch1", "sm1"), make_video("ch1", "sm2")]))
+
+    assert kinds(stream.diff([make_video("ch1", "sm1")])) == []
+
+
+def test_scoped_deletions_with_store():
+    with ContentStore() as store:
+        stream = ChangeStream(store)
+        list(stream.diff([make_video("ch1", "sm1")], scope="ch1"))
+        list(stream.diff([make_video("ch2", "sm2")], scope="ch2"))
+
+        assert kinds(stream.diff([make_video("ch1", "sm1", "renamed")], scope="ch1")) == [("changed", "sm1")]
+        assert kinds(stream.diff([], scope="ch2")) == [("deleted", "sm2")]
+
+
+def listing_then_detail() -> list[list[NicoNicoVideo]]:
+    """一覧(再生数と説明なし)、詳細、再び一覧の順に取得した結果"""
+    listing = make_video("ch1", "sm1", "title")
+    detail = make_video("ch1", "sm1", "title")
+    detail.view_count = 100
+    detail.description = "description"
+    updated = make_video("ch1", "sm1", "title")
+    updated.view_count = 150
+    return [[listing], [detail], [make_video("ch1", "sm1", "title")], [updated]]
+
+
+def events_of(stream: ChangeStream) -> list:
+    return [[(event.kind, event.id, event.field, event.old, event.new) for event in stream.diff(batch)] for batch in listing_then_detail()]
+
+
+def test_missing_values_are_unknown_in_both_backends():
+    with ContentStore() as store:
+        from_store = events_of(ChangeStream(store))
+    from_memory = events_of(ChangeStream())
+
+    assert from_memory == from_store
+    assert from_memory == [
+        [("new", "sm1", None, None, None)],
+        [("changed", "sm1", "description", None, "description"), ("changed", "sm1", "view_count", None, 100)],
+        [],
+        [("changed", "sm1", "view_count", 100, 150)],
+    ]
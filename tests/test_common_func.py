@@ -0,0 +1,43 @@
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.support.event_firing_webdriver import AbstractEventListener, EventFiringWebDriver
+
+from scraping_tools.common.common_func import count_commands
+
+
+class FakeDriver(WebDriver):
+    """ブラウザを起動せず、executeの呼び出しだけを受け付けるドライバ"""
+
+    def __init__(self) -> None:
+        pass
+
+    def execute(self, driver_command, params=None):
+        return {"value": None}
+
+
+def test_count_commands():
+    driver = FakeDriver()
+    with count_commands(driver) as counter:
+        driver.execute_script("return 1")
+        driver.execute_script("return 2")
+    assert counter["count"] == 2
+    assert "execute" not in vars(driver)
+
+
+def test_count_commands_with_wrapped_driver():
+    inner = FakeDriver()
+    driver = EventFiringWebDriver(inner, AbstractEventListener())
+    with count_commands(driver) as counter:
+        driver.execute_script("return 1")
+    assert counter["count"] == 1
+    # 終了後は元のexecuteに戻る
+    assert "execute" not in vars(inner)
+
+
+def test_count_commands_nested():
+    driver = FakeDriver()
+    with count_commands(driver) as outer:
+        with count_commands(driver) as inner:
+            driver.execute_script("return 1")
+        driver.execute_script("return 2")
+    assert (outer["count"], inner["count"]) == (2, 1)
+    assert "execute" not in vars(driver)
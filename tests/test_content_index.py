@@ -0,0 +1,59 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from scraping_tools.common.base_class import Video
+from scraping_tools.common.content_index import ContentIndex, to_sort_key
+from scraping_tools.common.timestamp import Timestamp
+
+
+@pytest.fixture
+def utc_local_time(monkeypatch):
+    """ローカルのタイムゾーンを日本時間以外(UTC)にする"""
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def make_video(id: str, posted_at: datetime) -> Video:
+    video = Video(id)
+    video.poster_id = "ch1"
+    video.posted_at = posted_at
+    return video
+
+
+def test_to_sort_key_treats_naive_datetime_as_jst(utc_local_time):
+    naive = datetime(2023, 1, 2, 0, 0)
+    assert to_sort_key(naive) == float(Timestamp.from_datetime(naive))
+    assert to_sort_key("2023-01-02T00:00:00") == float(Timestamp.from_datetime(naive))
+    assert to_sort_key("2023-01-01T15:00:00Z") == float(Timestamp.from_datetime(naive))
+    assert to_sort_key("not a date") is None
+    assert to_sort_key(None) is None
+
+
+def test_between_uses_jst_bounds(utc_local_time):
+    index = ContentIndex()
+    index.add_all(
+        [
+            make_video("before", datetime(2023, 1, 1, 23, 59)),
+            make_video("start", datetime(2023, 1, 2, 0, 0)),
+            make_video("inside", datetime(2023, 1, 2, 12, 0)),
+            make_video("end", datetime(2023, 1, 3, 0, 0)),
+        ]
+    )
+
+    results = index.query(between={"posted_at": (datetime(2023, 1, 2), datetime(2023, 1, 3))}, order_by="posted_at")
+
+    assert [video.id for video in results] == ["start", "inside"]
+
+
+def test_between_with_where_filters_remaining_ranges(utc_local_time):
+    index = ContentIndex()
+    index.add_all([make_video("start", datetime(2023, 1, 2, 0, 0)), make_video("end", datetime(2023, 1, 3, 0, 0))])
+
+    results = index.query(where={"poster_id": "ch1"}, between={"posted_at": ("2023-01-02T00:00:00", "2023-01-03T00:00:00")})
+
+    assert [video.id for video in results] == ["start"]
@@ -0,0 +1,86 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from scraping_tools.DLsite.Maniax.Circle import ON_SALE_WORKS_SCRIPT, Circle
+from scraping_tools.DLsite.Maniax.Work import WORK_CARDS_SCRIPT, Work
+
+FIXTURES = Path(__file__).resolve().parent.parent / "benchmarks" / "fixtures" / "dlsite"
+SEARCH_URL = "https://www.dlsite.com/maniax/fsr/=/language/jp/"
+CIRCLE_URL = "https://www.dlsite.com/maniax/circle/profile/=/maker_id/RG60000.html"
+CHROME_BINARIES = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome")
+
+
+def read(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+def test_search_html_prefers_lazy_image_url():
+    cards = Work._parse_search_html(read("search.html"), SEARCH_URL)
+    works = [Work._parse_work_card(card) for card in cards]
+
+    assert len(works) == 30
+    assert works[0] == {
+        "id": "RJ01000000",
+        "title": "ＭＶ公開記念 特別番組 #000",
+        "url": "https://www.dlsite.com/maniax/work/=/product_id/RJ01000000.html",
+        "thumbnail": "https://img.dlsite.jp/resize/images2/work/doujin/RJ01001000/RJ01000000_img_main_240x240.jpg",
+        "type": "ボイス・ASMR",
+        "price": {"base": 1980, "discount": 990},
+        "circle": {"name": "サークル0", "url": "https://www.dlsite.com/maniax/circle/profile/=/maker_id/RG60000.html", "id": "RG60000"},
+        "status": "on_sale",
+    }
+    assert not any(work["thumbnail"].endswith("loading.gif") for work in works)
+
+
+def test_profile_html_resolves_relative_urls():
+    circle = Circle("RG60000", backend="http")
+    profile = circle._parse_profile_html(read("circle_profile.html"), CIRCLE_URL)
+    works = [circle._parse_on_sale_work(work, profile["circle_name"]) for work in profile["works"]]
+
+    assert works[0] == {
+        "title": "ゲーム実況 Part0 #000",
+        "url": "https://www.dlsite.com/maniax/work/=/product_id/RJ01100000.html",
+        "price": {"base": "880", "discount": "440"},
+        "sale_count": "2538",
+        "category": "ボイス・ASMR",
+        "circle": {"id": "RG60000", "url": CIRCLE_URL, "name": "サークル0"},
+    }
+
+
+@pytest.fixture(scope="module")
+def chrome():
+    """保存したHTMLでスクリプトを実行するヘッドレスのChrome(ない場合はスキップ)"""
+    if not any(shutil.which(name) for name in CHROME_BINARIES):
+        pytest.skip("Chrome is not installed")
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    driver = webdriver.Chrome(options=options)
+    yield driver
+    driver.quit()
+
+
+def run_script(driver, name: str, base_url: str, script: str):
+    # 保存したHTMLを開き、相対URLが元のページのURLで解決されるようにbase要素を追加する
+    driver.get((FIXTURES / name).as_uri())
+    driver.execute_script("const base = document.createElement('base'); base.href = arguments[0]; document.head.prepend(base);", base_url)
+    return driver.execute_script(script)
+
+
+def test_search_backends_return_the_same_cards(chrome):
+    browser = run_script(chrome, "search.html", SEARCH_URL, WORK_CARDS_SCRIPT)
+    http = Work._parse_search_html(read("search.html"), SEARCH_URL)
+
+    assert browser == http
+    assert [Work._parse_work_card(card) for card in browser] == [Work._parse_work_card(card) for card in http]
+
+
+def test_circle_backends_return_the_same_works(chrome):
+    browser = run_script(chrome, "circle_profile.html", CIRCLE_URL, ON_SALE_WORKS_SCRIPT)
+    http = Circle._parse_profile_html(read("circle_profile.html"), CIRCLE_URL)
+
+    assert browser == http
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+from datetime import date, timedelta
+
+from scraping_tools.DLsite.Maniax.Work import Work
+
+
+def daily(start: date, end: date, count: int) -> dict:
+    """startからendまでの毎日count件の販売日ごとの作品数"""
+    return {start + timedelta(days=i): count for i in range((end - start).days + 1)}
+
+
+def counter_for(works_per_day: dict):
+    """販売日ごとの作品数からシャードの作品数を返す関数を作る(範囲のNoneは制限なし)"""
+    calls = []
+
+    async def count(shard: dict) -> int:
+        calls.append(shard)
+        start, end = shard["regist_date_start"], shard["regist_date_end"]
+        return sum(works for day, works in works_per_day.items() if (start is None or start <= day) and (end is None or day <= end))
+
+    return count, calls
+
+
+def date_ranges(shards: list) -> list:
+    return [(shard["regist_date_start"], shard["regist_date_end"]) for shard in shards]
+
+
+def test_shards_over_the_cap_are_split_by_date():
+    count, _ = counter_for(daily(date(2023, 1, 1), date(2023, 1, 31), 10))
+    shards = asyncio.run(
+        Work.plan_shards(keyword="ASMR", regist_date_start=date(2023, 1, 1), regist_date_end=date(2023, 1, 31), max_results=100, counter=count)
+    )
+
+    # 31日 x 10件を100件以下に分割する
+    assert date_ranges(shards) == [
+        (date(2023, 1, 1), date(2023, 1, 7)),
+        (date(2023, 1, 8), date(2023, 1, 15)),
+        (date(2023, 1, 16), date(2023, 1, 23)),
+        (date(2023, 1, 24), date(2023, 1, 31)),
+    ]
+    assert all(shard["keyword"] == "ASMR" for shard in shards)
+
+
+def test_undated_shard_keeps_future_works():
+    today = date.today()
+    # 過去の販売作品と、今日より後に販売される予約作品
+    works = {**daily(today - timedelta(days=59), today, 5), **daily(today + timedelta(days=1), today + timedelta(days=90), 3)}
+    count, _ = counter_for(works)
+
+    shards = asyncio.run(Work.plan_shards(max_results=100, counter=count))
+
+    ranges = date_ranges(shards)
+    assert [start for start, _ in ranges].count(None) == 1
+    assert [end for _, end in ranges].count(None) == 1
+    assert all(asyncio.run(count(shard)) <= 100 for shard in shards)
+    # 全てのシャードの作品数の合計が元の作品数と一致する(範囲外の作品を落とさない)
+    assert sum([asyncio.run(count(shard)) for shard in shards]) == sum(works.values())
+
+
+def test_single_day_over_the_cap_is_logged(caplog):
+    busy_day = date(2023, 1, 2)
+    count, _ = counter_for({**daily(date(2023, 1, 1), date(2023, 1, 4), 10), busy_day: 500})
+
+    with caplog.at_level(logging.WARNING, logger="scraping_tools.DLsite.Maniax.Work"):
+        shards = asyncio.run(Work.plan_shards(regist_date_start=date(2023, 1, 1), regist_date_end=date(2023, 1, 4), max_results=100, counter=count))
+
+    assert (busy_day, busy_day) in date_ranges(shards)
+    assert "500 works on 2023-01-02" in caplog.text
+
+
+def test_unknown_count_is_logged(caplog):
+    async def count(shard: dict) -> int:
+        return None
+
+    with caplog.at_level(logging.WARNING, logger="scraping_tools.DLsite.Maniax.Work"):
+        shards = asyncio.run(Work.plan_shards(keyword="ASMR", max_results=100, counter=count))
+
+    assert len(shards) == 1
+    assert "can't read the number of works" in caplog.text
+
+
+def test_shards_under_the_cap_are_kept():
+    count, calls = counter_for(daily(date(2023, 1, 1), date(2023, 1, 31), 10))
+    ranges = Work.split_date_range(date(2023, 1, 1), date(2023, 1, 31), 4)
+    shards = asyncio.run(Work.plan_shards(date_ranges=ranges, max_results=100, counter=count))
+
+    assert date_ranges(shards) == ranges
+    assert len(calls) == 4
+
+
+def test_parse_total_count():
+    assert Work._parse_total_count('<div class="page_total"><strong>12,345</strong>件中 1～100件目</div>') == 12345
+    assert Work._parse_total_count("<p>該当作品 3,210 件中</p>") == 3210
+    assert Work._parse_total_count("<p>no results</p>") is None
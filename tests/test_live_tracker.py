@@ -0,0 +1,100 @@
+from scraping_tools.NicoNico.live_tracker import LiveEvent, NicoNicoLiveTracker
+from scraping_tools.NicoNico.niconico import NicoNicoLive
+
+
+# window(60秒)の倍数にしておく
+NOW = 6000.0
+
+
+class FakeChecker:
+    """statusesに設定した状態を返し、呼び出し毎のIDのリストを記録するchecker"""
+
+    def __init__(self) -> None:
+        self.statuses: dict[str, str] = {}
+        self.calls: list[list[str]] = []
+
+    def __call__(self, ids: list[str]) -> dict[str, str]:
+        self.calls.append(list(ids))
+        return {id: self.statuses[id] for id in ids if id in self.statuses}
+
+
+def make_live(id: str, status: str, start_at: float) -> NicoNicoLive:
+    live = NicoNicoLive(id)
+    live.status = status
+    live.start_at = start_at
+    return live
+
+
+def check_times(tracker: NicoNicoLiveTracker, count: int) -> list[float]:
+    """次の確認時刻にpollすることをcount回繰り返し、確認した時刻のリストを返す"""
+    times = []
+    for _ in range(count):
+        now = tracker.next_check_at()
+        tracker.poll(now)
+        times.append(now)
+    return times
+
+
+def test_future_lives_are_checked_from_lead_aligned_to_window():
+    checker = FakeChecker()
+    tracker = NicoNicoLiveTracker(checker)
+    tracker.add(make_live("lv1", "future", NOW + 1000), now=NOW)
+    tracker.add(make_live("lv2", "future", NOW + 1010), now=NOW)
+
+    # 開始予定時刻のlead秒前(6700)をwindowの境界に切り上げた時刻
+    assert tracker.next_check_at() == 6720
+    assert tracker.poll(6719) == []
+    assert checker.calls == []
+
+    # 開始予定時刻が近い生放送は1回の呼び出しでまとめて確認される
+    assert tracker.poll(6720) == []
+    assert checker.calls == [["lv1", "lv2"]]
+    assert tracker.request_count == 2
+    # 開始予定時刻までwindow秒ごとに確認する
+    assert check_times(tracker, 4) == [6780, 6840, 6900, 6960]
+
+
+def test_live_checks_decay_until_the_max_interval():
+    checker = FakeChecker()
+    tracker = NicoNicoLiveTracker(checker)
+    tracker.add(make_live("lv1", "now", NOW - 600), now=NOW)
+    checker.statuses["lv1"] = "now"
+
+    times = check_times(tracker, 7)
+    intervals = [b - a for a, b in zip([NOW, *times], times)]
+    assert intervals == [60, 120, 240, 480, 960, 1800, 1800]
+
+
+def test_overdue_lives_decay_and_status_changes_reset_the_interval():
+    events = []
+    checker = FakeChecker()
+    tracker = NicoNicoLiveTracker(checker, on_event=events.append)
+    tracker.add(make_live("lv1", "future", NOW), now=NOW - 60)
+    checker.statuses["lv1"] = "future"
+
+    # 開始予定時刻を過ぎても始まらない場合は、過ぎた時間に応じて間隔を伸ばす
+    assert check_times(tracker, 4) == [6000, 6060, 6180, 6660]
+
+    # 放送中になったら放送中の最初の間隔に戻る
+    checker.statuses["lv1"] = "now"
+    assert tracker.poll(7620) == [LiveEvent("lv1", "future", "now", 7620)]
+    assert tracker.next_check_at() == 7680
+
+    # 過去放送になったら追跡をやめる
+    checker.statuses["lv1"] = "past"
+    assert tracker.poll(7680) == [LiveEvent("lv1", "now", "past", 7680)]
+    assert events == [LiveEvent("lv1", "future", "now", 7620), LiveEvent("lv1", "now", "past", 7680)]
+    assert len(tracker) == 0
+    assert tracker.next_check_at() is None
+
+
+def test_failed_checks_keep_the_status():
+    def failing(ids):
+        raise ConnectionError("timeout")
+
+    tracker = NicoNicoLiveTracker(failing)
+    tracker.add(make_live("lv1", "now", NOW - 600), now=NOW)
+
+    assert tracker.poll(6060) == []
+    assert len(tracker) == 1
+    assert tracker.next_check_at() == 6180
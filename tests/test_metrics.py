@@ -0,0 +1,34 @@
+import pytest
+
+from scraping_tools.ChannelPlus.channelplus import ChannelPlusChannel
+from scraping_tools.common import metrics
+
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.enable_metrics()
+    metrics.reset_metrics()
+    yield
+    metrics.reset_metrics()
+    metrics.enable_metrics(False)
+
+
+@pytest.mark.parametrize("method, private", [("iter_video", "_ChannelPlusChannel__video_page"), ("iter_news", "_ChannelPlusChannel__news_page")])
+def test_generator_methods_count_every_item(enabled_metrics, monkeypatch, method, private):
+    labels = []
+
+    def page(self, *args):
+        for i in range(5):
+            # 取得中のスクレイピング処理のラベルが設定されている
+            labels.append(metrics.current_labels())
+            yield i
+
+    monkeypatch.setattr(ChannelPlusChannel, private, page)
+    channel = ChannelPlusChannel("channel")
+
+    label = ("channelplus", f"ChannelPlusChannel.{method}")
+
+    assert list(getattr(channel, method)(limit=5)) == [0, 1, 2, 3, 4]
+    assert metrics.ITEMS.get(label) == 5
+    assert metrics.SCRAPES.get(label) == 1
+    assert labels == [label] * 5
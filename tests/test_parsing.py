@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from scraping_tools.common.parsing import parse_datetime, parse_duration
+from scraping_tools.common.timestamp import JST
+
+
+NOW = datetime(2023, 11, 15, 12, 30, 45, tzinfo=JST)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        # 現在の月より前の月は来年とみなす
+        ("01/05 21:00", datetime(2024, 1, 5, 21, 0, tzinfo=JST)),
+        ("09月23日 (土) 22時00分", datetime(2024, 9, 23, 22, 0, tzinfo=JST)),
+        # 現在の月と、それより後の月は今年
+        ("11/01 21:00", datetime(2023, 11, 1, 21, 0, tzinfo=JST)),
+        ("12月24日 20時00分", datetime(2023, 12, 24, 20, 0, tzinfo=JST)),
+    ],
+)
+def test_month_day_year_rollover(text, expected):
+    assert parse_datetime(text, NOW) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("今日 21:00", datetime(2023, 11, 15, 21, 0, tzinfo=JST)),
+        ("本日 9:05", datetime(2023, 11, 15, 9, 5, tzinfo=JST)),
+        ("明日 21:00", datetime(2023, 11, 16, 21, 0, tzinfo=JST)),
+        ("昨日 21:00", datetime(2023, 11, 14, 21, 0, tzinfo=JST)),
+    ],
+)
+def test_day_words(text, expected):
+    assert parse_datetime(text, NOW) == expected
+
+
+def test_day_words_across_the_year_end():
+    now = datetime(2023, 12, 31, 23, 0, tzinfo=JST)
+    assert parse_datetime("明日 1:00", now) == datetime(2024, 1, 1, 1, 0, tzinfo=JST)
+
+
+@pytest.mark.parametrize(
+    "text, delta",
+    [
+        ("3日前", timedelta(days=3)),
+        ("12日前", timedelta(days=12)),
+        ("123分前", timedelta(minutes=123)),
+        ("2週間前", timedelta(weeks=2)),
+        ("1か月前", timedelta(days=30)),
+    ],
+)
+def test_relative(text, delta):
+    assert parse_datetime(text, NOW) == NOW - delta
+
+
+def test_now_without_timezone_is_jst():
+    naive = NOW.replace(tzinfo=None)
+    assert parse_datetime("今日 21:00", naive) == datetime(2023, 11, 15, 21, 0, tzinfo=JST)
+    # 他のタイムゾーンの場合は日本時間の日付で判定する
+    utc = datetime(2023, 11, 15, 16, 0, tzinfo=timezone.utc)
+    assert parse_datetime("今日 21:00", utc) == datetime(2023, 11, 16, 21, 0, tzinfo=JST)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("２０２３／０７／０６", datetime(2023, 7, 6, tzinfo=JST)),
+        ("放送開始：２０２３／０９／０４ (月) ２２：５０：００", datetime(2023, 9, 4, 22, 50, tzinfo=JST)),
+        ("１２日前", NOW - timedelta(days=12)),
+        ("明日　２１：００", datetime(2023, 11, 16, 21, 0, tzinfo=JST)),
+    ],
+)
+def test_full_width_digits(text, expected):
+    assert parse_datetime(text, NOW) == expected
+
+
+@pytest.mark.parametrize(
+    "text, offset",
+    [
+        ("Fri, 16 Jun 2023 12:00:00 +0900", timedelta(hours=9)),
+        ("Fri, 16 Jun 2023 12:00:00 -0530", -timedelta(hours=5, minutes=30)),
+        ("Fri, 16 Jun 2023 12:00:00 GMT", timedelta(0)),
+        # オフセットがない場合は日本時間とみなす
+        ("Fri, 16 Jun 2023 12:00", timedelta(hours=9)),
+    ],
+)
+def test_rfc822_offsets(text, offset):
+    parsed = parse_datetime(text)
+    assert parsed.utcoffset() == offset
+    assert parsed == datetime(2023, 6, 16, 12, 0, tzinfo=timezone(offset))
+
+
+def test_iso8601():
+    assert parse_datetime("2024-05-01T11:00:00Z") == datetime(2024, 5, 1, 20, 0, tzinfo=JST)
+    assert parse_datetime("2023-09-04 22:50:00") == datetime(2023, 9, 4, 22, 50, tzinfo=JST)
+
+
+def test_invalid_datetime():
+    with pytest.raises(ValueError):
+        parse_datetime("近日公開", NOW)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("1:23:45", timedelta(hours=1, minutes=23, seconds=45)),
+        ("123:45", timedelta(minutes=123, seconds=45)),
+        ("１２：３４", timedelta(minutes=12, seconds=34)),
+        ("PT1H23M45S", timedelta(hours=1, minutes=23, seconds=45)),
+        ("P1DT2H", timedelta(days=1, hours=2)),
+        ("PT0.5S", timedelta(seconds=0.5)),
+        ("1時間23分45秒", timedelta(hours=1, minutes=23, seconds=45)),
+        ("45秒", timedelta(seconds=45)),
+        ("90", timedelta(seconds=90)),
+    ],
+)
+def test_parse_duration(text, expected):
+    assert parse_duration(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", " ", "P", "PT", "1:2:3:4", "abc"])
+def test_parse_duration_rejects_invalid(text):
+    with pytest.raises(ValueError):
+        parse_duration(text)
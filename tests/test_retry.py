@@ -0,0 +1,73 @@
+import pytest
+from selenium.common.exceptions import (
+    InvalidSessionIdException,
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException,
+)
+from selenium.webdriver.support.ui import WebDriverWait
+
+from scraping_tools.common.retry import PermanentError, RetryPolicy, TransientError, call_with_retry, classify_exception
+
+
+class FakeDriver:
+    pass
+
+
+def wait_timeout() -> TimeoutException:
+    try:
+        WebDriverWait(FakeDriver(), 0.01, poll_frequency=0.005).until(lambda driver: False)
+    except TimeoutException as e:
+        return e
+    raise AssertionError("WebDriverWait did not time out")
+
+
+@pytest.mark.parametrize(
+    "error",
+    [NoSuchElementException("no such element"), StaleElementReferenceException("stale element reference")],
+)
+def test_element_errors_are_permanent(error):
+    assert isinstance(classify_exception(error), PermanentError)
+
+
+def test_wait_timeout_is_permanent():
+    assert isinstance(classify_exception(wait_timeout()), PermanentError)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        TimeoutException("timeout: Timed out receiving message from renderer: 10.000"),
+        InvalidSessionIdException("invalid session id"),
+        WebDriverException("unknown error: net::ERR_CONNECTION_RESET"),
+        ConnectionError("connection refused"),
+    ],
+)
+def test_session_connection_and_load_errors_are_transient(error):
+    assert isinstance(classify_exception(error), TransientError)
+
+
+def test_call_with_retry_does_not_retry_missing_elements():
+    calls = []
+
+    def find():
+        calls.append(1)
+        raise NoSuchElementException("no such element")
+
+    with pytest.raises(NoSuchElementException):
+        call_with_retry(find, host="test-missing.example", policy=RetryPolicy(max_attempts=3, base_delay=0))
+    assert len(calls) == 1
+
+
+def test_call_with_retry_retries_load_timeouts():
+    calls = []
+
+    def get():
+        calls.append(1)
+        if len(calls) < 3:
+            raise TimeoutException("timeout: Timed out receiving message from renderer: 10.000")
+        return "ok"
+
+    assert call_with_retry(get, host="test-timeout.example", policy=RetryPolicy(max_attempts=3, base_delay=0)) == "ok"
+    assert len(calls) == 3
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from scraping_tools.ChannelPlus.channelplus import ChannelPlusNews
+from scraping_tools.NicoNico.niconico import NicoNicoLive, NicoNicoVideo
+from scraping_tools.common.snapshot import SnapshotReader, write_snapshot
+from scraping_tools.common.timestamp import Timestamp
+
+
+def make_contents() -> list:
+    """種類の違うコンテンツと、Noneを含む属性を混ぜたリスト"""
+    video = NicoNicoVideo("sm9")
+    video.title = "動画"
+    video.posted_at = 1693835400
+    video.tags = ["ゲーム", "実況"]
+    video.duration = timedelta(minutes=12, seconds=34)
+    video.view_count = 100
+
+    # 値がNoneの属性と、空のタグ
+    bare = NicoNicoVideo("sm10")
+    bare.tags = []
+
+    live = NicoNicoLive("lv1")
+    live.title = "生放送"
+    live.start_at = datetime(2023, 9, 23, 22, 0)
+    live.status = "future"
+    live.is_deleted = True
+    live.tags = None
+    live.duration = timedelta(hours=1)
+
+    news = ChannelPlusNews("ch1", "news1")
+    news.title = "お知らせ"
+    news.body = "本文"
+    news.posted_at = "2023-07-06T12:00:00+09:00"
+
+    return [video, bare, live, news]
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return str(tmp_path / "contents.snap")
+
+
+def test_round_trip(snapshot_path):
+    contents = make_contents()
+    assert write_snapshot(iter(contents), snapshot_path) == 4
+
+    with SnapshotReader(snapshot_path) as reader:
+        assert len(reader) == 4
+        assert list(reader.ids()) == ["sm9", "sm10", "lv1", "news1"]
+        for original in contents:
+            restored = reader.get(original.id)
+            assert type(restored) is type(original)
+            for field in reader.fields:
+                if hasattr(original, field):
+                    assert getattr(restored, field) == getattr(original, field), field
+
+
+def test_find_by_id(snapshot_path):
+    write_snapshot(make_contents(), snapshot_path)
+
+    with SnapshotReader(snapshot_path) as reader:
+        assert [reader.find(id) for id in ["sm9", "sm10", "lv1", "news1"]] == [0, 1, 2, 3]
+        assert reader.find("sm1") == -1
+        assert reader.find("zz") == -1
+        assert "lv1" in reader
+        assert reader.get("sm999") is None
+        assert reader[-1].id == "news1"
+        with pytest.raises(IndexError):
+            reader[4]
+
+
+def test_columns_with_none_and_timestamps(snapshot_path):
+    write_snapshot(make_contents(), snapshot_path)
+
+    with SnapshotReader(snapshot_path) as reader:
+        assert list(reader.column("view_count")) == [100, None, None, None]
+        assert list(reader.column("tags")) == [["ゲーム", "実況"], [], None, []]
+        assert list(reader.column("status")) == [None, None, "future", None]
+        assert list(reader.column("duration")) == [timedelta(seconds=754), None, timedelta(hours=1), None]
+
+        posted_at = list(reader.column("posted_at"))
+        assert posted_at == [1693835400, None, None, 1688612400]
+        assert all(isinstance(value, Timestamp) for value in posted_at if value is not None)
+        # 日本時間とみなした日時はUNIX時間の整数で保存される
+        assert list(reader.column("start_at")) == [None, None, int(datetime(2023, 9, 23, 13, 0, tzinfo=timezone.utc).timestamp()), None]
+
+
+def test_mixed_kinds_are_saved_as_json(snapshot_path):
+    first, second = NicoNicoVideo("sm1"), NicoNicoVideo("sm2")
+    first.duration = timedelta(seconds=90)
+    second.duration = 3600
+    write_snapshot([first, second], snapshot_path)
+
+    with SnapshotReader(snapshot_path) as reader:
+        assert list(reader.column("duration")) == [90.0, 3600]
+
+
+def test_empty_snapshot(snapshot_path):
+    assert write_snapshot([], snapshot_path) == 0
+
+    with SnapshotReader(snapshot_path) as reader:
+        assert len(reader) == 0
+        assert reader.fields == []
+        assert list(reader) == []
+        assert reader.find("sm9") == -1
+        assert reader.get("sm9") is None
+
+
+def test_not_a_snapshot(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a snapshot file")
+    with pytest.raises(ValueError):
+        SnapshotReader(str(path))
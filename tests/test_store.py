@@ -0,0 +1,58 @@
+import threading
+
+from scraping_tools.ChannelPlus.channelplus import ChannelPlusVideo
+from scraping_tools.NicoNico.niconico import NicoNicoVideo
+from scraping_tools.common.base_class import Video
+from scraping_tools.common.store import ContentStore, get_platform
+
+
+class Work(Video):
+    """scraping_tools.DLsite.Maniaxのようにサイトの下にパッケージがあるクラス"""
+
+
+Work.__module__ = "scraping_tools.DLsite.Maniax.Work"
+
+
+def make_video(id: str, tags: list) -> NicoNicoVideo:
+    video = NicoNicoVideo(id)
+    video.title = f"title {id}"
+    video.tags = tags
+    return video
+
+
+def test_get_platform_uses_class_attribute():
+    assert get_platform(NicoNicoVideo("sm1")) == "NicoNico"
+    assert get_platform(ChannelPlusVideo("channel", "sm1")) == "ChannelPlus"
+    assert get_platform(Work("RJ01000000")) == "DLsite"
+
+
+def test_change_fields_are_deserialized():
+    with ContentStore() as store:
+        [created] = store.upsert([make_video("sm1", ["a"])])
+        assert created.fields["tags"] == (None, ["a"])
+
+        [changed] = store.upsert([make_video("sm1", ["a", "b"])])
+        assert changed.fields == {"tags": (["a"], ["a", "b"])}
+
+        assert store.upsert([make_video("sm1", ["a", "b"])]) == []
+        assert store.get("NicoNico", "video", "sm1")["tags"] == ["a", "b"]
+
+
+def test_iter_dicts_while_upserting_from_another_thread():
+    with ContentStore() as store:
+        store.upsert([make_video(f"sm{i}", []) for i in range(200)])
+        errors = []
+
+        def write():
+            try:
+                for i in range(20):
+                    store.upsert([make_video(f"sm{j}", [str(i)]) for j in range(200)])
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        for _ in range(20):
+            assert len(list(store.iter_dicts("video", "NicoNico"))) == 200
+        thread.join()
+        assert errors == []